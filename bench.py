@@ -0,0 +1,1516 @@
+# -*- coding: utf-8 -*-
+# Benchmarks y chequeos de rendimiento de BrickLang y la consola retro.
+#
+# Ejecutar: python bench.py            (todos)
+#           python bench.py import_lexer ...   (solo los nombrados)
+
+from __future__ import print_function
+
+import io
+import os
+import subprocess
+import sys
+import time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+
+# Presupuesto de importación de lexer.py (ms por encima de un intérprete vacío)
+PRESUPUESTO_IMPORT_MS = 30.0
+
+
+def _cronometrar(fn, repeticiones=1):
+    mejor = None
+    for _ in range(repeticiones):
+        t0 = time.time()
+        fn()
+        t = time.time() - t0
+        if mejor is None or t < mejor:
+            mejor = t
+    return mejor
+
+
+def _arrancar(codigo):
+    t0 = time.time()
+    salida = subprocess.check_output([sys.executable, '-c', codigo], cwd=AQUI)
+    return time.time() - t0, salida
+
+
+# -------------------- LEXER / PARSER --------------------
+def bench_import_lexer():
+    vacio = min(_arrancar('pass')[0] for _ in range(5))
+    tiempos = []
+    for _ in range(5):
+        t, salida = _arrancar('import lexer')
+        if salida.strip():
+            raise AssertionError("importar lexer no debe imprimir nada")
+        tiempos.append(t)
+    extra_ms = (min(tiempos) - vacio) * 1000.0
+    print("import lexer: {:.1f} ms sobre el interprete (presupuesto {:.0f} ms)".format(
+        extra_ms, PRESUPUESTO_IMPORT_MS))
+    if extra_ms > PRESUPUESTO_IMPORT_MS:
+        raise AssertionError("import lexer excede el presupuesto")
+
+
+def bench_cache_ast():
+    import shutil
+    import tempfile
+
+    import lexer
+    from cache_ast import CacheAST
+
+    ruta = os.path.join(AQUI, 'tetris.brik')
+    directorio = tempfile.mkdtemp()
+    try:
+        cache = CacheAST(directorio)
+        lexer.parse_file(ruta, cache=cache)
+        n = 200
+        sin = _cronometrar(lambda: [lexer.parse_file(ruta) for _ in range(n)], 3)
+        con = _cronometrar(lambda: [lexer.parse_file(ruta, cache=cache) for _ in range(n)], 3)
+        print("parse_file tetris.brik: {:.1f} us sin cache, {:.1f} us con cache".format(
+            sin / n * 1e6, con / n * 1e6))
+
+        # pisar una entrada no la cuenta dos veces para el desalojo
+        clave = cache.clave(b'x: 1', 0)
+        for ast in ({'x': 1}, {'x': 2}, {'x': [1, 2, 3]}):
+            cache.guardar(clave, ast)
+        if cache._total != cache.tamano_total():
+            raise AssertionError("la cache cuenta {} bytes y ocupa {}".format(cache._total, cache.tamano_total()))
+
+        # fin de línea de Windows: el mismo AST con y sin cache
+        crlf = os.path.join(directorio, 'crlf.brik')
+        with open(crlf, 'wb') as f:
+            f.write(b'a: "uno\r\ndos"\r\nb: 2\r\n')
+        sin_cache = lexer.parse_file(crlf)
+        if lexer.parse_file(crlf, cache=cache) != sin_cache or lexer.parse_file(crlf, cache=cache) != sin_cache:
+            raise AssertionError("un .brik con \\r\\n da otro AST con la cache")
+    finally:
+        shutil.rmtree(directorio)
+
+
+def bench_incremental():
+    import lexer
+    from incremental import ParseIncremental
+
+    with open(os.path.join(AQUI, 'tetris.brik')) as f:
+        base = f.read()
+    # texto (no bytes en py2): los offsets de las ediciones son de caracteres
+    with io.open(os.path.join(AQUI, 'tetris.brik'), encoding='utf-8') as f:
+        juegos_brik = f.read()
+    with io.open(os.path.join(AQUI, 'snake.brik'), encoding='utf-8') as f:
+        juegos_brik += u'\n' + f.read()
+
+    # ediciones que dejan un valor corriendo hasta el final del texto (o
+    # de la región): lo mismo que parse_text, también en la edición siguiente
+    for texto, ediciones in (('a = 1\nb = 2\n', [(10, 1, ''), (0, 0, 'z: 3\n')]),
+                             ('a = 1\nb = 2\n', [(12, 0, '\nc ='), (12, 0, ' 4')]),
+                             (juegos_brik, [(252, 5, '#'), (252, 1, juegos_brik[252:257])])):
+        inc = ParseIncremental(texto)
+        for offset, borrados, insertado in ediciones:
+            texto = texto[:offset] + insertado + texto[offset + borrados:]
+            ast, _ = inc.editar(offset, borrados, insertado)
+            if ast != lexer.parse_text(texto):
+                raise AssertionError("la edición {!r} da otro AST que parse_text".format(
+                    (offset, borrados, insertado)))
+
+    n = 300
+    for copias in (1, 10, 100):
+        inc = ParseIncremental(base * copias)
+        # misma sección en todos los tamaños: solo varía el resto del archivo
+        medio = inc.texto.index('\n', len(base) // 2)
+
+        def editar():
+            for _ in range(n):
+                inc.editar(medio, 0, ' ')
+
+        t = _cronometrar(editar)
+        print("edicion en {:>8} bytes: {:.1f} us".format(len(inc.texto), t / n * 1e6))
+
+
+def bench_ast_compacto():
+    try:
+        import tracemalloc
+    except ImportError:
+        print("tracemalloc no disponible en este Python")
+        return
+    import lexer
+
+    with open(os.path.join(AQUI, 'tetris.brik')) as f:
+        base = f.read()
+    # paquete de reglas con cientos de piezas propias
+    paquete = "\n".join(base.replace('figura_', 'figura{}_'.format(i)) for i in range(300))
+
+    for compacto in (False, True):
+        tracemalloc.start()
+        ast = lexer.parse_text(paquete, compacto=compacto)
+        memoria = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del ast
+        t = _cronometrar(lambda: lexer.parse_text(paquete, compacto=compacto))
+        print("AST {:<9} {:7.0f} KB  {:6.1f} ms".format(
+            'compacto' if compacto else 'plano', memoria / 1024.0, t * 1000))
+
+
+def bench_tokens():
+    import lexer
+
+    with io.open(os.path.join(AQUI, 'tetris.brik'), encoding='utf-8') as f:
+        base = f.read()
+    with io.open(os.path.join(AQUI, 'snake.brik'), encoding='utf-8') as f:
+        base += u'\n' + f.read()
+
+    # el buffer da los mismos tokens que tokenize() y el parser el mismo AST
+    textos = [base, u'', u'x = -5 y: [1.5, -2] z: si', u'c: \xe9no', u'a: "sin cerrar'] + \
+        [t if isinstance(t, type(u'')) else t.decode('utf-8') for t in _BRIK_RAROS]
+    for texto in textos:
+        lista = lexer.Lexer(texto).tokenize()
+        buf = lexer.Lexer(texto).tokenize_buffer()
+        if list(buf) != lista or buf.trozo(0, len(buf)) != lista:
+            raise AssertionError("BufferTokens distinto de tokenize() en {!r}".format(texto[:40]))
+        if _leer_o_error(lambda: lexer.Parser(buf).parsear()) != \
+                _leer_o_error(lambda: lexer.Parser(lista).parsear()):
+            raise AssertionError("el parser da otro resultado con BufferTokens en {!r}".format(texto[:40]))
+
+    # los errores dicen dónde
+    try:
+        lexer.parse_text(u'a: 1\nb: {c 2}')
+        raise AssertionError("'b: {c 2}' no dio SyntaxError")
+    except SyntaxError as e:
+        if '(linea 2, columna 7)' not in str(e):
+            raise AssertionError("error sin línea y columna: {}".format(e))
+
+    try:
+        import tracemalloc
+    except ImportError:
+        print("tokens iguales a tokenize() en {} textos (tracemalloc no disponible)".format(len(textos)))
+        return
+    grande = base * 200
+    memoria = []
+    for tokenizar in (lambda: lexer.Lexer(grande).tokenize(), lambda: lexer.Lexer(grande).tokenize_buffer()):
+        tracemalloc.start()
+        tokens = tokenizar()
+        memoria.append(tracemalloc.get_traced_memory()[0])
+        tracemalloc.stop()
+        del tokens
+    print("tokens iguales a tokenize() en {} textos; {} KB de texto: lista {:.0f} KB, buffer {:.0f} KB".format(
+        len(textos), len(grande) // 1024, memoria[0] / 1024.0, memoria[1] / 1024.0))
+    if memoria[1] * 4 > memoria[0]:
+        raise AssertionError("BufferTokens no ocupa ni 4 veces menos que la lista de tuplas")
+
+
+# entradas raras o rotas: la lectura por secciones debe dar lo mismo que
+# parse_text (mismo valor o SyntaxError), pida todas o solo algunas
+_BRIK_RAROS = [
+    'x: ["a",} "b"]\ny: 1',
+    'x: =\ny = 2',
+    'x: {a: }} y: 1',
+    'x: {a: ]} y: [1, [2, }], 3]',
+    'x: [}] , , y: {[a]: [1, {b: 2}], c: {}}',
+    'x: [1, 2 # ] comentario\n] y: "]}"',
+    'x: - 5 y: si',
+    '"s": 1 x: 2',
+    'x: [',
+    'x: {a: [1}',
+    'x: {true: 1} y: 1',
+    'x: {a 1}',
+    'x: {[1]: 2}',
+    'x: {[a 2}',
+    'x: {a: 1',
+    'x: 1 y',
+    'x:',
+    # palabras clave pegadas a letras no ASCII: mismo borde en str y bytes
+    u'x: \xe9no\ny: [si\xe9, \xf1no, no]',
+]
+
+
+def _leer_o_error(fn):
+    try:
+        return fn()
+    except SyntaxError:
+        return SyntaxError
+
+
+def bench_secciones():
+    import shutil
+    import tempfile
+
+    import lexer
+
+    try:
+        import tracemalloc
+    except ImportError:
+        tracemalloc = None
+
+    for texto in _BRIK_RAROS:
+        esperado = _leer_o_error(lambda: lexer.parse_text(texto))
+        datos = texto.encode('utf-8')
+        for pedidas in (None, {'x'}, {'y'}):
+            obtenido = _leer_o_error(lambda: dict(lexer.iter_secciones_bytes(datos, pedidas)))
+            filtrado = esperado
+            if pedidas is not None and esperado is not SyntaxError:
+                filtrado = dict((k, v) for k, v in esperado.items() if k in pedidas)
+            if obtenido != filtrado:
+                raise AssertionError("iter_secciones_bytes({!r}, {}) da {!r}, parse_text {!r}".format(
+                    texto, pedidas, obtenido, filtrado))
+    print("{} entradas raras: iter_secciones_bytes igual a parse_text".format(len(_BRIK_RAROS)))
+
+    directorio = tempfile.mkdtemp()
+    ruta = os.path.join(directorio, 'niveles.brik')
+    try:
+        with open(ruta, 'w') as f:
+            for n in range(20000):
+                f.write("[nivel_{}] : {{\n  velocidad: {}\n  obstaculos: [{}]\n"
+                        "  meta: {{ puntos: {}, nombre: 'Nivel {}' }}\n}}\n".format(
+                            n, 1 + n % 9, ", ".join(str(i) for i in range(n % 40)), n * 10, n))
+        print("archivo de {:.1f} MB con 20000 secciones".format(os.path.getsize(ruta) / 1e6))
+
+        casos = [
+            ('parse_file completo', lambda: lexer.parse_file(ruta)),
+            ('iter_secciones (todas)', lambda: sum(1 for _ in lexer.iter_secciones(ruta))),
+            ('iter_secciones (3 pedidas)', lambda: list(lexer.iter_secciones(
+                ruta, {'nivel_7', 'nivel_9000', 'nivel_19999'}))),
+        ]
+        for nombre, fn in casos:
+            t = _cronometrar(fn)
+            pico = 0
+            if tracemalloc is not None:
+                tracemalloc.start()
+                fn()
+                pico = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            print("{:<28} {:7.1f} ms  pico {:8.0f} KB".format(nombre, t * 1000, pico / 1024.0))
+    finally:
+        shutil.rmtree(directorio)
+
+
+def _contar_nodos(v):
+    if isinstance(v, dict):
+        return 1 + sum(_contar_nodos(x) for x in v.values())
+    if isinstance(v, (list, tuple)):
+        return 1 + sum(_contar_nodos(x) for x in v)
+    return 1
+
+
+def bench_validador():
+    import lexer
+    import validador
+
+    with open(os.path.join(AQUI, 'tetris.brik')) as f:
+        base = f.read()
+    validador.validar({})  # compilar el esquema fuera de la medición
+
+    anterior = None
+    for copias in (10, 100, 1000):
+        texto = "\n".join(base.replace('figura_', 'figura_{}_'.format(i)) for i in range(copias))
+        ast = lexer.parse_text(texto)
+        nodos = _contar_nodos(ast)
+        t = _cronometrar(lambda: validador.validar(ast), 3)
+        por_nodo = t / nodos * 1e9
+        print("{:>6} secciones, {:>7} nodos: {:8.2f} ms  ({:.0f} ns/nodo)".format(
+            len(ast), nodos, t * 1000, por_nodo))
+        anterior = anterior or por_nodo
+    if por_nodo > anterior * 2:
+        raise AssertionError("el costo por nodo crece con el tamaño del AST")
+
+
+def bench_tablas():
+    import lexer
+    import tablas
+
+    # las comidas compiladas deben traer los puntos tal cual están en el
+    # .brik, con signo incluido (la manzana negra resta)
+    ruta = os.path.join(AQUI, 'snake.brik')
+    ast = lexer.parse_file(ruta)
+    comidas = tablas.cargar_snake(ruta).comidas
+    for seccion in ast.values():
+        if not isinstance(seccion, dict) or seccion.get('tipo') not in tablas.TIPOS_COMIDA:
+            continue
+        esperado = seccion.get('puntuacion', seccion.get('puntos_extra'))
+        obtenido = comidas[tablas.TIPOS_COMIDA[seccion['tipo']]].puntos
+        if esperado is not None and obtenido != esperado:
+            raise AssertionError("{}: {} puntos compilados, {} en el archivo".format(
+                seccion['tipo'], obtenido, esperado))
+    if comidas['negra'].puntos >= 0:
+        raise AssertionError("la manzana negra de snake.brik no resta puntos")
+    print("snake.brik: puntos de comida iguales al archivo (negra {})".format(comidas['negra'].puntos))
+
+    # las tablas se comparten entre partidas: comidas y teclas no se tocan
+    compiladas = tablas.cargar_snake(ruta)
+    for nombre, tabla in (('comidas', compiladas.comidas), ('teclas', compiladas.teclas),
+                          ('teclas de tetris', tablas.cargar_tetris(os.path.join(AQUI, 'tetris.brik')).teclas)):
+        try:
+            tabla['x'] = None
+        except TypeError:
+            continue
+        raise AssertionError("las {} compiladas se pueden modificar".format(nombre))
+
+    # con puntaje negativo la velocidad se queda en el primer nivel (un
+    # índice negativo en la curva daría la velocidad máxima)
+    import juegos
+    for reglas in (compiladas, None):
+        juego = juegos.JuegoSnake(tablas=reglas, semilla=3, obstaculos_cantidad=0)
+        hx, hy = juego.cuerpo[-1]
+        x, y = hx + juego.dir[0], hy + juego.dir[1]
+        if juego.comidas.en(x, y) is None and juego.ocupacion.get(x, y) == juegos.LIBRE:
+            juego._agregar_comida('negra', x, y)
+        juego.puntaje = -100 - juego.tipos_comida['negra'].puntos
+        inicial = juego.velocidad
+        while juego.puntaje != -100 and not juego.muerto:
+            juego.paso(0.01)
+        if juego.velocidad > inicial:
+            raise AssertionError("puntaje {}: la velocidad subio de {} a {}".format(
+                juego.puntaje, inicial, juego.velocidad))
+
+    # un valor de tipo equivocado se rechaza al cargar, no en medio de la partida
+    import shutil
+    import tempfile
+
+    from validador import ErrorEsquema
+    with open(os.path.join(AQUI, 'tetris.brik')) as f:
+        texto = f.read()
+    directorio = tempfile.mkdtemp()
+    try:
+        rota = os.path.join(directorio, 'tetris.brik')
+        with open(rota, 'w') as f:
+            f.write(texto.replace('puntos_por_nivel : 1000', "puntos_por_nivel : 'mil'"))
+        try:
+            tablas.cargar_tetris(rota)
+        except ErrorEsquema as e:
+            print("regla invalida rechazada al cargar: {}".format(e.errores[0]))
+        else:
+            raise AssertionError("cargar_tetris acepto puntos_por_nivel: 'mil'")
+    finally:
+        shutil.rmtree(directorio)
+
+
+# -------------------- JUEGOS --------------------
+def bench_snake():
+    from collections import deque
+
+    import juegos
+    pasos = 2000
+    anterior = None
+    for largo in (10, 1000, 10000):
+        # serpiente recta en un tablero de 3 filas con lugar para avanzar
+        juego = juegos.JuegoSnake(cols=largo + pasos + 1, rows=3, obstaculos_cantidad=0)
+        juego.cuerpo = deque((x, 1) for x in range(largo))
+        juego.comidas = juegos.ComidasSnake()
+        juego.dir = (1, 0)
+        juego._reindexar()
+        dt = 1.0 / juego.velocidad
+
+        def correr():
+            for _ in range(pasos):
+                juego.paso(dt)
+
+        t = _cronometrar(correr)
+        if juego.muerto:
+            raise AssertionError("la serpiente murió durante la medición")
+        por_paso = t / pasos * 1e6
+        print("largo {:>6}: {:6.2f} us/paso".format(largo, por_paso))
+        anterior = anterior or por_paso
+    if por_paso > anterior * 3:
+        raise AssertionError("el costo por paso crece con el largo de la serpiente")
+
+
+def bench_comidas():
+    import random
+
+    import juegos
+    anterior = None
+    for cantidad in (10, 100, 1000, 10000):
+        # tablero ancho, serpiente en la fila del medio y comidas fuera de ella
+        juego = juegos.JuegoSnake(cols=200, rows=101, obstaculos_cantidad=0, semilla=1)
+        azar = random.Random(cantidad)
+        tipos = sorted(juego.tipos_comida)
+        while len(juego.comidas) < cantidad:
+            x, y = azar.randrange(juego.cols), azar.randrange(juego.rows)
+            if y != juego.rows // 2 and juego.comidas.en(x, y) is None:
+                juego._agregar_comida(azar.choice(tipos), x, y)
+
+        # 6 s de juego: no vence ninguna (la más corta dura 8 s), así que el
+        # paso no debería depender de cuántas hay
+        t = _cronometrar(lambda: [juego.paso(0.04) for _ in range(150)])
+        por_paso = t / 150 * 1e6
+        # otros 6 s: vencen las especiales, sólo se tocan esas
+        antes = len(juego.comidas)
+        t_venc = _cronometrar(lambda: [juego.paso(0.04) for _ in range(150)])
+        vencidas = antes - len(juego.comidas)
+        if juego.muerto:
+            raise AssertionError("la serpiente murió durante la medición")
+        if any(c.vence <= juego.tiempo for c in juego.comidas):
+            raise AssertionError("quedaron comidas vencidas en el tablero")
+        # _muertas cuenta exactamente las entradas del heap ya quitadas: las
+        # que salieron por vencidas() no se cuentan
+        comidas = juego.comidas
+        muertas = sum(1 for e in comidas._heap if comidas.en(e[2].x, e[2].y) is not e[2])
+        if comidas._muertas != muertas:
+            raise AssertionError("{} entradas muertas en el heap y _muertas dice {}".format(
+                muertas, comidas._muertas))
+        print("{:>6} comidas: {:6.2f} us/paso sin vencimientos; {:>5} vencidas en {:.2f} ms".format(
+            cantidad, por_paso, vencidas, t_venc * 1000))
+        anterior = anterior or por_paso
+    if por_paso > anterior * 3:
+        raise AssertionError("el costo por paso crece con la cantidad de comidas")
+
+
+def _colision_listas(tablero, cols, rows, forma, x, y):
+    # la versión anterior de JuegoTetris._collide, como referencia
+    for j, fila in enumerate(forma):
+        for i, v in enumerate(fila):
+            if v:
+                bx, by = x + i, y + j
+                if bx < 0 or bx >= cols or by < 0 or by >= rows:
+                    return True
+                if tablero[by][bx]:
+                    return True
+    return False
+
+
+# _collide con máscaras precalculadas contra la versión con listas: se
+# mide ~3.5x en py3 y ~2.5x en py2 (la llamada al método ya cuesta la
+# mitad); por debajo de esto es una regresión
+MIN_VENTAJA_COLISION = 3.0 if sys.version_info[0] >= 3 else 2.0
+
+
+def bench_tetris():
+    import random
+
+    import juegos
+    juego = juegos.JuegoTetris()
+    azar = random.Random(7)
+    # la mitad de abajo del tablero con huecos al azar
+    juego.tablero = [[0] * juego.cols if y < juego.rows // 2 else
+                     [int(azar.random() < 0.7) for _ in range(juego.cols)]
+                     for y in range(juego.rows)]
+    tablero = [list(f) for f in juego.tablero]
+    # la pieza actual sólo cambia al aparecer otra: se mide _collide
+    # con la pieza ya elegida, casos (r, x, y) agrupados por pieza
+    casos = [(p, [(r, x, y) for r in range(len(p.rots))
+                  for x in range(-1, juego.cols) for y in range(juego.rows)])
+             for p in juego.pieces]
+    n = sum(len(c) for _, c in casos)
+
+    def bits():
+        for p, cs in casos:
+            juego.current = p
+            collide = juego._collide
+            for r, x, y in cs:
+                collide(x, y, r)
+
+    def listas():
+        cols, rows = juego.cols, juego.rows
+        for p, cs in casos:
+            juego.current = p
+            for r, x, y in cs:
+                _colision_listas(tablero, cols, rows, p.rots[r], x, y)
+
+    for p, cs in casos:
+        juego.current = p
+        for r, x, y in cs:
+            if juego._collide(x, y, r) != _colision_listas(tablero, juego.cols, juego.rows, p.rots[r], x, y):
+                raise AssertionError("colisión distinta en {} rot {} ({}, {})".format(p.name, r, x, y))
+
+    # las figuras de tetris.brik vienen en matrices con relleno: (x, y) es
+    # la esquina de la matriz, la colisión es la de la matriz completa y
+    # rotar en el medio del tablero gira dentro de ella sin correrse
+    import tablas
+    from lexer import parse_file
+    ruta = os.path.join(AQUI, 'tetris.brik')
+    ast = parse_file(ruta)
+    brik = juegos.JuegoTetris(tablas=tablas.cargar_tetris(ruta))
+    brik.tablero = [[0] * brik.cols if y < brik.rows // 2 else
+                    [int(azar.random() < 0.7) for _ in range(brik.cols)]
+                    for y in range(brik.rows)]
+    tablero_brik = [list(f) for f in brik.tablero]
+    for p in brik.pieces:
+        matrices = ast['figura_' + p.name]['rotaciones']
+        brik.tablero = tablero_brik
+        brik.current = p
+        for r, matriz in enumerate(matrices):
+            for x in range(-4, brik.cols + 1):
+                for y in range(-4, brik.rows + 1):
+                    if brik._collide(x, y, r) != _colision_listas(tablero_brik, brik.cols, brik.rows, matriz, x, y):
+                        raise AssertionError("colisión distinta en {} rot {} ({}, {}) de tetris.brik".format(
+                            p.name, r, x, y))
+        brik.filas = [0] * brik.rows
+        brik.px, brik.py, brik.rot = brik.cols // 2 - 2, brik.rows // 2, 0
+        for _ in range(2 * len(matrices)):
+            rot = brik._rotacion()
+            x0, y0 = rot.caja
+            celdas = set((brik.px + x0 + i, brik.py + y0 + j) for i, j in rot.celdas)
+            esperado = set((brik.px + i, brik.py + j) for j, fila in enumerate(matrices[brik.rot])
+                           for i, v in enumerate(fila) if v)
+            if celdas != esperado:
+                raise AssertionError("{} rot {}: la pieza no ocupa las celdas de su matriz".format(p.name, brik.rot))
+            px = brik.px
+            brik.manejar_input('Up')
+            if brik.px != px:
+                raise AssertionError("{}: la pieza se corrió al rotar en un tablero vacío".format(p.name))
+
+    # alternadas, para que un cambio de frecuencia de la CPU no caiga
+    # todo sobre una de las dos y haga saltar el mínimo de abajo
+    t_bits = t_listas = None
+    for _ in range(7):
+        t_bits = min(t_bits or 1e9, _cronometrar(bits))
+        t_listas = min(t_listas or 1e9, _cronometrar(listas))
+    t_bits, t_listas = t_bits / n * 1e6, t_listas / n * 1e6
+    print("colisión: {:.3f} us con bits, {:.3f} us con listas ({:.1f}x)".format(
+        t_bits, t_listas, t_listas / t_bits))
+    if t_listas < t_bits * MIN_VENTAJA_COLISION:
+        raise AssertionError("_collide es menos de {:.1f}x más rápida que la versión con listas".format(
+            MIN_VENTAJA_COLISION))
+
+    # partida sin pantalla: bajar cada pieza hasta fijarla, con cada generador
+    pasos = 20000
+    for nombre in sorted(juegos.GENERADORES):
+        juego = juegos.JuegoTetris(generador=nombre, semilla=11)
+
+        def jugar():
+            for _ in range(pasos):
+                juego.manejar_input('s')
+                if juego.terminado:
+                    juego.reiniciar()
+
+        t = _cronometrar(jugar)
+        print("partida ({}): {:.0f} pasos/s".format(nombre, pasos / t))
+
+
+def bench_simulacion():
+    import simulacion
+
+    for nombre in sorted(simulacion.JUEGOS):
+        pasos, segundos, _ = simulacion.simular(
+            lambda n: simulacion.crear_juego(nombre, semilla=n), partidas=20, pasos=5000,
+            politica=simulacion.politica_azar)
+        print("{:<7} {:>7} pasos sin pantalla: {:.0f} pasos/s".format(
+            nombre, pasos, pasos / segundos))
+
+
+def _huella(juego):
+    # estado visible de una partida, para comparar ejecuciones
+    if hasattr(juego, 'cuerpo'):
+        return (list(juego.cuerpo), juego.dir, juego.puntaje, juego.muerto,
+                sorted((c.x, c.y, c.tipo) for c in juego.comidas), juego.obstaculos)
+    return (list(juego.filas), juego.indice, juego.px, juego.py, juego.rot, juego.puntaje, juego.terminado)
+
+
+# huella de las partidas de referencia de bench_repeticion: cambia sólo si
+# cambia la simulación (y entonces las repeticiones grabadas ya no sirven)
+HUELLA_PARTIDAS = 'f161503d8f50b9d305dae089d9b84df91f8156db'
+
+
+def _estado_portable(juego):
+    # estado con repr igual en py2 y py3 (sin floats)
+    if hasattr(juego, 'cuerpo'):
+        return (list(juego.cuerpo), sorted(juego.obstaculos),
+                sorted((c.x, c.y, str(c.tipo)) for c in juego.comidas), juego.puntaje)
+    return (list(juego.filas), juego.indice, juego.px, juego.py, juego.rot, juego.puntaje)
+
+
+def bench_repeticion():
+    from repeticion import Grabadora, Repeticion, Reproductor, huella_reglas
+    from simulacion import politica_azar
+
+    for nombre in ('snake', 'tetris'):
+        reps = []
+        huellas = []
+        for n in range(20):
+            grabadora = Grabadora(nombre, semilla=n)
+            politica = politica_azar(n)
+            for tick in range(3000):
+                tecla = politica(grabadora.juego, tick)
+                if tecla is not None:
+                    grabadora.tecla(tecla)
+                if tick % 700 == 699:
+                    grabadora.tecla('r')
+                grabadora.paso()
+            reps.append(Repeticion.desde_bytes(grabadora.repeticion.a_bytes()))
+            huellas.append(_huella(grabadora.juego))
+
+        tamano = sum(len(r.a_bytes()) for r in reps)
+        ticks = sum(r.ticks for r in reps)
+
+        def reproducir():
+            for rep, huella in zip(reps, huellas):
+                if _huella(Reproductor(rep).correr()) != huella:
+                    raise AssertionError("la repetición de {} no reproduce la partida".format(nombre))
+
+        t = _cronometrar(reproducir)
+        print("{:<7} {} ticks en {} bytes ({:.2f} bytes/tick), reproducidos a {:.0f} ticks/s".format(
+            nombre, ticks, tamano, float(tamano) / ticks, ticks / t))
+
+        # ir_a hacia atrás y hacia adelante da lo mismo que reproducir hasta ahí
+        reproductor = Reproductor(reps[0])
+        for tick in (2500, 400, 1999, 3000):
+            reproductor.ir_a(tick)
+            directo = Reproductor(reps[0])
+            directo.ir_a(tick)
+            if _huella(reproductor.juego) != _huella(directo.juego):
+                raise AssertionError("ir_a({}) no coincide en {}".format(tick, nombre))
+
+    # la misma semilla y las mismas teclas dan la misma partida en py2 y en
+    # py3: el estado final se compara con una huella fija
+    import hashlib
+    h = hashlib.sha1()
+    for nombre in ('snake', 'tetris'):
+        for semilla in range(5):
+            grabadora = Grabadora(nombre, semilla=semilla)
+            for tick in range(2000):
+                if tick % 9 == 0:
+                    grabadora.tecla('wdsa'[(tick // 9 + semilla) % 4])
+                if tick % 500 == 499:
+                    grabadora.tecla('r')
+                grabadora.paso()
+            h.update(repr(_estado_portable(grabadora.juego)).encode('ascii'))
+    if h.hexdigest() != HUELLA_PARTIDAS:
+        raise AssertionError("las partidas de referencia cambiaron (huella {}): la simulación o el azar "
+                             "ya no son los mismos; subir repeticion.VERSION y HUELLA_PARTIDAS".format(h.hexdigest()))
+    print("partidas de referencia iguales a la huella fija (py{})".format(sys.version_info[0]))
+
+    # las reglas se buscan por huella: otra ruta con el mismo contenido sirve,
+    # un contenido distinto no
+    import shutil
+    import tempfile
+    ruta = os.path.join(AQUI, 'snake.brik')
+    grabadora = Grabadora('snake', semilla=1, reglas=ruta)
+    for _ in range(200):
+        grabadora.paso()
+    rep = Repeticion.desde_bytes(grabadora.repeticion.a_bytes())
+    directorio = tempfile.mkdtemp()
+    try:
+        copia = os.path.join(directorio, 'otra.brik')
+        shutil.copy(ruta, copia)
+        if Reproductor(rep, [copia]).reglas != copia:
+            raise AssertionError("no se usaron las reglas indicadas con la misma huella")
+        with open(copia, 'a') as f:
+            f.write("\n[regla_extra] : { puntos_por_nivel: 7 }\n")
+        if Reproductor(rep, [copia]).reglas != ruta:
+            raise AssertionError("se usaron reglas con otra huella")
+        rep.huella = huella_reglas(copia)
+        try:
+            Reproductor(rep)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("se reprodujo sin encontrar las reglas de la grabación")
+    finally:
+        shutil.rmtree(directorio)
+
+    # una repetición de una versión anterior se rechaza al cargarla
+    import repeticion
+    datos = bytearray(reps[0].a_bytes())
+    datos[4] = repeticion.VERSION - 1
+    try:
+        Repeticion.desde_bytes(bytes(datos))
+    except ValueError as e:
+        print("version vieja rechazada: {}".format(e))
+    else:
+        raise AssertionError("se cargó una repetición de la versión {}".format(repeticion.VERSION - 1))
+
+
+def _codicioso(juego, azar):
+    # acción hacia la comida más cercana sin chocar en el próximo paso
+    from juegos import CUERPO, OBSTACULO
+
+    hx, hy = juego.cuerpo[-1]
+    opciones = []
+    for accion, (dx, dy) in ((1, (0, -1)), (2, (0, 1)), (3, (-1, 0)), (4, (1, 0))):
+        nx, ny = hx + dx, hy + dy
+        if (dx, dy) == (-juego.dir[0], -juego.dir[1]):
+            continue
+        if not (0 <= nx < juego.cols and 0 <= ny < juego.rows):
+            continue
+        if juego.ocupacion.get(nx, ny) in (CUERPO, OBSTACULO):
+            continue
+        d = min([abs(c.x - nx) + abs(c.y - ny) for c in juego.comidas] or [0])
+        opciones.append((d, azar.random(), accion))
+    if opciones and azar.random() < 0.95:
+        return min(opciones)[2]
+    return azar.randrange(5)
+
+
+def _estado_snake(juego):
+    return (list(juego.cuerpo), juego.dir, juego.puntaje, juego.muerto, juego.velocidad, juego._acum,
+            [(c.x, c.y, c.tipo, c.puntos, c.vence) for c in juego.comidas],
+            sorted(juego.obstaculos), list(juego.ocupacion.celdas))
+
+
+def _estado_lote_snake(lote, i):
+    return (lote.cuerpo(i), (int(lote.dx[i]), int(lote.dy[i])), int(lote.puntaje[i]), bool(lote.muerto[i]),
+            float(lote.velocidad[i]), float(lote.acum[i]), lote.comidas(i), sorted(lote.obstaculos(i)),
+            lote.celdas[i, :lote.cols * lote.rows].tolist())
+
+
+def _comparar_lote_snake(n, pasos, semilla, opciones, dt=0.04, reinicio=500):
+    # LoteSnake contra n JuegoSnake que leen la misma cinta de azar
+    import random
+
+    import numpy as np
+
+    import juegos
+    from lote_snake import AzarCinta, LoteSnake
+
+    teclas = (None, 'w', 's', 'a', 'd')
+    azar = random.Random(semilla)
+    lote = LoteSnake(n, semilla=semilla, **opciones)
+    escalares = [juegos.JuegoSnake(**opciones) for _ in range(n)]
+
+    def reiniciar(mascara):
+        cinta = lote.azar_pendiente(lote.obstaculos_cantidad + 2)
+        for i in np.nonzero(mascara)[0]:
+            escalares[i].rng = AzarCinta(cinta[i])
+            escalares[i].reiniciar()
+        lote.reiniciar(mascara)
+
+    reiniciar(np.ones(n, dtype=bool))
+    for t in range(pasos):
+        if t % reinicio == reinicio - 1:
+            reiniciar(lote.muerto)
+        acciones = np.array([_codicioso(juego, azar) for juego in escalares])
+        cinta = lote.azar_pendiente(4)
+        cursor = lote.cursor.copy()
+        for i, juego in enumerate(escalares):
+            juego.rng = AzarCinta(cinta[i])
+            juego.manejar_input(teclas[acciones[i]])
+            juego.paso(dt)
+        lote.dirigir(acciones)
+        lote.paso(dt)
+        for i, juego in enumerate(escalares):
+            if _estado_snake(juego) != _estado_lote_snake(lote, i) or \
+                    juego.rng.leidos != lote.cursor[i] - cursor[i]:
+                raise AssertionError("LoteSnake difiere de JuegoSnake en el paso {}, partida {} ({})".format(
+                    t, i, opciones))
+    return int(lote.puntaje.max()), int(lote.largo.max())
+
+
+def bench_lote_snake():
+    try:
+        import numpy as np
+    except ImportError:
+        print("numpy no instalado")
+        return
+    import tablas
+    from lote_snake import LoteSnake
+
+    casos = [
+        {},
+        {'cols': 6, 'rows': 5, 'obstaculos_cantidad': 3},
+        {'cols': 4, 'rows': 4, 'obstaculos_cantidad': 20, 'velocidad': 30.0},
+        {'tablas': tablas.cargar_snake(os.path.join(AQUI, 'snake.brik'))},
+    ]
+    for semilla, opciones in enumerate(casos):
+        puntaje, largo = _comparar_lote_snake(20, 1500, semilla, opciones)
+        print("igual a JuegoSnake: 20 partidas x 1500 pasos (puntaje max {}, largo max {})".format(
+            puntaje, largo))
+
+    for n in (1, 10, 100, 1000, 10000, 100000):
+        lote = LoteSnake(n, semilla=n)
+        azar = np.random.default_rng(n)
+        pasos = max(20, min(1000, 200000 // n))
+        acciones = azar.integers(0, 5, (pasos, n))
+
+        def correr():
+            for k in range(pasos):
+                lote.dirigir(acciones[k])
+                lote.paso(0.04)
+                if k % 50 == 49:
+                    lote.reiniciar(lote.muerto)
+
+        t = _cronometrar(correr)
+        print("lote de {:>6}: {:>10.0f} pasos de partida/s".format(n, n * pasos / t))
+
+
+def _tableros_tetris(n, semilla):
+    # tableros realistas: partidas con piezas soltadas en columnas al azar
+    import random
+
+    import juegos
+
+    azar = random.Random(semilla)
+    juego = juegos.JuegoTetris(semilla=semilla)
+    tableros = []
+    while len(tableros) < n:
+        for _ in range(azar.randrange(4)):
+            juego.manejar_input('w')
+        for _ in range(azar.randrange(6)):
+            juego.manejar_input(azar.choice('ad'))
+        while not juego.terminado:
+            y = juego.py
+            juego.manejar_input('s')
+            if juego.py <= y:
+                break   # se fijó y apareció la siguiente
+        if juego.terminado:
+            juego.reiniciar()
+        tableros.append(list(juego.filas))
+    return tableros
+
+
+def _colocaciones_escalar(juego, filas, pieza):
+    # (rot, x) -> (y, filas resultantes, líneas) con JuegoTetris._collide;
+    # x e y de la matriz de la pieza, como px y py
+    res = {}
+    aparicion = juego.cols // 2 - 2
+    for r, rot in enumerate(pieza.info):
+        x0, y0 = rot.caja
+        posibles = juego.cols - rot.ancho + 1
+        if posibles <= 0 or rot.alto + y0 > juego.rows:
+            continue
+        juego.filas = list(filas)
+        juego.current = pieza
+        inicio = min(max(aparicion + x0, 0), posibles - 1) - x0
+        for paso in (1, -1):
+            x = inicio
+            while -x0 <= x < posibles - x0 and not juego._collide(x, 0, r):
+                y = 0
+                while not juego._collide(x, y + 1, r):
+                    y += 1
+                juego.filas = list(filas)
+                juego.current, juego.px, juego.py, juego.rot = pieza, x, y, r
+                puntaje = juego.puntaje
+                juego._fix()
+                res[(r, x)] = (y, list(juego.filas), juego.puntaje - puntaje)
+                # _fix hizo aparecer otra pieza: volver a la que se prueba
+                juego.filas = list(filas)
+                juego.current = pieza
+                x += paso
+    return res
+
+
+def _caracteristicas_escalar(filas, cols):
+    # (alturas, huecos, irregularidad, altura total) recorriendo celdas
+    alturas, huecos = [], 0
+    for x in range(cols):
+        columna = [(f >> x) & 1 for f in filas]
+        tope = columna.index(1) if 1 in columna else len(filas)
+        alturas.append(len(filas) - tope)
+        huecos += columna[tope:].count(0)
+    irregularidad = sum(abs(a - b) for a, b in zip(alturas, alturas[1:]))
+    return alturas, huecos, irregularidad, sum(alturas)
+
+
+def bench_lote_tetris():
+    try:
+        import numpy as np
+    except ImportError:
+        print("numpy no instalado")
+        return
+    import juegos
+    import lote_tetris
+
+    import tablas
+
+    filas = _tableros_tetris(300, 5)
+    juego = juegos.JuegoTetris()
+    # las figuras de tetris.brik traen relleno en sus matrices (caja != 0)
+    brik = juegos.JuegoTetris(tablas=tablas.cargar_tetris(os.path.join(AQUI, 'tetris.brik')))
+    if (brik.cols, brik.rows) != (juego.cols, juego.rows):
+        raise AssertionError("tetris.brik ya no es de {}x{}".format(juego.cols, juego.rows))
+    tableros = np.array(filas, dtype=np.int64)
+    for jugador, pieza in [(juego, p) for p in juegos.PIEZAS_TETRIS] + [(brik, p) for p in brik.pieces]:
+        col = lote_tetris.colocaciones(tableros, pieza, juego.cols)
+        for b in range(len(filas)):
+            esperado = _colocaciones_escalar(jugador, filas[b], pieza)
+            obtenido = {}
+            for p in np.nonzero(col.validas[b])[0]:
+                resultado = [int(m) for m in col.tableros[b, p]]
+                obtenido[(int(col.rot[p]), int(col.x[p]))] = (int(col.y[b, p]), resultado, int(col.lineas[b, p]))
+                caract = ([int(a) for a in col.alturas[b, p]], int(col.huecos[b, p]),
+                          int(col.irregularidad[b, p]), int(col.altura_total[b, p]))
+                if caract != _caracteristicas_escalar(resultado, juego.cols):
+                    raise AssertionError("características distintas en el tablero {}".format(b))
+            if obtenido != esperado:
+                raise AssertionError("colocaciones de {} distintas en el tablero {}".format(pieza.name, b))
+    print("colocaciones y características iguales a JuegoTetris en {} tableros x {} piezas".format(
+        len(filas), len(juegos.PIEZAS_TETRIS) + len(brik.pieces)))
+
+    for n in (1, 100, 10000):
+        pila = tableros[np.arange(n) % len(tableros)]
+        muestra = [filas[i % len(filas)] for i in range(min(n, 300))]
+        t_lote = _cronometrar(lambda: [lote_tetris.mejores(lote_tetris.colocaciones(pila, p, juego.cols))
+                                       for p in juegos.PIEZAS_TETRIS], 3)
+        t_escalar = _cronometrar(lambda: [_colocaciones_escalar(juego, f, p)
+                                          for f in muestra for p in juegos.PIEZAS_TETRIS])
+        por_tablero = t_escalar / len(muestra)
+        print("{:>6} tableros x 7 piezas: {:8.2f} ms con numpy, {:8.2f} ms con JuegoTetris ({:.0f}x)".format(
+            n, t_lote * 1000, por_tablero * n * 1000, por_tablero * n / t_lote))
+
+
+# -------------------- DIBUJO --------------------
+class _CanvasContador(object):
+    # canvas falso: sólo cuenta las llamadas que llegarían a Tk
+    def __init__(self):
+        self.llamadas = 0
+        self._sig = 0
+
+    def _crear(self, *a, **kw):
+        self.llamadas += 1
+        self._sig += 1
+        return self._sig
+
+    create_rectangle = create_line = create_text = create_image = _crear
+
+    def _llamar(self, *a, **kw):
+        self.llamadas += 1
+
+    delete = itemconfig = coords = tag_raise = tag_lower = _llamar
+
+
+def _modulo_tk():
+    try:
+        import tkinter as tk
+    except ImportError:
+        try:
+            import Tkinter as tk
+        except ImportError:
+            return None
+    return tk
+
+
+def _canvas_tk():
+    # un canvas de verdad si hay pantalla; (raiz, canvas) o (None, None)
+    tk = _modulo_tk()
+    if tk is None:
+        return None, None
+    try:
+        raiz = tk.Tk()
+    except tk.TclError:
+        return None, None
+    canvas = tk.Canvas(raiz, width=1000, height=700)
+    canvas.pack()
+    return raiz, canvas
+
+
+def _estilos_snake(juego, pad_comida=3):
+    # lo mismo que arma RetroApp._render_snake (colores aparte)
+    estilos = {}
+    for pos in juego.obstaculos:
+        estilos[pos] = ('#666666', 0)
+    for c in juego.comidas:
+        estilos[(c.x, c.y)] = ('#ff4d4d', pad_comida)
+    for pos in juego.cuerpo:
+        estilos[pos] = ('#70ff9a', 1)
+    if juego.cuerpo:
+        estilos[juego.cuerpo[-1]] = ('#00d0ff', 1)
+    return estilos
+
+
+def _cuadro_completo(canvas, cols, rows, cell, estilos):
+    # como antes: borrar todo y volver a crear tablero, grilla y celdas
+    canvas.delete('all')
+    canvas.create_rectangle(0, 0, cols * cell, rows * cell, fill='#071316')
+    for i in range(cols + 1):
+        canvas.create_line(i * cell, 0, i * cell, rows * cell, fill='#082014')
+    for j in range(rows + 1):
+        canvas.create_line(0, j * cell, cols * cell, j * cell, fill='#082014')
+    for (x, y), (relleno, pad) in estilos.items():
+        canvas.create_rectangle(x * cell + pad, y * cell + pad, (x + 1) * cell - pad, (y + 1) * cell - pad,
+                                fill=relleno, outline='#06120f')
+    canvas.create_text(0, rows * cell, anchor='nw', text='Puntos')
+
+
+def _cuadros_snake(cols, rows, obstaculos, cuadros, semilla=3):
+    # estilos de cada cuadro de una partida con teclas al azar (reinicia al morir)
+    import juegos
+    import simulacion
+
+    sim = simulacion.Simulacion(juegos.JuegoSnake(cols=cols, rows=rows, obstaculos_cantidad=obstaculos, semilla=semilla),
+                                entradas=simulacion.politica_azar(semilla, 0.1))
+    res = []
+    for _ in range(cuadros):
+        if sim.juego.muerto:
+            sim.aplicar('r')
+        sim.paso()
+        res.append(_estilos_snake(sim.juego))
+    return res
+
+
+def bench_lienzo():
+    from lienzo import CeldasRetenidas, Escena
+
+    raiz, tk_canvas = _canvas_tk()
+    for cols, rows, obstaculos, cell in ((28, 20, 8, 24), (200, 140, 600, 4)):
+        cuadros = _cuadros_snake(cols, rows, obstaculos, 500)
+        contador = _CanvasContador()
+        for estilos in cuadros:
+            _cuadro_completo(contador, cols, rows, cell, estilos)
+        completo = contador.llamadas
+
+        contador = _CanvasContador()
+        celdas = CeldasRetenidas(contador, cols, rows, 0, 0, cell)
+        construir = contador.llamadas
+        cambios = sum(celdas.actualizar(estilos) for estilos in cuadros)
+        retenido = contador.llamadas - construir
+        if retenido > 2 * cambios:
+            raise AssertionError("el dibujo retenido tocó celdas que no cambiaron")
+        print("{}x{}: {:.1f} llamadas a Tk por cuadro redibujando todo, {:.2f} retenido "
+              "({} al construir)".format(cols, rows, float(completo) / len(cuadros),
+                                        float(retenido) / len(cuadros), construir))
+
+        if tk_canvas is not None:
+            def completo_tk():
+                for estilos in cuadros:
+                    _cuadro_completo(tk_canvas, cols, rows, cell, estilos)
+                raiz.update_idletasks()
+
+            def retenido_tk():
+                tk_canvas.delete('all')
+                celdas = CeldasRetenidas(tk_canvas, cols, rows, 0, 0, cell)
+                for estilos in cuadros:
+                    celdas.actualizar(estilos)
+                raiz.update_idletasks()
+            t_completo, t_retenido = _cronometrar(completo_tk), _cronometrar(retenido_tk)
+            print("    Tk: {:.3f} ms por cuadro redibujando todo, {:.3f} ms retenido (con la construcción)".format(
+                t_completo * 1000 / len(cuadros), t_retenido * 1000 / len(cuadros)))
+
+    # capa CRT: antes se borraban y creaban alto/2 líneas en cada cuadro
+    contador = _CanvasContador()
+    escena = Escena(contador)
+
+    def crt(tag):
+        for y in range(0, 500, 2):
+            contador.create_line(0, y, 800, y, fill='black', tags=tag)
+    for _ in range(100):
+        escena.capa('crt', (800, 500), crt)
+    if contador.llamadas > 251:
+        raise AssertionError("la capa CRT se reconstruyó sin cambiar de tamaño")
+    print("CRT 800x500, 100 cuadros: {} llamadas a Tk en capa fija, {} recreándola".format(
+        contador.llamadas, 100 * 251))
+
+    if raiz is None:
+        print("sin pantalla: tiempos con Tk omitidos")
+    else:
+        raiz.destroy()
+
+
+class _ImagenContador(object):
+    # PhotoImage falsa: cuenta los put
+    def __init__(self):
+        self.puts = 0
+
+    def put(self, datos, to=None):
+        self.puts += 1
+
+
+def bench_framebuffer():
+    from lienzo import CeldasImagen, CeldasRetenidas
+
+    raiz, tk_canvas = _canvas_tk()
+    for cols, rows, obstaculos, cell in ((200, 140, 600, 4), (600, 500, 6000, 1)):
+        cuadros = _cuadros_snake(cols, rows, obstaculos, 300)
+
+        contador = _CanvasContador()
+        items = CeldasRetenidas(contador, cols, rows, 0, 0, cell)
+        construir_items = contador.llamadas
+        t_items = _cronometrar(lambda: [items.actualizar(e) for e in cuadros])
+        llamadas_items = contador.llamadas - construir_items
+
+        contador, imagen = _CanvasContador(), _ImagenContador()
+        fb = CeldasImagen(contador, imagen, cols, rows, 0, 0, cell, '#071316')
+        construir_fb = contador.llamadas + imagen.puts
+        t_fb = _cronometrar(lambda: [fb.actualizar(e) for e in cuadros])
+        llamadas_fb = contador.llamadas + imagen.puts - construir_fb
+        print("{}x{}: construir {} llamadas con items, {} con framebuffer; por cuadro {:.2f} / {:.2f} "
+              "llamadas, {:.3f} / {:.3f} ms de Python".format(
+                  cols, rows, construir_items, construir_fb,
+                  float(llamadas_items) / len(cuadros), float(llamadas_fb) / len(cuadros),
+                  t_items * 1000 / len(cuadros), t_fb * 1000 / len(cuadros)))
+
+        if tk_canvas is not None:
+            tk = _modulo_tk()
+
+            def con_tk(fabrica):
+                tk_canvas.delete('all')
+                t0 = time.time()
+                celdas = fabrica()
+                raiz.update()
+                construir = time.time() - t0
+                t0 = time.time()
+                for estilos in cuadros:
+                    celdas.actualizar(estilos)
+                    raiz.update()
+                return construir, (time.time() - t0) / len(cuadros)
+
+            resultados = [('framebuffer', con_tk(lambda: CeldasImagen(
+                tk_canvas, tk.PhotoImage(width=cols * cell, height=rows * cell),
+                cols, rows, 0, 0, cell, '#071316')))]
+            if cols * rows <= 100000:
+                resultados.append(('items', con_tk(lambda: CeldasRetenidas(
+                    tk_canvas, cols, rows, 0, 0, cell))))
+            for nombre, (construir, cuadro) in resultados:
+                print("    Tk {:<11}: construir {:8.1f} ms, {:.3f} ms por cuadro".format(
+                    nombre, construir * 1000, cuadro * 1000))
+    if raiz is None:
+        print("sin pantalla: tiempos con Tk omitidos")
+    else:
+        raiz.destroy()
+
+
+def bench_planificador():
+    import simulacion
+    from planificador import Planificador
+
+    # reloj falso: cada cuadro "tarda" `trabajo` y después espera lo que
+    # diga el planificador (after con hora límite) o TICK_MS fijos
+    duracion = 60.0
+    for trabajo in (0.0, 0.010, 0.030, 0.060):
+        reloj = [0.0]
+        plan = Planificador(reloj=lambda: reloj[0])
+        cuadros = pasos = 0
+        while reloj[0] < duracion:
+            pasos += plan.pasos()
+            cuadros += 1
+            reloj[0] += trabajo
+            reloj[0] += plan.espera() / 1000.0
+        if abs(pasos / duracion - 1.0 / plan.dt) > 0.5:
+            raise AssertionError("la simulación derivó: {:.2f} pasos/s".format(pasos / duracion))
+        print("dibujo de {:3.0f} ms: {:5.1f} cuadros/s y {:5.2f} pasos/s con hora límite; "
+              "{:5.1f} cuadros/s con after fijo".format(
+                  trabajo * 1000, cuadros / duracion, pasos / duracion, 1.0 / (plan.periodo + trabajo)))
+
+    # dibujo sólo cuando cambia la versión de lo que se ve
+    for nombre in ('snake', 'tetris'):
+        sim = simulacion.Simulacion(simulacion.crear_juego(nombre, 4), entradas=simulacion.politica_azar(4, 0.05))
+        plan = Planificador()
+        dibujados = 0
+        for _ in range(3000):
+            if simulacion.terminado(sim.juego):
+                sim.aplicar('r')
+            sim.paso()
+            dibujados += plan.dibujar((sim.juego.version, int(getattr(sim.juego, 'tiempo', 0))))
+        print("{}: se dibujan {:.0f}% de los cuadros".format(nombre, 100.0 * dibujados / 3000))
+
+
+def _memoria(fn):
+    # (resultado, bytes asignados que siguen vivos); None sin tracemalloc (py2)
+    try:
+        import tracemalloc
+    except ImportError:
+        return fn(), None
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.get_traced_memory()[0]
+        resultado = fn()
+        return resultado, tracemalloc.get_traced_memory()[0] - antes
+    finally:
+        tracemalloc.stop()
+
+
+def bench_mundo():
+    import random
+
+    import juegos
+    from lienzo import Camara, CeldasRetenidas
+
+    # la ocupación dispersa responde igual que la densa
+    for cols, rows in ((130, 70), (64, 64), (7, 300)):
+        densa, dispersa = juegos.Ocupacion(cols, rows), juegos.OcupacionDispersa(cols, rows)
+        azar = random.Random(cols)
+        for _ in range(20000):
+            x, y = azar.randrange(cols), azar.randrange(rows)
+            tipo = azar.choice([juegos.LIBRE, juegos.LIBRE, juegos.CUERPO, juegos.OBSTACULO, juegos.COMIDA])
+            densa.marcar(x, y, tipo)
+            dispersa.marcar(x, y, tipo)
+            if densa.get(x, y) != dispersa.get(x, y):
+                raise AssertionError("get distinto en ({}, {})".format(x, y))
+            if azar.random() < 0.05:
+                xs = sorted(azar.randrange(-5, cols + 5) for _ in range(2))
+                ys = sorted(azar.randrange(-5, rows + 5) for _ in range(2))
+                rect = (xs[0], ys[0], xs[1], ys[1])
+                if sorted(densa.en_rect(*rect)) != sorted(dispersa.en_rect(*rect)):
+                    raise AssertionError("en_rect distinto en {}".format(rect))
+        if dispersa.ocupadas != cols * rows - densa.n_libres:
+            raise AssertionError("la cuenta de ocupadas no coincide")
+        pos = dispersa.libre_aleatoria(azar)
+        if pos is not None and densa.get(*pos) != juegos.LIBRE:
+            raise AssertionError("libre_aleatoria devolvió una celda ocupada")
+
+    # tableros enormes: memoria y costo por cuadro según lo que hay en el
+    # tablero y lo que se ve, no según el área
+    obstaculos = 10000
+    costos = []
+    for lado in (1000, 2000, 10000):
+        t0 = time.time()
+        juego, memoria = _memoria(lambda: juegos.JuegoSnake(
+            cols=lado, rows=lado, obstaculos_cantidad=obstaculos, semilla=1))
+        t_crear = time.time() - t0
+        ocupadas = len(juego.obstaculos) + len(juego.cuerpo) + len(juego.comidas)
+        por_celda = None if memoria is None else memoria / float(ocupadas)
+        # cámara de 66x49 celdas (un lienzo de 800x600 con celdas de 12 px)
+        camara = Camara(lado, lado, 66, 49)
+        canvas = _CanvasContador()
+        celdas = CeldasRetenidas(canvas, camara.ancho, camara.alto, 0, 0, 12)
+        azar = random.Random(2)
+        llamadas = canvas.llamadas
+        cuadros = 2000
+
+        def jugar():
+            for k in range(cuadros):
+                if k % 40 == 0:
+                    juego.manejar_input(azar.choice(['Up', 'Down', 'Left', 'Right']))
+                juego.paso(0.04)
+                if juego.muerto:
+                    juego.reiniciar()
+                camara.seguir(*juego.cuerpo[-1])
+                x0, y0, x1, y1 = camara.rect()
+                celdas.actualizar(dict(((x - x0, y - y0), (tipo, 1)) for x, y, tipo
+                                       in juego.ocupacion.en_rect(x0, y0, x1, y1)))
+        t = _cronometrar(jugar)
+        costos.append(t / cuadros)
+        print("{0:>5}x{0:<5} {1:<17} crear {2:7.1f} ms, {3}; {4:6.1f} us/cuadro, {5:.1f} llamadas Tk/cuadro".format(
+            lado, type(juego.ocupacion).__name__, t_crear * 1000,
+            'memoria n/d' if memoria is None else '{:8.1f} KB ({:.0f} B por celda ocupada)'.format(
+                memoria / 1024.0, por_celda),
+            t / cuadros * 1e6, (canvas.llamadas - llamadas) / float(cuadros)))
+        if isinstance(juego.ocupacion, juegos.OcupacionDispersa) and por_celda is not None and por_celda > 2048:
+            raise AssertionError("la ocupación dispersa ocupa demasiado por celda")
+    if costos[-1] > costos[1] * 3:
+        raise AssertionError("el costo por cuadro crece con el área del tablero")
+
+
+def _jugar_con_teclas(juego, teclas, cola, duracion, trabajo=0.005):
+    # el loop de la consola con reloj falso: teclas [(hora, tecla)] que
+    # despiertan el loop al llegar, pasos de dt y `trabajo` s por dibujo.
+    # cola=None: cada tecla va al juego al llegar (como antes de la cola)
+    from planificador import Planificador
+    from simulacion import terminado
+
+    reloj = [0.0]
+    plan = Planificador(reloj=lambda: reloj[0])
+    if cola is not None:
+        cola.reloj = lambda: reloj[0]
+    muertes = 0
+    i = 0
+    while reloj[0] < duracion:
+        for _ in range(plan.pasos()):
+            if cola is not None:
+                tecla = cola.sacar(juego)
+                if tecla is not None:
+                    juego.manejar_input(tecla)
+            juego.paso(plan.dt)
+            if terminado(juego):
+                muertes += 1
+                juego.reiniciar()
+        if plan.dibujar(juego.version):
+            reloj[0] += trabajo
+            if cola is not None:
+                cola.dibujado(juego)
+        proximo = reloj[0] + plan.espera() / 1000.0
+        if i < len(teclas) and teclas[i][0] < proximo:
+            reloj[0] = max(reloj[0], teclas[i][0])
+            if cola is None:
+                juego.manejar_input(teclas[i][1])
+            else:
+                cola.poner(teclas[i][1])
+            plan.despertar()
+            i += 1
+        else:
+            reloj[0] = proximo
+    return muertes
+
+
+def bench_entradas():
+    import random
+
+    import juegos
+    from entradas import ColaEntradas
+
+    # Snake: pares de giros rápidos (arriba y enseguida de vuelta, 20 a 60
+    # ms entre uno y otro); si el segundo pisa al primero, la serpiente da
+    # la vuelta sobre sí misma y muere
+    nombres = {(1, 0): 'Right', (-1, 0): 'Left'}
+    resultados = {}
+    for modo in ('inmediato', 'cola'):
+        azar = random.Random(11)
+        juego = juegos.JuegoSnake(cols=60, rows=2000, obstaculos_cantidad=0, semilla=1)
+        horas = [1.0 + 0.6 * k + azar.uniform(0.0, 0.2) for k in range(60)]
+        sentido = [(1, 0)]
+
+        # el segundo giro de cada par es el contrario al sentido horizontal
+        def teclas_de(hora):
+            sentido[0] = (-sentido[0][0], 0)
+            return [(hora, 'Up'), (hora + azar.uniform(0.02, 0.06), nombres[sentido[0]])]
+        teclas = [t for h in horas for t in teclas_de(h)]
+        cola = ColaEntradas() if modo == 'cola' else None
+        resultados[modo] = (_jugar_con_teclas(juego, teclas, cola, horas[-1] + 1.0), cola)
+    muertes, cola = resultados['cola']
+    print("Snake, 60 pares de giros rápidos: {} muertes al aplicarlos al llegar, {} con la cola".format(
+        resultados['inmediato'][0], muertes))
+    if muertes:
+        raise AssertionError("con la cola un par de giros rápidos mató a la serpiente")
+    print("  latencia tecla -> cuadro: p50 {:.0f} ms, p90 {:.0f} ms, p99 {:.0f} ms ({} muestras)".format(
+        *(cola.percentiles() + [len(cola.latencias)])))
+
+    # Tetris: teclas al azar; cada una se ve en el cuadro siguiente a su paso
+    azar = random.Random(12)
+    juego = juegos.JuegoTetris(semilla=2)
+    teclas, hora = [], 0.0
+    for _ in range(500):
+        hora += azar.uniform(0.03, 0.3)
+        teclas.append((hora, azar.choice(['Left', 'Right', 'Up', 'Down'])))
+    cola = ColaEntradas()
+    _jugar_con_teclas(juego, teclas, cola, hora + 1.0)
+    print("Tetris, 500 teclas: latencia p50 {:.0f} ms, p90 {:.0f} ms, p99 {:.0f} ms; {} descartadas".format(
+        *(cola.percentiles() + [cola.descartadas])))
+
+
+def _estado_ocupacion(juego):
+    ocupacion = juego.ocupacion
+    return [getattr(ocupacion, campo) for campo in type(ocupacion).__slots__]
+
+
+def _ocupacion_reconstruida(juego):
+    import copy
+    otro = copy.deepcopy(juego)
+    otro._reindexar()
+    return _estado_ocupacion(otro)
+
+
+def bench_instantaneas():
+    import copy
+    import random
+
+    import juegos
+    from repeticion import Grabadora, Repeticion, Reproductor
+    from simulacion import crear_juego, politica_azar, terminado
+
+    reglas_snake = os.path.join(AQUI, 'snake.brik')
+    fabricas = [
+        ('snake', lambda s: crear_juego('snake', s)),
+        ('snake .brik', lambda s: crear_juego('snake', s, reglas_snake if os.path.exists(reglas_snake) else None)),
+        ('snake 1000x1000', lambda s: juegos.JuegoSnake(cols=1000, rows=1000, obstaculos_cantidad=500, semilla=s)),
+        ('snake 3000x3000', lambda s: juegos.JuegoSnake(cols=3000, rows=3000, obstaculos_cantidad=500, semilla=s)),
+        ('tetris', lambda s: crear_juego('tetris', s)),
+        ('tetris bolsa 40x30', lambda s: juegos.JuegoTetris(cols=40, rows=30, generador='bolsa', semilla=s)),
+    ]
+    for nombre, fabrica in fabricas:
+        # restaurar en otro juego (otra semilla) y seguir: las dos partidas
+        # tienen que ser la misma, random incluido
+        juego = fabrica(1)
+        politica = politica_azar(2, teclas=['w', 'a', 's', 'd'])
+        for tick in range(1500):
+            tecla = politica(juego, tick)
+            if tecla is not None:
+                juego.manejar_input(tecla)
+            juego.paso(0.04)
+            if terminado(juego):
+                juego.reiniciar()
+            if tick % 300 == 150:
+                copia = fabrica(99)
+                copia.restaurar(juego.instantanea())
+                if hasattr(copia, 'ocupacion') and _estado_ocupacion(copia) != _ocupacion_reconstruida(copia):
+                    raise AssertionError("{}: restaurar deja otra ocupación que reconstruirla".format(nombre))
+                politica_a, politica_b = politica_azar(tick), politica_azar(tick)
+                for t in range(200):
+                    for otro, pol in ((juego, politica_a), (copia, politica_b)):
+                        tecla = pol(otro, t)
+                        if tecla is not None:
+                            otro.manejar_input(tecla)
+                        otro.paso(0.04)
+                    if _huella(juego) != _huella(copia) or juego.rng.getstate() != copia.rng.getstate():
+                        raise AssertionError("{}: la partida restaurada se separa en el tick {}".format(nombre, t))
+
+        datos, sin_azar = juego.instantanea(), juego.instantanea(azar=False)
+        n = 2000
+        t_guardar = _cronometrar(lambda: [juego.instantanea(azar=False) for _ in range(n)], 3) / n
+        t_volver = _cronometrar(lambda: [juego.restaurar(sin_azar) for _ in range(n)], 3) / n
+        t_azar = _cronometrar(lambda: [juego.restaurar(juego.instantanea()) for _ in range(n)], 3) / n
+        copias = 20 if 'x' in nombre else 200
+        t_copia = _cronometrar(lambda: [copy.deepcopy(juego) for _ in range(copias)]) / copias
+        print("{:<18} {:>5} bytes ({:>5} con random); ida y vuelta {:6.1f} us ({:7.0f}/s), "
+              "con random {:6.1f} us; deepcopy {:8.1f} us".format(
+                  nombre, len(sin_azar), len(datos), (t_guardar + t_volver) * 1e6,
+                  1.0 / (t_guardar + t_volver), t_azar * 1e6, t_copia * 1e6))
+        if t_azar > t_copia:
+            raise AssertionError("{}: la instantánea no es más rápida que deepcopy".format(nombre))
+
+    # con la ocupación densa, el tamaño depende de lo que hay en el tablero
+    # y no de su área (en el grande las celdas ocupan 4 bytes en vez de 2)
+    tamanos = [len(juegos.JuegoSnake(cols=lado, rows=lado, obstaculos_cantidad=8, semilla=3).instantanea(azar=False))
+               for lado in (30, 1000)]
+    print("snake denso con 8 obstáculos: {} bytes en 30x30, {} bytes en 1000x1000".format(*tamanos))
+    if tamanos[1] > 2 * tamanos[0]:
+        raise AssertionError("la instantánea densa crece con el área del tablero")
+
+    # restaurar (lo que hace cada paso de rebobinar) tampoco: la ocupación
+    # densa se corrige en sitio, no se vuelve a crear
+    tiempos = []
+    for lado in (30, 1000):
+        juego = juegos.JuegoSnake(cols=lado, rows=lado, obstaculos_cantidad=8, semilla=3)
+        antes = juego.instantanea(azar=False)
+        for _ in range(40):
+            juego.paso(0.04)
+        despues = juego.instantanea(azar=False)
+        n = 1000
+        tiempos.append(_cronometrar(lambda: [juego.restaurar(d) for _ in range(n // 2)
+                                             for d in (antes, despues)], 3) / n)
+        if _estado_ocupacion(juego) != _ocupacion_reconstruida(juego):
+            raise AssertionError("{0}x{0}: restaurar deja otra ocupación que reconstruirla".format(lado))
+    print("snake denso, restaurar: {:.1f} us en 30x30, {:.1f} us en 1000x1000".format(
+        tiempos[0] * 1e6, tiempos[1] * 1e6))
+    if tiempos[1] > 3 * tiempos[0]:
+        raise AssertionError("restaurar crece con el área del tablero")
+
+    # rebobinar corta la repetición justo ahí: sigue reproduciendo la partida
+    for nombre in ('snake', 'tetris'):
+        grabadora = Grabadora(nombre, semilla=5)
+        politica = politica_azar(6)
+        azar = random.Random(7)
+        vueltas = 0
+        for tick in range(4000):
+            tecla = politica(grabadora.juego, tick)
+            if tecla is not None:
+                grabadora.tecla(tecla)
+            if azar.random() < 0.005:
+                vueltas += grabadora.rebobinar(azar.randrange(1, 200)) is not None
+            if terminado(grabadora.juego):
+                grabadora.tecla('r')
+            grabadora.paso()
+        rep = Repeticion.desde_bytes(grabadora.repeticion.a_bytes())
+        if _huella(Reproductor(rep).correr()) != _huella(grabadora.juego):
+            raise AssertionError("{}: la repetición no coincide después de rebobinar".format(nombre))
+        print("{}: {} rebobinados, la repetición de {} ticks sigue coincidiendo ({} instantáneas en el anillo)".format(
+            nombre, vueltas, rep.ticks, len(grabadora.rebobinado)))
+
+
+BENCHMARKS = [
+    ('import_lexer', bench_import_lexer),
+    ('cache_ast', bench_cache_ast),
+    ('incremental', bench_incremental),
+    ('ast_compacto', bench_ast_compacto),
+    ('tokens', bench_tokens),
+    ('secciones', bench_secciones),
+    ('validador', bench_validador),
+    ('tablas', bench_tablas),
+    ('snake', bench_snake),
+    ('comidas', bench_comidas),
+    ('tetris', bench_tetris),
+    ('simulacion', bench_simulacion),
+    ('repeticion', bench_repeticion),
+    ('lote_snake', bench_lote_snake),
+    ('lote_tetris', bench_lote_tetris),
+    ('lienzo', bench_lienzo),
+    ('framebuffer', bench_framebuffer),
+    ('planificador', bench_planificador),
+    ('mundo', bench_mundo),
+    ('entradas', bench_entradas),
+    ('instantaneas', bench_instantaneas),
+]
+
+
+def main(argv=None):
+    nombres = argv if argv else [n for n, _ in BENCHMARKS]
+    fallos = 0
+    for nombre, fn in BENCHMARKS:
+        if nombre not in nombres:
+            continue
+        print("== {} ==".format(nombre))
+        try:
+            fn()
+        except AssertionError as e:
+            fallos += 1
+            print("FALLO: {}".format(e))
+    return 1 if fallos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
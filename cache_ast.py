@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# Cache en disco de ASTs compilados (.brikc)
+#
+# Cada entrada se indexa por el hash del texto fuente y la versión de la
+# gramática, de modo que un cambio en el archivo o en el lexer/parser la
+# invalida sola. El AST se guarda con marshal: binario, compacto y mucho
+# más rápido de leer que el JSON con sangría de save_ast_to_file.
+
+import hashlib
+import marshal
+import os
+import sys
+
+EXTENSION = '.brikc'
+MAGIC = b'BRKC'
+
+# marshal no es estable entre versiones de Python; va dentro de la clave
+_VERSION_PY = '{}.{}'.format(*sys.version_info[:2])
+
+
+def reemplazar(origen, destino):
+    # os.rename que pisa el destino también en Windows (os.replace en py3;
+    # en py2 se borra el destino y se reintenta)
+    if hasattr(os, 'replace'):
+        os.replace(origen, destino)
+        return
+    try:
+        os.rename(origen, destino)
+    except OSError:
+        os.remove(destino)
+        os.rename(origen, destino)
+
+
+class CacheAST:
+    def __init__(self, directorio, max_bytes=64 * 1024 * 1024):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._total = None
+
+    def clave(self, fuente, version_gramatica):
+        h = hashlib.sha1(fuente)
+        h.update('|{}|{}'.format(version_gramatica, _VERSION_PY).encode('ascii'))
+        return h.hexdigest()
+
+    def ruta(self, clave):
+        return os.path.join(self.directorio, clave + EXTENSION)
+
+    def cargar(self, clave):
+        ruta = self.ruta(clave)
+        try:
+            with open(ruta, 'rb') as f:
+                datos = f.read()
+        except (IOError, OSError):
+            return None
+
+        if datos[:len(MAGIC)] != MAGIC:
+            return None
+        try:
+            ast = marshal.loads(datos[len(MAGIC):])
+        except (ValueError, EOFError, TypeError):
+            return None
+
+        # marcar como usada para la política de desalojo (LRU por mtime)
+        try:
+            os.utime(ruta, None)
+        except OSError:
+            pass
+        return ast
+
+    def guardar(self, clave, ast):
+        datos = MAGIC + marshal.dumps(ast)
+        if not os.path.isdir(self.directorio):
+            os.makedirs(self.directorio)
+
+        ruta = self.ruta(clave)
+        try:
+            anterior = os.path.getsize(ruta)    # se pisa: no suma dos veces
+        except OSError:
+            anterior = 0
+        tmp = '{}.{}.tmp'.format(ruta, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(datos)
+        reemplazar(tmp, ruta)
+
+        if self._total is None:
+            self._total = self.tamano_total()
+        else:
+            self._total += len(datos) - anterior
+        if self._total > self.max_bytes:
+            self.podar()
+
+    def _entradas(self):
+        entradas = []
+        try:
+            nombres = os.listdir(self.directorio)
+        except OSError:
+            return entradas
+        for nombre in nombres:
+            if not nombre.endswith(EXTENSION):
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                st = os.stat(ruta)
+            except OSError:
+                continue
+            entradas.append((st.st_mtime, st.st_size, ruta))
+        return entradas
+
+    def tamano_total(self):
+        return sum(tam for _, tam, _ in self._entradas())
+
+    def podar(self):
+        # borra las entradas menos usadas hasta quedar bajo max_bytes
+        entradas = sorted(self._entradas())
+        total = sum(tam for _, tam, _ in entradas)
+        for _, tam, ruta in entradas:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+                total -= tam
+            except OSError:
+                pass
+        self._total = total
+        return total
+
+    def limpiar(self):
+        for _, _, ruta in self._entradas():
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+        self._total = 0
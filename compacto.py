@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# AST compacto: cadenas internadas, subárboles compartidos y matrices 0/1
+# empaquetadas en máscaras de bits.
+#
+# Con muchas piezas definidas en un paquete de reglas la mayor parte del
+# AST son filas [0, 1, 0, 0] repetidas, cada una con su lista y sus ints.
+# En modo compacto:
+#   - claves y cadenas iguales son el mismo objeto,
+#   - las listas pasan a tuplas y las iguales se comparten,
+#   - los objetos iguales se comparten (¡tratarlos como de solo lectura!),
+#   - una lista de filas 0/1 del mismo ancho pasa a MatrizBits.
+
+try:
+    _CADENAS = (str, unicode)
+except NameError:
+    _CADENAS = (str,)
+
+
+class MatrizBits(object):
+    # Matriz 0/1 guardada como una máscara int por fila. El bit x de una
+    # fila es la columna x (bit 0 = columna izquierda), el mismo orden que
+    # usan los tableros de bits del runtime. Se comporta como una lista de
+    # filas de solo lectura: m[y][x], len(m), iterar, comparar con listas.
+    __slots__ = ('ancho', 'filas')
+
+    def __init__(self, ancho, filas):
+        self.ancho = ancho
+        self.filas = tuple(filas)
+
+    @classmethod
+    def desde_lista(cls, matriz):
+        ancho = len(matriz[0]) if matriz else 0
+        filas = []
+        for fila in matriz:
+            mascara = 0
+            for x, v in enumerate(fila):
+                if v:
+                    mascara |= 1 << x
+            filas.append(mascara)
+        return cls(ancho, filas)
+
+    def celda(self, x, y):
+        return (self.filas[y] >> x) & 1
+
+    def fila(self, y):
+        mascara = self.filas[y]
+        return tuple((mascara >> x) & 1 for x in range(self.ancho))
+
+    def a_lista(self):
+        return [list(self.fila(y)) for y in range(len(self.filas))]
+
+    def __len__(self):
+        return len(self.filas)
+
+    def __getitem__(self, y):
+        if isinstance(y, slice):
+            return [self.fila(j) for j in range(*y.indices(len(self.filas)))]
+        if y < 0:
+            y += len(self.filas)
+        return self.fila(y)
+
+    def __iter__(self):
+        for y in range(len(self.filas)):
+            yield self.fila(y)
+
+    def __eq__(self, otra):
+        if isinstance(otra, MatrizBits):
+            return self.ancho == otra.ancho and self.filas == otra.filas
+        try:
+            return len(otra) == len(self.filas) and all(
+                list(f) == list(g) for f, g in zip(self, otra))
+        except TypeError:
+            return False
+
+    def __ne__(self, otra):
+        return not self == otra
+
+    def __hash__(self):
+        return hash((self.ancho, self.filas))
+
+    def __repr__(self):
+        return 'MatrizBits({}, {})'.format(self.ancho, list(self.filas))
+
+
+def _es_matriz_bits(lista):
+    if not lista:
+        return False
+    ancho = None
+    for fila in lista:
+        if not isinstance(fila, (list, tuple)) or not fila:
+            return False
+        if ancho is None:
+            ancho = len(fila)
+        elif len(fila) != ancho:
+            return False
+        for v in fila:
+            # type() y no isinstance(): True/False no cuentan como 0/1
+            if type(v) is not int or (v != 0 and v != 1):
+                return False
+    return True
+
+
+class TablaConsing:
+    # Tabla de hash-consing. Puede compartirse entre varios parseos para
+    # que todos los archivos de un paquete de reglas usen los mismos nodos.
+
+    def __init__(self):
+        self._cadenas = {}
+        self._nodos = {}
+        self._canonicos = set()
+
+    def cadena(self, s):
+        return self._cadenas.setdefault(s, s)
+
+    def _firma(self, v):
+        # 1, 1.0 y True son iguales para un dict: la firma lleva el tipo.
+        # Los hijos ya compartidos se identifican por id (la tabla los
+        # mantiene vivos); un hijo no compartido impide compartir al padre.
+        if isinstance(v, (tuple, dict, MatrizBits)):
+            if id(v) not in self._canonicos:
+                raise TypeError
+            return id(v)
+        return (type(v), v)
+
+    def _compartir(self, clave, nodo):
+        nodo = self._nodos.setdefault(clave, nodo)
+        self._canonicos.add(id(nodo))
+        return nodo
+
+    def lista(self, lista):
+        if _es_matriz_bits(lista):
+            m = MatrizBits.desde_lista(lista)
+            return self._compartir(('m', m.ancho, m.filas), m)
+        t = tuple(lista)
+        try:
+            clave = ('l',) + tuple(self._firma(v) for v in t)
+        except TypeError:
+            return t
+        return self._compartir(clave, t)
+
+    def objeto(self, obj):
+        cadena = self.cadena
+        d = {}
+        for k, v in obj.items():
+            d[cadena(k)] = v
+        try:
+            clave = ('o',) + tuple((k, self._firma(v)) for k, v in d.items())
+        except TypeError:
+            return d
+        return self._compartir(clave, d)
+
+    def valor(self, v):
+        if isinstance(v, dict):
+            return self.objeto(v)
+        if isinstance(v, list):
+            return self.lista(v)
+        if isinstance(v, _CADENAS):
+            return self.cadena(v)
+        return v
+
+
+def compactar(valor, tabla=None):
+    # Compacta un AST ya construido (p. ej. uno leído de la cache .brikc)
+    tabla = tabla or TablaConsing()
+    if isinstance(valor, dict):
+        return tabla.objeto(dict((k, compactar(v, tabla)) for k, v in valor.items()))
+    if isinstance(valor, list):
+        return tabla.lista([compactar(v, tabla) for v in valor])
+    return tabla.valor(valor)
+
+
+def a_plano(valor):
+    # Inversa de compactar: dicts, listas y escalares (apto para json)
+    if isinstance(valor, MatrizBits):
+        return valor.a_lista()
+    if isinstance(valor, dict):
+        return dict((k, a_plano(v)) for k, v in valor.items())
+    if isinstance(valor, (list, tuple)):
+        return [a_plano(v) for v in valor]
+    return valor
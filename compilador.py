@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+# Compilador por lotes de archivos .brik
+#
+# Ejecutar: python compilador.py niveles/ reglas/*.brik -j 8 --sin-tokens
+#
+# Recorre directorios y globs, compila cada archivo en un pool de procesos
+# y escribe junto a cada fuente su <nombre>.ast.json:
+#   {"gramatica": VERSION_GRAMATICA, "fuente": sha1 de la fuente, "ast": {...}}
+# Los archivos cuya salida tiene la misma gramática y la misma huella de
+# la fuente se saltan (salvo --forzar). Se imprime una línea de resumen
+# por archivo con el tiempo o el error.
+
+from __future__ import print_function
+
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+
+from cache_ast import reemplazar
+from lexer import VERSION_GRAMATICA, Lexer, Parser, parse_file
+
+EXTENSION = '.brik'
+
+
+def ruta_salida(ruta):
+    return os.path.splitext(ruta)[0] + '.ast.json'
+
+
+def expandir_rutas(patrones):
+    vistos = set()
+    rutas = []
+    for patron in patrones:
+        if os.path.isdir(patron):
+            candidatos = []
+            for raiz, _, nombres in os.walk(patron):
+                for nombre in nombres:
+                    if nombre.endswith(EXTENSION):
+                        candidatos.append(os.path.join(raiz, nombre))
+            candidatos.sort()
+        else:
+            candidatos = sorted(glob.glob(patron)) or [patron]
+
+        for ruta in candidatos:
+            if ruta not in vistos:
+                vistos.add(ruta)
+                rutas.append(ruta)
+    return rutas
+
+
+def huella_fuente(ruta):
+    with open(ruta, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _cabecera(huella):
+    # la salida empieza así (campos en este orden): para saber si está al
+    # día basta leer este prefijo
+    return '{{"gramatica":{},"fuente":"{}","ast":'.format(VERSION_GRAMATICA, huella)
+
+
+def sin_cambios(ruta):
+    # la salida es de esta gramática y de la fuente tal como está ahora
+    try:
+        cabecera = _cabecera(huella_fuente(ruta))
+        with open(ruta_salida(ruta)) as f:
+            return f.read(len(cabecera)) == cabecera
+    except (IOError, OSError):
+        return False
+
+
+def leer_salida(ruta):
+    # AST guardado en la salida de `ruta`
+    with open(ruta_salida(ruta)) as f:
+        return json.load(f)['ast']
+
+
+# una CacheAST por directorio y por proceso: así el tamaño total de la
+# cache se calcula una vez por proceso del pool y no en cada archivo
+_CACHES = {}
+
+
+def _cache(directorio):
+    from cache_ast import CacheAST
+
+    cache = _CACHES.get(directorio)
+    if cache is None:
+        cache = _CACHES[directorio] = CacheAST(directorio)
+    return cache
+
+
+def _errores_esquema(ast):
+    from validador import validar as validar_ast
+    return validar_ast(ast)
+
+
+def compilar_archivo(trabajo):
+    # Se ejecuta en los procesos del pool: devuelve (ruta, estado, ms, info)
+    ruta, volcar_tokens, forzar, cache, validar = trabajo
+
+    if not forzar and sin_cambios(ruta):
+        if validar:
+            # la salida pudo compilarse sin --validar: se valida igual
+            t0 = time.time()
+            try:
+                errores = _errores_esquema(leer_salida(ruta))
+            except (IOError, OSError, ValueError, KeyError, TypeError) as e:
+                errores = ["salida ilegible ({})".format(e)]
+            if errores:
+                ms = (time.time() - t0) * 1000.0
+                return (ruta, 'ERROR', ms, "esquema: " + "; ".join(errores))
+        return (ruta, 'SKIP', 0.0, '')
+
+    t0 = time.time()
+    try:
+        huella = huella_fuente(ruta)
+        volcado = ''
+        if cache and not volcar_tokens:
+            # la cache se indexa por contenido: un acierto evita lexer y parser
+            resultado = parse_file(ruta, cache=_cache(cache))
+        else:
+            with io.open(ruta, 'r', encoding='utf-8') as f:
+                texto = f.read()
+
+            tokens = Lexer(texto).tokenize_buffer()
+            if volcar_tokens:
+                volcado = "\n".join("{:03d}: {}".format(i, tok) for i, tok in enumerate(tokens))
+            resultado = Parser(tokens).parsear()
+
+        if validar:
+            errores = _errores_esquema(resultado)
+            if errores:
+                ms = (time.time() - t0) * 1000.0
+                return (ruta, 'ERROR', ms, "esquema: " + "; ".join(errores))
+
+        # a un temporal y después en su lugar: un volcado que falla no deja
+        # una salida cortada y más nueva que la fuente
+        salida = ruta_salida(ruta)
+        tmp = '{}.{}.tmp'.format(salida, os.getpid())
+        try:
+            with open(tmp, 'w') as f:
+                f.write(_cabecera(huella))
+                json.dump(resultado, f, separators=(',', ':'))
+                f.write('}')
+            reemplazar(tmp, salida)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    except Exception as e:
+        ms = (time.time() - t0) * 1000.0
+        return (ruta, 'ERROR', ms, "{}: {}".format(type(e).__name__, e))
+
+    ms = (time.time() - t0) * 1000.0
+    info = "{} secciones".format(len(resultado))
+    if volcado:
+        info += "\n" + volcado
+    return (ruta, 'OK', ms, info)
+
+
+def compilar(rutas, trabajos=1, volcar_tokens=True, forzar=False, cache=None, validar=False, salida=None):
+    salida = salida or sys.stdout
+    lote = [(ruta, volcar_tokens, forzar, cache, validar) for ruta in rutas]
+    conteo = {'OK': 0, 'SKIP': 0, 'ERROR': 0}
+
+    pool = None
+    if trabajos > 1 and len(lote) > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(trabajos)
+        resultados = pool.imap(compilar_archivo, lote, chunksize=max(1, len(lote) // (trabajos * 8)))
+    else:
+        resultados = (compilar_archivo(t) for t in lote)
+
+    t0 = time.time()
+    try:
+        for ruta, estado, ms, info in resultados:
+            conteo[estado] += 1
+            print("{:<5} {:9.2f} ms  {}  {}".format(estado, ms, ruta, info), file=salida)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    print("Total: {} archivos, {} ok, {} sin cambios, {} con error en {:.2f} s".format(
+        len(lote), conteo['OK'], conteo['SKIP'], conteo['ERROR'], time.time() - t0), file=salida)
+    return conteo
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compila archivos .brik a .ast.json en paralelo")
+    ap.add_argument('rutas', nargs='+', help="archivos, directorios o globs")
+    ap.add_argument('-j', '--trabajos', type=int, default=os.cpu_count() if hasattr(os, 'cpu_count') else 1,
+                    help="procesos del pool (por defecto, uno por CPU)")
+    ap.add_argument('--sin-tokens', action='store_true', help="no volcar la lista de tokens")
+    ap.add_argument('--forzar', action='store_true', help="recompilar aunque la salida esté al día")
+    ap.add_argument('--cache', default=None, help="directorio de cache .brikc")
+    ap.add_argument('--validar', action='store_true', help="validar cada AST contra el esquema de BrickLang")
+    args = ap.parse_args(argv)
+
+    rutas = expandir_rutas(args.rutas)
+    conteo = compilar(rutas, trabajos=max(1, args.trabajos or 1), volcar_tokens=not args.sin_tokens,
+                      forzar=args.forzar, cache=args.cache, validar=args.validar)
+    return 1 if conteo['ERROR'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# Cola de teclas de la consola
+#
+# Las teclas no van al juego desde el callback de Tk sino a esta cola, con
+# la hora en que llegaron. El loop saca a lo sumo una por paso de la
+# simulación; en Snake, además, una por movimiento de la serpiente: dos
+# giros rápidos (arriba y enseguida izquierda) se aplican en dos celdas
+# seguidas en vez de pisarse, y el chequeo de "no dar la vuelta" se hace
+# contra la dirección que de verdad se usó.
+#
+# Una tecla igual a la última que todavía espera en la cola se descarta
+# (la repetición automática de una tecla apretada no llena la cola), y la
+# cola tiene un máximo: lo que llega con la cola llena se pierde.
+#
+# Latencia: desde que llega la tecla hasta el primer cuadro dibujado en
+# el que el juego ya cambió por ella (en Snake, el primer movimiento
+# después de aplicarla). Sólo se miden las que se aplican con la partida
+# en marcha (en pausa o terminada no cambian nada). Se guardan las
+# últimas `muestras` en ms.
+#
+# No importa Tkinter: el reloj se puede cambiar para probar.
+
+import time
+from collections import deque
+
+# teclas que no se miden (no cambian lo que se ve: 'p' congela el cuadro)
+SIN_LATENCIA = ('p',)
+
+
+def _marca(juego):
+    # lo que cambia cuando una tecla ya tuvo efecto
+    movimientos = getattr(juego, 'movimientos', None)
+    return juego.version if movimientos is None else movimientos
+
+
+def _percentil(ordenadas, p):
+    # interpolación lineal entre las dos muestras vecinas
+    if len(ordenadas) == 1:
+        return ordenadas[0]
+    k = (len(ordenadas) - 1) * p / 100.0
+    i = int(k)
+    if i + 1 >= len(ordenadas):
+        return ordenadas[-1]
+    return ordenadas[i] + (ordenadas[i + 1] - ordenadas[i]) * (k - i)
+
+
+class ColaEntradas(object):
+    def __init__(self, maximo=4, muestras=1000, reloj=time.time):
+        self.maximo = maximo
+        self.reloj = reloj
+        self.descartadas = 0    # repetidas o con la cola llena
+        self.latencias = deque(maxlen=muestras)
+        self._cola = deque()        # (tecla, hora)
+        self._aplicadas = []        # (hora, marca antes de aplicarla)
+        self._espera = None         # Snake: marca de la última aplicada
+
+    def __len__(self):
+        return len(self._cola)
+
+    def vaciar(self):
+        # nueva partida o vuelta al menú: lo pendiente ya no corresponde
+        self._cola.clear()
+        self._aplicadas = []
+        self._espera = None
+
+    def poner(self, tecla, hora=None):
+        # False si se descartó
+        if (self._cola and self._cola[-1][0] == tecla) or len(self._cola) >= self.maximo:
+            self.descartadas += 1
+            return False
+        self._cola.append((tecla, self.reloj() if hora is None else hora))
+        return True
+
+    def sacar(self, juego, jugando=True):
+        # la próxima tecla para este paso, o None. jugando=False (pausa,
+        # partida terminada): no hay movimientos que esperar
+        if not self._cola:
+            return None
+        marca = _marca(juego)
+        if jugando and self._espera is not None and marca == self._espera:
+            return None
+        tecla, hora = self._cola.popleft()
+        if jugando and tecla not in SIN_LATENCIA:
+            self._aplicadas.append((hora, marca))
+        self._espera = marca if getattr(juego, 'movimientos', None) is not None else None
+        return tecla
+
+    def dibujado(self, juego, hora=None):
+        # se dibujó un cuadro: cierra la latencia de las teclas que ya se ven
+        if not self._aplicadas:
+            return
+        if hora is None:
+            hora = self.reloj()
+        marca = _marca(juego)
+        pendientes = []
+        for llegada, antes in self._aplicadas:
+            if marca != antes:
+                self.latencias.append((hora - llegada) * 1000.0)
+            else:
+                pendientes.append((llegada, antes))
+        self._aplicadas = pendientes
+
+    def percentiles(self, ps=(50, 90, 99)):
+        # ms de latencia en cada percentil; None si todavía no hay muestras
+        if not self.latencias:
+            return None
+        ordenadas = sorted(self.latencias)
+        return [_percentil(ordenadas, p) for p in ps]
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# Re-lexeo y re-parseo incremental de archivos .brik
+#
+# Pensado para el editor de niveles y la recarga en caliente: en vez de
+# volver a correr Lexer(texto).tokenize() y Parser(tokens).parsear() en
+# cada tecla, se recuerda el rango de texto de cada entrada de primer
+# nivel ([seccion] : {...}) y ante una edición solo se vuelven a lexear y
+# parsear las entradas que la tocan.
+
+from lexer import Lexer, Parser
+
+
+class Entrada:
+    __slots__ = ('clave', 'valor', 'inicio', 'fin')
+
+    def __init__(self, clave, valor, inicio, fin):
+        self.clave = clave
+        self.valor = valor
+        self.inicio = inicio
+        self.fin = fin
+
+
+class ParseIncremental:
+    def __init__(self, texto):
+        self.texto = texto
+        self.entradas = self._parsear_region(0, None, hasta_eof=True)
+        self.ast = self._construir_ast()
+        # Desplazamiento pendiente: las entradas desde el índice _desde
+        # tienen sus offsets reales corridos _delta. Así una edición no
+        # recorre todas las entradas que le siguen, solo las que hay entre
+        # ella y la edición anterior.
+        self._desde = len(self.entradas)
+        self._delta = 0
+
+    def _inicio(self, k):
+        return self.entradas[k].inicio + (self._delta if k >= self._desde else 0)
+
+    def _fin(self, k):
+        return self.entradas[k].fin + (self._delta if k >= self._desde else 0)
+
+    def _mover_pendiente(self, k):
+        # deja el desplazamiento pendiente empezando exactamente en k
+        entradas = self.entradas
+        if self._desde < k:
+            for e in entradas[self._desde:k]:
+                e.inicio += self._delta
+                e.fin += self._delta
+        else:
+            for e in entradas[k:self._desde]:
+                e.inicio -= self._delta
+                e.fin -= self._delta
+        self._desde = k
+
+    def _parsear_region(self, inicio, fin, hasta_eof=False):
+        # Lexea desde `inicio` hasta el offset `fin` y parsea las entradas.
+        # Devuelve None si el rango no cierra limpio en `fin` (un token lo
+        # cruza, sobran tokens o hay error de sintaxis): hay que ampliarlo.
+        tokens = []
+        rangos = []
+        for tipo, valor, a, b in Lexer(self.texto).iter_tokens_pos(inicio):
+            if not hasta_eof and b > fin:
+                if a < fin:
+                    return None
+                break
+            tokens.append((tipo, valor))
+            rangos.append((a, b))
+
+        parser = Parser(tokens)
+        entradas = []
+        try:
+            for clave, valor, t0, t1 in parser.parsear_entradas():
+                if t1 > len(tokens):
+                    # el valor se quedó sin tokens (parsear_valor da None
+                    # al final): en una región el valor real puede estar
+                    # más allá de `fin`; al final del archivo la entrada
+                    # termina en el último token, como en parse_text
+                    if not hasta_eof:
+                        return None
+                    t1 = len(tokens)
+                entradas.append(Entrada(clave, valor, rangos[t0][0], rangos[t1 - 1][1]))
+        except SyntaxError:
+            if hasta_eof:
+                raise
+            return None
+
+        # pos > len: el parser pidió tokens más allá de `fin` (p. ej. una
+        # clave sin valor cuyo valor real está en la entrada siguiente)
+        if parser.pos != len(tokens) and not hasta_eof:
+            return None
+        return entradas
+
+    def _construir_ast(self):
+        ast = {}
+        for e in self.entradas:
+            ast[e.clave] = e.valor
+        return ast
+
+    def editar(self, offset, borrados, insertado):
+        # Aplica la edición (offset, largo borrado, texto insertado) y
+        # devuelve (ast, secciones_cambiadas).
+        viejo = self.texto
+        self.texto = viejo[:offset] + insertado + viejo[offset + borrados:]
+        delta = len(insertado) - borrados
+
+        if self.entradas is None:
+            # la edición anterior dejó el archivo inválido: parseo completo
+            return self._reparsear_todo()
+
+        entradas = self.entradas
+        n = len(entradas)
+        fin_dano = offset + borrados
+
+        # primera entrada que toca el daño (incluye la que termina justo en offset)
+        i = self._buscar(0, n, lambda k: self._fin(k) >= offset)
+        # primera entrada que empieza después del daño
+        j = self._buscar(i, n, lambda k: self._inicio(k) > fin_dano)
+
+        inicio = self._fin(i - 1) if i > 0 else 0
+        paso = 1
+        while True:
+            if j >= n:
+                try:
+                    nuevas = self._parsear_region(inicio, None, hasta_eof=True)
+                except SyntaxError:
+                    self.entradas = None
+                    raise
+                break
+            nuevas = self._parsear_region(inicio, self._inicio(j) + delta)
+            if nuevas is not None:
+                break
+            # el daño se propaga (llave sin cerrar, string abierto...): ampliar
+            j = min(n, j + paso)
+            paso *= 2
+
+        self._mover_pendiente(j)
+        self._delta += delta
+        self._desde = i + len(nuevas)
+
+        viejas = entradas[i:j]
+        entradas[i:j] = nuevas
+
+        claves_viejas = [e.clave for e in viejas]
+        claves_nuevas = [e.clave for e in nuevas]
+        afectadas = []
+        for clave in claves_viejas + claves_nuevas:
+            if clave not in afectadas:
+                afectadas.append(clave)
+
+        anterior = {}
+        for clave in afectadas:
+            anterior[clave] = self.ast.get(clave, _AUSENTE)
+
+        if claves_viejas == claves_nuevas and len(set(claves_nuevas)) == len(claves_nuevas) \
+                and all(self.ast.get(c, _AUSENTE) is e.valor for c, e in zip(claves_viejas, viejas)):
+            # caso común (editar valores): actualizar en sitio
+            for e in nuevas:
+                self.ast[e.clave] = e.valor
+        else:
+            # cambian claves o hay duplicadas: reconstruir respetando el orden
+            self.ast = self._construir_ast()
+
+        cambiadas = [c for c in afectadas if self.ast.get(c, _AUSENTE) != anterior[c]]
+        return self.ast, cambiadas
+
+    @staticmethod
+    def _buscar(lo, hi, pred):
+        # búsqueda binaria: primer k en [lo, hi) con pred(k) cierto, o hi
+        while lo < hi:
+            medio = (lo + hi) // 2
+            if pred(medio):
+                hi = medio
+            else:
+                lo = medio + 1
+        return lo
+
+    def _reparsear_todo(self):
+        anterior = self.ast
+        self.entradas = self._parsear_region(0, None, hasta_eof=True)
+        self._desde = len(self.entradas)
+        self._delta = 0
+        self.ast = self._construir_ast()
+        claves = list(anterior) + [c for c in self.ast if c not in anterior]
+        cambiadas = [c for c in claves if anterior.get(c, _AUSENTE) != self.ast.get(c, _AUSENTE)]
+        return self.ast, cambiadas
+
+
+_AUSENTE = object()
@@ -0,0 +1,919 @@
+# -*- coding: utf-8 -*-
+# Motores de Snake y Tetris sin interfaz
+#
+# No importan Tkinter: los usa runtime.py para la consola y también se
+# pueden correr sin pantalla (ver simulacion.py). Cada juego avanza con
+# paso(dt) y recibe teclas canónicas con manejar_input(tecla).
+
+import heapq
+import random
+import struct
+import sys
+from array import array
+from collections import OrderedDict, deque
+
+import tablas as reglas
+from compacto import MatrizBits
+
+# -------------------- AZAR --------------------
+# Todo el azar de los juegos sale de rng.random(): con la misma semilla
+# random.Random da los mismos random() en py2 y en py3, pero no los mismos
+# randrange/choice/shuffle. Así una repetición grabada con un intérprete
+# se reproduce igual con el otro, y LoteSnake (que lee uniformes de una
+# cinta) elige con la misma cuenta.
+
+def _azar_indice(rng, n):
+    # entero en [0, n) con un solo rng.random()
+    return min(int(rng.random() * n), n - 1)
+
+def _barajar(rng, lista):
+    # Fisher-Yates con _azar_indice
+    for i in range(len(lista) - 1, 0, -1):
+        j = _azar_indice(rng, i + 1)
+        lista[i], lista[j] = lista[j], lista[i]
+
+# -------------------- OCUPACION --------------------
+LIBRE, CUERPO, OBSTACULO, COMIDA = 0, 1, 2, 3
+_LIBRE_BYTE = b'\x00'
+
+class Ocupacion(object):
+    """Rejilla de ocupación con cuenta de celdas libres por bloque."""
+    # celdas: LIBRE/CUERPO/OBSTACULO/COMIDA por celda (y * cols + x)
+    # por_bloque, por_grupo: celdas libres en cada bloque de 1 << BITS
+    # celdas y en cada grupo de 1 << BITS_GRUPO; n_libres: el total.
+    # Marcar es O(1). La libre al azar es la k-ésima libre en orden de
+    # celda: sale sólo de celdas y no del orden en que se ocuparon, así que
+    # una instantánea no tiene que guardar más que lo ocupado para que la
+    # partida siga igual.
+    __slots__ = ('cols', 'rows', 'celdas', 'por_bloque', 'por_grupo', 'n_libres')
+    BITS = 10
+    BITS_GRUPO = 15
+
+    def __init__(self, cols, rows):
+        n = cols * rows
+        self.cols = cols
+        self.rows = rows
+        self.celdas = bytearray(n)
+        self.por_bloque = array('i', [min(1 << self.BITS, n - a) for a in range(0, n, 1 << self.BITS)])
+        self.por_grupo = array('i', [min(1 << self.BITS_GRUPO, n - a)
+                                     for a in range(0, n, 1 << self.BITS_GRUPO)])
+        self.n_libres = n
+
+    def get(self, x, y):
+        return self.celdas[y * self.cols + x]
+
+    def marcar(self, x, y, tipo):
+        i = y * self.cols + x
+        antes = self.celdas[i]
+        self.celdas[i] = tipo
+        if antes == LIBRE and tipo != LIBRE:
+            self.por_bloque[i >> self.BITS] -= 1
+            self.por_grupo[i >> self.BITS_GRUPO] -= 1
+            self.n_libres -= 1
+        elif antes != LIBRE and tipo == LIBRE:
+            self.por_bloque[i >> self.BITS] += 1
+            self.por_grupo[i >> self.BITS_GRUPO] += 1
+            self.n_libres += 1
+
+    def libre_aleatoria(self, rng=random):
+        if not self.n_libres:
+            return None
+        k = _azar_indice(rng, self.n_libres)
+        # grupo y bloque con la k-ésima libre
+        por_grupo, por_bloque = self.por_grupo, self.por_bloque
+        g = 0
+        while k >= por_grupo[g]:
+            k -= por_grupo[g]
+            g += 1
+        b = g << (self.BITS_GRUPO - self.BITS)
+        while k >= por_bloque[b]:
+            k -= por_bloque[b]
+            b += 1
+        # dentro del bloque, partiéndolo por la mitad con count (hay más de
+        # k libres en [lo, hi))
+        celdas = self.celdas
+        lo, hi = b << self.BITS, min((b + 1) << self.BITS, len(celdas))
+        while hi - lo > 1:
+            m = (lo + hi) // 2
+            c = celdas.count(_LIBRE_BYTE, lo, m)
+            if c <= k:
+                lo, k = m, k - c
+            else:
+                hi = m
+        return lo % self.cols, lo // self.cols
+
+    def en_rect(self, x0, y0, x1, y1):
+        # (x, y, tipo) de las celdas ocupadas con x0 <= x < x1, y0 <= y < y1
+        cols, celdas = self.cols, self.celdas
+        for y in range(max(0, y0), min(self.rows, y1)):
+            base = y * cols
+            for x in range(max(0, x0), min(cols, x1)):
+                tipo = celdas[base + x]
+                if tipo != LIBRE:
+                    yield x, y, tipo
+
+class OcupacionDispersa(object):
+    """Ocupación para tableros enormes: sólo guarda las celdas ocupadas, en
+    trozos de TROZO x TROZO. La memoria depende de cuántas cosas hay en el
+    tablero y no de su área."""
+    # trozos: (x >> BITS, y >> BITS) -> {(x, y): tipo}; sin trozos vacíos.
+    # La celda libre al azar se busca por rechazo (el tablero está casi
+    # vacío); si no aparece en INTENTOS se recorre desde un punto al azar.
+    __slots__ = ('cols', 'rows', 'trozos', 'ocupadas')
+    BITS = 6
+    TROZO = 1 << BITS
+    INTENTOS = 64
+
+    def __init__(self, cols, rows):
+        self.cols = cols
+        self.rows = rows
+        self.trozos = {}
+        self.ocupadas = 0
+
+    def get(self, x, y):
+        trozo = self.trozos.get((x >> self.BITS, y >> self.BITS))
+        if trozo is None:
+            return LIBRE
+        return trozo.get((x, y), LIBRE)
+
+    def marcar(self, x, y, tipo):
+        clave = (x >> self.BITS, y >> self.BITS)
+        trozo = self.trozos.get(clave)
+        if tipo == LIBRE:
+            if trozo is not None and trozo.pop((x, y), LIBRE) != LIBRE:
+                self.ocupadas -= 1
+                if not trozo:
+                    del self.trozos[clave]
+            return
+        if trozo is None:
+            trozo = self.trozos[clave] = {}
+        if (x, y) not in trozo:
+            self.ocupadas += 1
+        trozo[(x, y)] = tipo
+
+    def libre_aleatoria(self, rng=random):
+        cols = self.cols
+        total = cols * self.rows
+        if self.ocupadas >= total:
+            return None
+        for _ in range(self.INTENTOS):
+            i = _azar_indice(rng, total)
+            if self.get(i % cols, i // cols) == LIBRE:
+                return i % cols, i // cols
+        inicio = _azar_indice(rng, total)
+        for k in range(total):
+            i = (inicio + k) % total
+            if self.get(i % cols, i // cols) == LIBRE:
+                return i % cols, i // cols
+        return None
+
+    def en_rect(self, x0, y0, x1, y1):
+        # (x, y, tipo) de las celdas ocupadas con x0 <= x < x1, y0 <= y < y1;
+        # sólo se miran los trozos que tocan el rectángulo
+        b = self.BITS
+        for ty in range(max(0, y0) >> b, ((min(self.rows, y1) - 1) >> b) + 1):
+            for tx in range(max(0, x0) >> b, ((min(self.cols, x1) - 1) >> b) + 1):
+                trozo = self.trozos.get((tx, ty))
+                if not trozo:
+                    continue
+                for (x, y), tipo in trozo.items():
+                    if x0 <= x < x1 and y0 <= y < y1:
+                        yield x, y, tipo
+
+# con más celdas que esto, la ocupación es dispersa
+CELDAS_DISPERSA = 1 << 20
+
+def nueva_ocupacion(cols, rows):
+    if cols * rows > CELDAS_DISPERSA:
+        return OcupacionDispersa(cols, rows)
+    return Ocupacion(cols, rows)
+
+# -------------------- COMIDAS --------------------
+class ComidaSnake(object):
+    __slots__ = ('x', 'y', 'tipo', 'puntos', 'vence', 'orden')
+
+    def __init__(self, x, y, tipo, puntos, vence, orden):
+        self.x = x
+        self.y = y
+        self.tipo = tipo
+        self.puntos = puntos
+        self.vence = vence      # tiempo de juego en que desaparece
+        self.orden = orden      # de aparición
+
+class ComidasSnake(object):
+    """Comidas del tablero: por celda y en orden de aparición, con un heap
+    de vencimientos por tiempo de juego (cada paso sólo mira las que vencen)."""
+    def __init__(self):
+        self._en = OrderedDict()    # (x, y) -> ComidaSnake
+        self._heap = []             # (vence, orden, comida)
+        self._orden = 0
+        self._muertas = 0           # entradas del heap de comidas ya quitadas
+        self._sacadas = set()       # comidas que vencidas() ya sacó del heap
+
+    def __len__(self):
+        return len(self._en)
+
+    def __iter__(self):
+        return iter(list(self._en.values()))
+
+    def en(self, x, y):
+        return self._en.get((x, y))
+
+    def agregar(self, x, y, tipo, puntos, vence):
+        comida = ComidaSnake(x, y, tipo, puntos, vence, self._orden)
+        self._orden += 1
+        self._en[(x, y)] = comida
+        heapq.heappush(self._heap, (vence, comida.orden, comida))
+        return comida
+
+    def quitar(self, comida):
+        pos = (comida.x, comida.y)
+        if self._en.get(pos) is not comida:
+            return False
+        del self._en[pos]
+        if comida in self._sacadas:
+            # vencidas() ya sacó su entrada: no queda nada muerto en el heap
+            self._sacadas.discard(comida)
+            return True
+        # su entrada queda en el heap; si sobran muchas, se rehace
+        self._muertas += 1
+        if self._muertas > 32 and self._muertas > len(self._en):
+            self._heap = [e for e in self._heap if self._en.get((e[2].x, e[2].y)) is e[2]]
+            heapq.heapify(self._heap)
+            self._muertas = 0
+        return True
+
+    def vencidas(self, tiempo):
+        # las que vencen a más tardar en `tiempo`, en orden de aparición
+        # (siguen en el tablero: las quita quien llama)
+        heap = self._heap
+        res = []
+        while heap and heap[0][0] <= tiempo:
+            comida = heapq.heappop(heap)[2]
+            if self._en.get((comida.x, comida.y)) is comida:
+                res.append(comida)
+                self._sacadas.add(comida)
+            else:
+                self._muertas -= 1
+        if len(res) > 1:
+            res.sort(key=lambda c: c.orden)
+        return res
+
+# -------------------- INSTANTANEAS --------------------
+# instantanea() empaqueta el estado de una partida en bytes y restaurar()
+# lo vuelve a poner en un juego creado con las mismas opciones (tamaño,
+# tablas, generador). Sin el azar (azar=False) ocupan mucho menos, pero
+# restaurar deja el random del juego como esté.
+#
+# Formato (little endian): cabecera fija por juego, arrays de celdas
+# (y * cols + x, de 2 o 4 bytes según el tablero) y al final el estado
+# del random.Random (B presente, versión B, B hay gauss, d gauss, 625 I).
+
+_AZAR = struct.Struct('<BBBd')
+_SIN_AZAR = struct.pack('<B', 0)
+
+def _a_bytes(a):
+    if sys.byteorder == 'big':
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes() if hasattr(a, 'tobytes') else a.tostring()
+
+def _leer_array(tipo, datos, pos, n):
+    # (array de n elementos desde datos[pos:], posición siguiente)
+    a = array(tipo)
+    fin = pos + n * a.itemsize
+    if fin > len(datos):
+        raise ValueError("instantánea truncada")
+    trozo = datos[pos:fin]
+    if hasattr(a, 'frombytes'):
+        a.frombytes(trozo)
+    else:
+        a.fromstring(trozo)
+    if sys.byteorder == 'big':
+        a.byteswap()
+    return a, fin
+
+def _tipo_celda(cols, rows):
+    return 'H' if cols * rows <= 1 << 16 else 'I'
+
+def _empaquetar_azar(rng):
+    if not isinstance(rng, random.Random):
+        return _SIN_AZAR
+    version, estado, gauss = rng.getstate()
+    return _AZAR.pack(1, version, gauss is not None, gauss or 0.0) + _a_bytes(array('I', estado))
+
+def _restaurar_azar(rng, datos, pos):
+    if pos >= len(datos) or datos[pos:pos + 1] == _SIN_AZAR or not isinstance(rng, random.Random):
+        return
+    try:
+        _, version, hay, gauss = _AZAR.unpack_from(datos, pos)
+    except struct.error:
+        raise ValueError("instantánea truncada")
+    estado, _ = _leer_array('I', datos, pos + _AZAR.size, 625)
+    rng.setstate((version, tuple(estado), gauss if hay else None))
+
+# -------------------- JUEGOS --------------------
+# comidas por defecto (las mismas que usan las tablas si el .brik no las define)
+COMIDAS_SNAKE = reglas.TablaFija((c.tipo, c) for c in reglas.COMIDAS_SNAKE)
+
+# cabecera: magic, cols, rows, puntaje, dir, muerto, pausado, efecto activo,
+# _acum, tiempo, timer del efecto, velocidad, orden de la próxima comida y
+# cantidades de cuerpo, obstáculos y comidas. Después: cuerpo, obstáculos y
+# comidas (celda, tipo, puntos, vence, orden). La ocupación se vuelve a
+# armar con eso (libre_aleatoria no depende de la historia), así que el
+# tamaño depende de lo que hay en el tablero y no de su área.
+_SNAKE = struct.Struct('<4sIIibbBBBddddIIII')
+_COMIDA = struct.Struct('<IBidI')
+_EFECTOS = (None, 'velocidad', 'lenta')
+
+class JuegoSnake:
+    """Snake con obstáculos y comidas especiales."""
+    MAGIC = b'BRS2'
+
+    def __init__(self, cols=28, rows=20, velocidad=6.0, obstaculos_cantidad=8, tablas=None, semilla=None):
+        # tablas: reglas.TablasSnake compiladas de un .brik (compartidas)
+        # semilla: la misma semilla y las mismas teclas repiten la partida
+        self.semilla = semilla
+        self.rng = random.Random(semilla)
+        if tablas is not None:
+            cols, rows = tablas.cols, tablas.rows
+            velocidad = tablas.velocidad
+            obstaculos_cantidad = tablas.obstaculos
+        self.tablas = tablas
+        self.tipos_comida = tablas.comidas if tablas is not None else COMIDAS_SNAKE
+        self._nombres_comida = sorted(self.tipos_comida)
+        self.especiales = tablas.especiales if tablas is not None else reglas.ESPECIALES_SNAKE
+        self.teclas = tablas.teclas if tablas is not None else {}
+        self.cols = cols
+        self.rows = rows
+        self.base_speed = velocidad
+        self.velocidad = velocidad
+        self.obstaculos_cantidad = obstaculos_cantidad
+        # sube cada vez que cambia algo que se ve (para no redibujar de más)
+        self.version = 0
+        # sube cada vez que la serpiente intenta avanzar una celda (la cola
+        # de entradas da un giro por movimiento, ver entradas.py)
+        self.movimientos = 0
+        self.reiniciar()
+
+    @classmethod
+    def desde_reglas(cls, ruta, **opciones):
+        return cls(tablas=reglas.cargar_snake(ruta), **opciones)
+
+    def reiniciar(self):
+        self.version += 1
+        cx, cy = self.cols // 2, self.rows // 2
+        self.cuerpo = deque([(cx-2, cy), (cx-1, cy), (cx, cy)])
+        self.dir = (1, 0)
+        self.puntaje = 0
+        self.muerto = False
+        self.pausado = False
+        self.comidas = ComidasSnake()
+        self.obstaculos = []
+        self.ocupacion = nueva_ocupacion(self.cols, self.rows)
+        for (x, y) in self.cuerpo:
+            self.ocupacion.marcar(x, y, CUERPO)
+        self._acum = 0.0
+        self.tiempo = 0.0
+        self._special_timer = 0.0
+        self._special_active = None
+        self.velocidad = self.base_speed
+        # generar obstaculos
+        self._generar_obstaculos()
+        # generar comida normal inicial
+        for _ in range(2):
+            self._nueva_comida_normal()
+
+    def _reindexar(self):
+        # reconstruye la ocupación desde cuerpo/obstaculos/comidas (para
+        # cuando se edita el estado desde afuera)
+        self.version += 1
+        self.ocupacion = nueva_ocupacion(self.cols, self.rows)
+        self._marcar_estado()
+
+    def _marcar_estado(self, liberar=False):
+        # marca en la ocupación obstáculos, comidas y cuerpo (el cuerpo
+        # encima), o los deja libres con liberar=True
+        marcar = self.ocupacion.marcar
+        for (x, y) in self.obstaculos:
+            marcar(x, y, LIBRE if liberar else OBSTACULO)
+        for c in self.comidas:
+            marcar(c.x, c.y, LIBRE if liberar else COMIDA)
+        for (x, y) in self.cuerpo:
+            marcar(x, y, LIBRE if liberar else CUERPO)
+
+    def instantanea(self, azar=True):
+        cols = self.cols
+        tipo = _tipo_celda(cols, self.rows)
+        comidas = list(self.comidas)
+        nombres = self._nombres_comida
+        partes = [
+            _SNAKE.pack(self.MAGIC, cols, self.rows, self.puntaje, self.dir[0], self.dir[1],
+                        self.muerto, self.pausado, _EFECTOS.index(self._special_active),
+                        self._acum, self.tiempo, self._special_timer, self.velocidad,
+                        self.comidas._orden, len(self.cuerpo), len(self.obstaculos), len(comidas)),
+            _a_bytes(array(tipo, [y * cols + x for x, y in self.cuerpo])),
+            _a_bytes(array(tipo, [y * cols + x for x, y in self.obstaculos])),
+        ]
+        partes.extend(_COMIDA.pack(c.y * cols + c.x, nombres.index(c.tipo), c.puntos, c.vence, c.orden)
+                      for c in comidas)
+        partes.append(_empaquetar_azar(self.rng) if azar else _SIN_AZAR)
+        return b''.join(partes)
+
+    def restaurar(self, datos):
+        try:
+            (magic, cols, rows, puntaje, dx, dy, muerto, pausado, efecto, acum, tiempo,
+             timer, velocidad, orden, n_cuerpo, n_obst, n_comidas) = _SNAKE.unpack_from(datos, 0)
+        except struct.error:
+            raise ValueError("instantánea truncada")
+        if magic != self.MAGIC:
+            raise ValueError("no es una instantánea de Snake")
+        if (cols, rows) != (self.cols, self.rows):
+            raise ValueError("instantánea de un tablero de {}x{}".format(cols, rows))
+        tipo = _tipo_celda(cols, rows)
+        pos = _SNAKE.size
+        cuerpo, pos = _leer_array(tipo, datos, pos, n_cuerpo)
+        obstaculos, pos = _leer_array(tipo, datos, pos, n_obst)
+        comidas = ComidasSnake()
+        nombres = self._nombres_comida
+        try:
+            for _ in range(n_comidas):
+                i, t, puntos, vence, orden_c = _COMIDA.unpack_from(datos, pos)
+                pos += _COMIDA.size
+                c = ComidaSnake(i % cols, i // cols, nombres[t], puntos, vence, orden_c)
+                comidas._en[(c.x, c.y)] = c
+                comidas._heap.append((vence, orden_c, c))
+        except (struct.error, IndexError):
+            raise ValueError("instantánea corrupta")
+        heapq.heapify(comidas._heap)
+        comidas._orden = orden
+
+        self.puntaje = puntaje
+        self.dir = (dx, dy)
+        self.muerto = bool(muerto)
+        self.pausado = bool(pausado)
+        self._special_active = _EFECTOS[efecto]
+        self._acum, self.tiempo, self._special_timer, self.velocidad = acum, tiempo, timer, velocidad
+        # la ocupación se corrige en sitio: se liberan las celdas de lo que
+        # había y se marcan las de lo restaurado. Cuesta lo ocupado y no el
+        # área (rebobinar restaura en cada paso)
+        self._marcar_estado(liberar=True)
+        self.cuerpo = deque((i % cols, i // cols) for i in cuerpo)
+        self.obstaculos = [(i % cols, i // cols) for i in obstaculos]
+        self.comidas = comidas
+        self._marcar_estado()
+        _restaurar_azar(self.rng, datos, pos)
+        self.version += 1
+
+    def _pos_libre(self):
+        # celda libre al azar o None si el tablero está lleno
+        return self.ocupacion.libre_aleatoria(self.rng)
+
+    def _generar_obstaculos(self):
+        self.obstaculos = []
+        tries = 0
+        while len(self.obstaculos) < self.obstaculos_cantidad and tries < 10000:
+            pos = self._pos_libre()
+            if pos is None:
+                break
+            self.obstaculos.append(pos)
+            self.ocupacion.marcar(pos[0], pos[1], OBSTACULO)
+            tries += 1
+
+    def _agregar_comida(self, tipo, fx, fy):
+        c = self.tipos_comida[tipo]
+        self.comidas.agregar(fx, fy, tipo, c.puntos, self.tiempo + c.duracion)
+        self.ocupacion.marcar(fx, fy, COMIDA)
+        self.version += 1
+
+    def _quitar_comida(self, comida):
+        self.version += 1
+        if self.comidas.quitar(comida):
+            if self.ocupacion.get(comida.x, comida.y) == COMIDA:
+                self.ocupacion.marcar(comida.x, comida.y, LIBRE)
+
+    def _nueva_comida_normal(self):
+        pos = self._pos_libre()
+        if pos is not None:
+            self._agregar_comida('normal', pos[0], pos[1])
+
+    def _spawn_special(self):
+        # probabilidades pequeñas para diferentes especiales:
+        # dorada (puntos extra), negra (resta puntos y reduce largo),
+        # velocidad (acelera) y lenta (ralentiza)
+        r = self.rng.random()
+        for umbral, tipo in self.especiales:
+            if r < umbral:
+                pos = self._pos_libre()
+                if pos is not None:
+                    self._agregar_comida(tipo, pos[0], pos[1])
+                break
+
+    def manejar_input(self, key):
+        if key is None:
+            return
+        key = self.teclas.get(key, key)
+        if key == 'p':
+            self.pausado = not self.pausado
+            return
+        if self.pausado:
+            return
+        # movimiento (proteger retorno)
+        if key in ('w', 'Up') and self.dir != (0,1):
+            self.dir = (0, -1)
+        elif key in ('s', 'Down') and self.dir != (0,-1):
+            self.dir = (0, 1)
+        elif key in ('a', 'Left') and self.dir != (1,0):
+            self.dir = (-1, 0)
+        elif key in ('d', 'Right') and self.dir != (-1,0):
+            self.dir = (1, 0)
+
+    def paso(self, dt):
+        if self.muerto or self.pausado:
+            return True
+        self.tiempo += dt
+        self._acum += dt
+        # efectos especiales temporales
+        if self._special_active:
+            self._special_timer -= dt
+            if self._special_timer <= 0:
+                # revertir efecto
+                if self._special_active == 'velocidad':
+                    self.velocidad = self.base_speed
+                elif self._special_active == 'lenta':
+                    self.velocidad = self.base_speed
+                self._special_active = None
+
+        # spawn specials occasionally
+        if self.rng.random() < 0.01:
+            self._spawn_special()
+
+        # comidas vencidas (sólo se miran las que tocan)
+        for c in self.comidas.vencidas(self.tiempo):
+            self._quitar_comida(c)
+
+        paso_t = 1.0 / max(1.0, self.velocidad)
+        if self._acum < paso_t:
+            return True
+        self._acum -= paso_t
+        self.version += 1
+        self.movimientos += 1
+
+        hx, hy = self.cuerpo[-1]
+        nx, ny = hx + self.dir[0], hy + self.dir[1]
+
+        # colisiones con paredes
+        if nx < 0 or nx >= self.cols or ny < 0 or ny >= self.rows:
+            self.muerto = True
+            return True
+        # colision con cuerpo u obstaculos (la cola todavía cuenta)
+        celda = self.ocupacion.get(nx, ny)
+        if celda == CUERPO or celda == OBSTACULO:
+            self.muerto = True
+            return True
+
+        # ver si comió algo
+        comida = self.comidas.en(nx, ny) if celda == COMIDA else None
+        if comida:
+            self._quitar_comida(comida)
+
+        # mover cabeza
+        self.cuerpo.append((nx, ny))
+        self.ocupacion.marcar(nx, ny, CUERPO)
+
+        if comida:
+            # aplicar efecto
+            tipo = comida.tipo
+            if tipo == 'normal':
+                self.puntaje += comida.puntos
+            elif tipo == 'dorada':
+                self.puntaje += comida.puntos
+            elif tipo == 'negra':
+                self.puntaje += comida.puntos
+                # eliminar primer segmento si existe (encoger)
+                if len(self.cuerpo) > 1:
+                    tx, ty = self.cuerpo.popleft()
+                    self.ocupacion.marcar(tx, ty, LIBRE)
+            elif tipo == 'velocidad':
+                self._special_active = 'velocidad'
+                self._special_timer = 5.0
+                self.velocidad = min(self.base_speed * 1.8, 20.0)
+            elif tipo == 'lenta':
+                self._special_active = 'lenta'
+                self._special_timer = 5.0
+                self.velocidad = max(self.base_speed * 0.5, 0.5)
+
+            # cuando come, añadir nueva comida normal
+            self._nueva_comida_normal()
+        else:
+            # si no comió, se mueve: eliminar cola
+            tx, ty = self.cuerpo.popleft()
+            self.ocupacion.marcar(tx, ty, LIBRE)
+
+        # pequeño aumento de velocidad por tiempo/puntos (opcional). Con
+        # puntaje negativo (manzana negra) se queda en el primer nivel
+        if self.tablas is not None:
+            ppn = self.tablas.puntos_por_nivel
+            if self.puntaje and ppn and self.puntaje % ppn == 0:
+                curva = self.tablas.curva_velocidad
+                self.velocidad = curva[max(0, min(self.puntaje // ppn, len(curva) - 1))]
+        elif self.puntaje and self.puntaje % 100 == 0:
+            self.velocidad = min(self.base_speed + max(0, self.puntaje) / 100.0, 18.0)
+
+        return True
+
+# piezas por defecto: se construyen una sola vez y las comparten todas las partidas
+PIEZAS_TETRIS = (
+    reglas.pieza('I', [[[1,1,1,1]],[[1],[1],[1],[1]]]),
+    reglas.pieza('O', [[[1,1],[1,1]]]),
+    reglas.pieza('T', [[[0,1,0],[1,1,1]],[[1,0],[1,1],[1,0]],[[1,1,1],[0,1,0]],[[0,1],[1,1],[0,1]]]),
+    reglas.pieza('L', [[[1,0],[1,0],[1,1]],[[0,0,1],[1,1,1]],[[1,1],[0,1],[0,1]],[[1,1,1],[1,0,0]]]),
+    reglas.pieza('J', [[[0,1],[0,1],[1,1]],[[1,1,1],[0,0,1]],[[1,1],[1,0],[1,0]],[[1,0,0],[1,1,1]]]),
+    reglas.pieza('S', [[[0,1,1],[1,1,0]],[[1,0],[1,1],[0,1]]]),
+    reglas.pieza('Z', [[[1,1,0],[0,1,1]],[[0,1],[1,1],[1,0]]]),
+)
+
+# -------------------- GENERADORES DE PIEZAS --------------------
+class GeneradorAzar:
+    """Cada pieza al azar, independiente de las anteriores."""
+    def __init__(self, n, rng=random):
+        self.indices = tuple(range(n))
+        self.rng = rng
+
+    def siguiente(self):
+        return self.indices[_azar_indice(self.rng, len(self.indices))]
+
+class GeneradorBolsa:
+    """Bolsa de 7: cada tanda de n piezas trae todas, en orden al azar."""
+    def __init__(self, n, rng=random):
+        self.n = n
+        self.rng = rng
+        self.bolsa = []
+
+    def siguiente(self):
+        if not self.bolsa:
+            self.bolsa = list(range(self.n))
+            _barajar(self.rng, self.bolsa)
+        return self.bolsa.pop()
+
+GENERADORES = {
+    'azar': GeneradorAzar,
+    'bolsa': GeneradorBolsa,
+}
+
+# cabecera: magic, cols, rows, puntaje, nivel, fall_speed, _acc, terminado,
+# pausado, pieza actual, rotación, px, py y piezas en la bolsa. Después:
+# las filas (una máscara por fila: H hasta 16 columnas, si no palabras I
+# de 32 bits), la bolsa (B por pieza) y el random.
+_TETRIS = struct.Struct('<4sIIiIddBBBBiiB')
+
+def _formato_filas(cols):
+    # (typecode, palabras por fila)
+    if cols <= 16:
+        return 'H', 1
+    return 'I', (cols + 31) // 32
+
+# (piezas, cols, rows) -> por pieza, por rotación, un dict x -> (y mínima,
+# y máxima, máscaras ya corridas a la columna x + x0), con x e y de la
+# matriz de la pieza y (x0, y0) su caja (ver tablas.Rotacion). Las
+# máscaras empiezan con y0 ceros, así la fila j de la lista va en y + j.
+# Las x en que la forma se sale por los costados no están. Se comparte
+# entre las partidas del mismo tablero.
+_CORRIDAS = {}
+
+def _corridas(piezas, cols, rows):
+    clave = (piezas, cols, rows)
+    tabla = _CORRIDAS.get(clave)
+    if tabla is None:
+        tabla = {}
+        for pieza in piezas:
+            tabla[pieza] = tuple(
+                dict((x - rot.caja[0], (-rot.caja[1], rows - rot.alto - rot.caja[1],
+                                        (0,) * rot.caja[1] + tuple(m << x for m in rot.mascaras)))
+                     for x in range(cols - rot.ancho + 1))
+                for rot in pieza.info)
+        tabla = _CORRIDAS[clave] = tabla
+    return tabla
+
+class JuegoTetris(object):
+    """Tetris funcional y básico."""
+    MAGIC = b'BRT1'
+
+    def __init__(self, cols=10, rows=20, fall_speed=1.0, tablas=None, generador='azar', semilla=None):
+        # tablas: reglas.TablasTetris compiladas de un .brik (compartidas)
+        # generador: 'azar' o 'bolsa' (ver GENERADORES)
+        # semilla: la misma semilla y las mismas teclas repiten la partida
+        self.semilla = semilla
+        self.rng = random.Random(semilla)
+        if tablas is not None:
+            cols, rows = tablas.cols, tablas.rows
+            fall_speed = tablas.velocidad
+        self.tablas = tablas
+        self.pieces = tablas.piezas if tablas is not None else PIEZAS_TETRIS
+        self.tipo_generador = GENERADORES[generador]
+        self.teclas = tablas.teclas if tablas is not None else {}
+        self.cols = cols
+        self.rows = rows
+        self.base_fall_speed = fall_speed
+        self.fall_speed = fall_speed
+        self._por_pieza = _corridas(self.pieces, cols, rows)
+        # sube cada vez que cambia algo que se ve (para no redibujar de más)
+        self.version = 0
+        self.reiniciar()
+
+    @classmethod
+    def desde_reglas(cls, ruta, **opciones):
+        return cls(tablas=reglas.cargar_tetris(ruta), **opciones)
+
+    def reiniciar(self):
+        # tablero de bits: una máscara int por fila, bit x = columna x
+        self.filas = [0] * self.rows
+        self.lleno = (1 << self.cols) - 1
+        self.puntaje = 0
+        self.nivel = 1
+        self.fall_speed = self.base_fall_speed
+        self._acc = 0.0
+        self.terminado = False
+        self.pausado = False
+        self.generador = self.tipo_generador(len(self.pieces), self.rng)
+        self._spawn()
+
+    def _pieces(self):
+        return PIEZAS_TETRIS
+
+    @property
+    def current(self):
+        return self._current
+
+    @current.setter
+    def current(self, pieza):
+        # junto con la pieza se elige su tabla de máscaras corridas
+        self._current = pieza
+        self._corridas = self._por_pieza[pieza]
+
+    def instantanea(self, azar=True):
+        tipo, palabras = _formato_filas(self.cols)
+        if palabras == 1:
+            filas = array(tipo, self.filas)
+        else:
+            filas = array(tipo, [(f >> (32 * k)) & 0xFFFFFFFF
+                                 for f in self.filas for k in range(palabras)])
+        bolsa = bytearray(getattr(self.generador, 'bolsa', ()))
+        return b''.join([
+            _TETRIS.pack(self.MAGIC, self.cols, self.rows, self.puntaje, self.nivel,
+                         self.fall_speed, self._acc, self.terminado, self.pausado,
+                         self.indice, self.rot, self.px, self.py, len(bolsa)),
+            _a_bytes(filas), bytes(bolsa),
+            _empaquetar_azar(self.rng) if azar else _SIN_AZAR])
+
+    def restaurar(self, datos):
+        try:
+            (magic, cols, rows, puntaje, nivel, fall_speed, acc, terminado, pausado,
+             indice, rot, px, py, n_bolsa) = _TETRIS.unpack_from(datos, 0)
+        except struct.error:
+            raise ValueError("instantánea truncada")
+        if magic != self.MAGIC:
+            raise ValueError("no es una instantánea de Tetris")
+        if (cols, rows) != (self.cols, self.rows):
+            raise ValueError("instantánea de un tablero de {}x{}".format(cols, rows))
+        if indice >= len(self.pieces) or rot >= len(self.pieces[indice].rots):
+            raise ValueError("instantánea corrupta")
+        tipo, palabras = _formato_filas(cols)
+        filas, pos = _leer_array(tipo, datos, _TETRIS.size, rows * palabras)
+        if palabras == 1:
+            self.filas = filas.tolist()
+        else:
+            self.filas = list(filas[::palabras])
+            for k in range(1, palabras):
+                self.filas = [f | (w << (32 * k)) for f, w in zip(self.filas, filas[k::palabras])]
+        if n_bolsa:
+            if not hasattr(self.generador, 'bolsa'):
+                raise ValueError("instantánea de una partida con bolsa")
+            self.generador.bolsa = list(bytearray(datos[pos:pos + n_bolsa]))
+        elif hasattr(self.generador, 'bolsa'):
+            self.generador.bolsa = []
+        pos += n_bolsa
+        self.puntaje, self.nivel = puntaje, nivel
+        self.fall_speed, self._acc = fall_speed, acc
+        self.terminado, self.pausado = bool(terminado), bool(pausado)
+        self.indice = indice
+        self.current = self.pieces[indice]
+        self.rot, self.px, self.py = rot, px, py
+        _restaurar_azar(self.rng, datos, pos)
+        self.version += 1
+
+    def _spawn(self):
+        self.version += 1
+        self.indice = self.generador.siguiente()
+        self.current = self.pieces[self.indice]
+        self.rot = 0
+        self.px = self.cols // 2 - 2
+        self.py = 0
+        if self._collide(self.px, self.py, self.rot):
+            self.terminado = True
+
+    @property
+    def tablero(self):
+        # vista de solo lectura como lista de filas (tablero[y][x])
+        return MatrizBits(self.cols, self.filas)
+
+    @tablero.setter
+    def tablero(self, matriz):
+        self.filas = list(MatrizBits.desde_lista(matriz).filas)
+        self.version += 1
+
+    def _shape(self, r=None):
+        r = self.rot if r is None else r
+        return self.current.rots[r % len(self.current.rots)]
+
+    def _rotacion(self, r=None):
+        r = self.rot if r is None else r
+        return self.current.info[r % len(self.current.info)]
+
+    def _collide(self, x, y, r):
+        # r ya está normalizada (0 <= r < len(rots)). La forma está
+        # recortada a su caja y las máscaras ya vienen corridas a x: si x
+        # no está en la tabla la forma se sale por un costado. Las filas
+        # de relleno tienen máscara 0: aunque y < 0, filas[y] no choca
+        corridas = self._corridas[r].get(x)
+        if corridas is None or y < corridas[0] or y > corridas[1]:
+            return True
+        filas = self.filas
+        for m in corridas[2]:
+            if filas[y] & m:
+                return True
+            y += 1
+        return False
+
+    def _fix(self):
+        rot = self._rotacion()
+        x0, y0 = rot.caja
+        x = self.px + x0
+        for j, m in enumerate(rot.mascaras):
+            y = self.py + y0 + j
+            if 0 <= y < self.rows:
+                m = m << x if x >= 0 else m >> -x
+                self.filas[y] |= m & self.lleno
+        self._clear_lines()
+        self._spawn()
+
+    def _clear_lines(self):
+        lleno = self.lleno
+        llenas = sum(1 for f in self.filas if f == lleno)
+        if llenas:
+            self.filas = [0] * llenas + [f for f in self.filas if f != lleno]
+        if self.tablas is None:
+            self.puntaje += llenas
+            return
+        puntos = self.tablas.puntos_por_lineas
+        self.puntaje += puntos[min(llenas, len(puntos) - 1)]
+        ppn = self.tablas.puntos_por_nivel
+        if ppn:
+            self.nivel = 1 + self.puntaje // ppn
+            curva = self.tablas.curva_velocidad
+            self.fall_speed = curva[min(self.nivel - 1, len(curva) - 1)]
+
+    def manejar_input(self, key):
+        if key is None:
+            return
+        key = self.teclas.get(key, key)
+        if key == 'p':
+            self.pausado = not self.pausado
+            return
+        if self.pausado:
+            return
+        if key in ('Left', 'a') and not self._collide(self.px - 1, self.py, self.rot):
+            self.px -= 1
+            self.version += 1
+        elif key in ('Right', 'd') and not self._collide(self.px + 1, self.py, self.rot):
+            self.px += 1
+            self.version += 1
+        elif key in ('w', 'Up'):
+            nuevo = (self.rot + 1) % len(self.current.rots)
+            for dx in self.current.info[nuevo].patadas:
+                if not self._collide(self.px + dx, self.py, nuevo):
+                    self.px += dx
+                    self.rot = nuevo
+                    self.version += 1
+                    break
+        elif key in ('s', 'Down'):
+            if not self._collide(self.px, self.py + 1, self.rot):
+                self.py += 1
+                self.version += 1
+            else:
+                self._fix()
+
+    def paso(self, dt):
+        if self.terminado or self.pausado:
+            return True
+        cps = max(0.2, self.fall_speed)
+        self._acc += dt
+        paso_t = 1.0 / cps
+        if self._acc >= paso_t:
+            self._acc -= paso_t
+            if not self._collide(self.px, self.py + 1, self.rot):
+                self.py += 1
+                self.version += 1
+            else:
+                self._fix()
+        return True
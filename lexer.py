@@ -1,9 +1,13 @@
+# -*- coding: utf-8 -*-
 # Parser y lexer hecho por:
 # Santiago Barrientos, Juan Esteban Rayo y Manuel Gutiérrez
 
+import io
 import re
-import json
-import os
+from array import array
+
+# Subir cuando cambie el lexer o el parser: invalida los .brikc existentes
+VERSION_GRAMATICA = 3
 
 # ---------------------------
 # LEXER
@@ -12,8 +16,11 @@ class Lexer:
 
     reglas = [
         ('STRING',   r'"[^"]*"|\'[^\']*\''), 
-        ('NUMBER',   r'[0-9]+(\.[0-9]+)?'),
-        ('BOOLEAN',  r'\b(true|false|si|no)\b'),
+        ('COMMENT',  r'#[^\n]*'),
+        ('NUMBER',   r'-?[0-9]+(\.[0-9]+)?'),
+        # bordes en ASCII (como IDENT), no \b: así vale lo mismo sobre
+        # str y sobre bytes (iter_secciones_bytes), en py2 y en py3
+        ('BOOLEAN',  r'(?<![A-Za-z0-9_])(true|false|si|no)(?![A-Za-z0-9_])'),
         ('IDENT',    r'[A-Za-z_][A-Za-z0-9_]*'),
         ('LBRACE',   r'\{'),
         ('RBRACE',   r'\}'),
@@ -32,6 +39,8 @@ class Lexer:
 
     master_pattern = re.compile("|".join(partes))
 
+    ignorados = frozenset(('NEWLINE', 'SKIP', 'COMMENT'))
+
     def __init__(self, texto):
         self.texto = texto
         self.tokens = []
@@ -68,54 +77,239 @@ class Lexer:
 
         return "".join(resultado)
 
-    def tokenize(self):
-        limpio = self.quitar_comentarios()
-
-        for match in self.master_pattern.finditer(limpio):
+    def iter_tokens(self):
+        # Un solo recorrido: los comentarios son una clase de token más del
+        # patrón maestro, así que no hace falta una copia limpia del texto.
+        for match in self.master_pattern.finditer(self.texto):
             tipo = match.lastgroup
-            valor = match.group(0)
 
-            if tipo == 'NEWLINE' or tipo == 'SKIP':
+            if tipo in self.ignorados:
                 continue
 
+            valor = match.group(0)
+
             if tipo == 'STRING':
-                self.tokens.append(('STRING', valor[1:-1]))
+                yield ('STRING', valor[1:-1])
 
             elif tipo == 'NUMBER':
                 if '.' in valor:
-                    self.tokens.append(('NUMBER', float(valor)))
+                    yield ('NUMBER', float(valor))
                 else:
-                    self.tokens.append(('NUMBER', int(valor)))
+                    yield ('NUMBER', int(valor))
 
             elif tipo == 'BOOLEAN':
-                self.tokens.append(('BOOLEAN', valor.lower() in ('true', 'si')))
+                yield ('BOOLEAN', valor.lower() in ('true', 'si'))
 
             elif tipo == 'IDENT':
-                self.tokens.append(('IDENTIFIER', valor))
-
-            elif tipo in ('LBRACE','RBRACE','LBRACKET','RBRACKET','COLON','COMMA'):
-                self.tokens.append((tipo, valor))
+                yield ('IDENTIFIER', valor)
 
             elif tipo == 'MISMATCH':
                 if valor == "=":
-                    self.tokens.append(('COLON', ':'))
+                    yield ('COLON', ':')
 
+            else:
+                yield (tipo, valor)
+
+    @staticmethod
+    def decodificar(tipo, valor):
+        # Convierte un lexema del patrón maestro en token; None si se descarta
+        if tipo == 'STRING':
+            return ('STRING', valor[1:-1])
+        if tipo == 'NUMBER':
+            return ('NUMBER', float(valor) if '.' in valor else int(valor))
+        if tipo == 'BOOLEAN':
+            return ('BOOLEAN', valor.lower() in ('true', 'si'))
+        if tipo == 'IDENT':
+            return ('IDENTIFIER', valor)
+        if tipo == 'MISMATCH':
+            return ('COLON', ':') if valor == "=" else None
+        if tipo in Lexer.ignorados:
+            return None
+        return (tipo, valor)
+
+    def iter_tokens_pos(self, pos=0):
+        # Como iter_tokens, pero cada token lleva su rango en el texto:
+        # (tipo, valor, inicio, fin)
+        decodificar = self.decodificar
+        for match in self.master_pattern.finditer(self.texto, pos):
+            tipo = match.lastgroup
+            if tipo in self.ignorados:
+                continue
+            tok = decodificar(tipo, match.group(0))
+            if tok is not None:
+                yield (tok[0], tok[1], match.start(), match.end())
+
+    def tokenize(self):
+        self.tokens.extend(self.iter_tokens())
         return self.tokens
 
+    def tokenize_buffer(self):
+        # Variante compacta de tokenize: devuelve un BufferTokens en vez de
+        # una lista de tuplas (tipos y offsets en arrays, valores perezosos)
+        buf = BufferTokens(self.texto)
+        codigos = BufferTokens.codigos
+        tipo = buf.tipos.append
+        inicio = buf.inicios.append
+        fin = buf.fines.append
+        for match in self.master_pattern.finditer(self.texto):
+            codigo = codigos.get(match.lastgroup)
+            if codigo is None:
+                continue
+            if codigo == _MISMATCH:
+                if match.group(0) != "=":
+                    continue
+                codigo = codigos['COLON']
+            a, b = match.span()
+            tipo(codigo)
+            inicio(a)
+            fin(b)
+        return buf
+
+
+# ---------------------------
+# BUFFER DE TOKENS
+# ---------------------------
+_MISMATCH = 255
+# códigos de BufferTokens.nombres con valor propio (ver trozo)
+_STRING, _NUMBER, _BOOLEAN = 0, 1, 2
+
+
+class BufferTokens:
+    # Tokens en columnas: tipo en array('B'), rango en el texto en dos
+    # array('I'). El valor se decodifica del texto fuente al pedirlo, así
+    # que no hay una tupla ni un objeto por token. Se indexa como la lista
+    # de tokenize(): buf[i] -> (tipo, valor).
+
+    nombres = ('STRING', 'NUMBER', 'BOOLEAN', 'IDENTIFIER', 'LBRACE',
+               'RBRACE', 'LBRACKET', 'RBRACKET', 'COLON', 'COMMA')
+
+    # grupo del patrón maestro -> código de tipo
+    codigos = dict((n, i) for i, n in enumerate(nombres))
+    codigos['IDENT'] = codigos.pop('IDENTIFIER')
+    codigos['MISMATCH'] = _MISMATCH
+
+    _puntuacion = {'LBRACE': '{', 'RBRACE': '}', 'LBRACKET': '[',
+                   'RBRACKET': ']', 'COLON': ':', 'COMMA': ','}
+
+    # tokens sin valor propio: la misma tupla sirve para todos
+    _fijos = []
+    for _nombre in nombres:
+        _fijos.append((_nombre, _puntuacion[_nombre]) if _nombre in _puntuacion else None)
+    _fijos = tuple(_fijos)
+
+    def __init__(self, texto):
+        self.texto = texto
+        self.tipos = array('B')
+        self.inicios = array('I')
+        self.fines = array('I')
+        self._ultimo = -1
+        self._tok = None
+
+    def __len__(self):
+        return len(self.tipos)
+
+    def __getitem__(self, i):
+        # el parser pide el mismo token varias veces (ver/avanzar/esperar)
+        if i == self._ultimo:
+            return self._tok
+        tok = self._fijos[self.tipos[i]]
+        if tok is None:
+            tipo = self.nombres[self.tipos[i]]
+            tok = (tipo, self.valor(i, tipo))
+        self._ultimo = i
+        self._tok = tok
+        return tok
+
+    def __iter__(self):
+        for i in range(len(self.tipos)):
+            yield self[i]
+
+    def trozo(self, desde, n):
+        # tokens [desde, desde + n) ya decodificados, en una lista
+        tipos, inicios, fines, texto = self.tipos, self.inicios, self.fines, self.texto
+        fijos = self._fijos
+        res = []
+        for i in range(desde, min(desde + n, len(tipos))):
+            codigo = tipos[i]
+            tok = fijos[codigo]
+            if tok is None:
+                lexema = texto[inicios[i]:fines[i]]
+                if codigo == _STRING:
+                    tok = ('STRING', lexema[1:-1])
+                elif codigo == _NUMBER:
+                    tok = ('NUMBER', float(lexema) if '.' in lexema else int(lexema))
+                elif codigo == _BOOLEAN:
+                    tok = ('BOOLEAN', lexema.lower() in ('true', 'si'))
+                else:
+                    tok = ('IDENTIFIER', lexema)
+            res.append(tok)
+        return res
+
+    def valor(self, i, tipo=None):
+        if tipo is None:
+            tipo = self.nombres[self.tipos[i]]
+        if tipo in self._puntuacion:
+            return self._puntuacion[tipo]
+        lexema = self.texto[self.inicios[i]:self.fines[i]]
+        if tipo == 'STRING':
+            return lexema[1:-1]
+        if tipo == 'NUMBER':
+            return float(lexema) if '.' in lexema else int(lexema)
+        if tipo == 'BOOLEAN':
+            return lexema.lower() in ('true', 'si')
+        return lexema
+
+    def ubicacion(self, i):
+        # (linea, columna) del token i, contadas desde 1
+        if not len(self.tipos):
+            return (1, 1)
+        if i >= len(self.tipos):
+            offset = self.fines[-1]
+        else:
+            offset = self.inicios[i]
+        linea = self.texto.count('\n', 0, offset) + 1
+        columna = offset - (self.texto.rfind('\n', 0, offset) + 1) + 1
+        return (linea, columna)
+
 
 # ---------------------------
 # PARSER
 # ---------------------------
 class Parser:
-    def __init__(self, tokens):
+    def __init__(self, tokens, compacto=False):
+        # compacto: True o una TablaConsing compartida -> AST compacto
+        # (ver compacto.py): cadenas internadas, nodos iguales compartidos
+        # y matrices 0/1 como MatrizBits
         self.tokens = tokens
         self.pos = 0
+        self.consing = None
+        if isinstance(tokens, BufferTokens):
+            # ver() lee de una ventana de tokens decodificados: la memoria
+            # sigue siendo la del buffer y no se paga __getitem__ por token
+            self._trozo = []
+            self._base = 0
+            self.ver = self._ver_buffer
+        if compacto:
+            from compacto import TablaConsing
+            self.consing = compacto if isinstance(compacto, TablaConsing) else TablaConsing()
 
     def ver(self):
         if self.pos < len(self.tokens):
             return self.tokens[self.pos]
         return (None, None)
 
+    VENTANA = 1024
+
+    def _ver_buffer(self):
+        i = self.pos - self._base
+        if 0 <= i < len(self._trozo):
+            return self._trozo[i]
+        if self.pos >= len(self.tokens):
+            return (None, None)
+        self._base = self.pos
+        self._trozo = self.tokens.trozo(self.pos, self.VENTANA)
+        return self._trozo[0]
+
     def avanzar(self):
         tok = self.ver()
         self.pos += 1
@@ -124,23 +318,38 @@ class Parser:
     def esperar(self, tipo):
         if self.ver()[0] == tipo:
             return self.avanzar()[1]
-        raise SyntaxError("Se esperaba {}, encontrado {}".format(tipo, self.ver()))
+        raise SyntaxError("Se esperaba {}, encontrado {}{}".format(tipo, self.ver(), self.donde()))
+
+    def donde(self):
+        # Con un BufferTokens los errores pueden decir línea y columna
+        if hasattr(self.tokens, 'ubicacion'):
+            return " (linea {}, columna {})".format(*self.tokens.ubicacion(self.pos))
+        return ""
 
     def parsear(self):
         resultado = {}
+        for clave, valor, _, _ in self.parsear_entradas():
+            resultado[clave] = valor
+        if self.consing is not None:
+            return self.consing.objeto(resultado)
+        return resultado
+
+    def parsear_entradas(self):
+        # Recorre las entradas de primer nivel una a una:
+        # (clave, valor, primer_token, fin_token)
         while self.pos < len(self.tokens):
             if self.ver()[0] == 'COMMA':
                 self.avanzar()
                 continue
 
+            inicio = self.pos
             clave = self.parsear_clave()
             if clave is None:
                 break
 
             self.esperar('COLON')
-            resultado[clave] = self.parsear_valor()
-
-        return resultado
+            valor = self.parsear_valor()
+            yield clave, valor, inicio, self.pos
 
     def parsear_clave(self):
         tipo, val = self.ver()
@@ -162,6 +371,8 @@ class Parser:
 
         if tipo in ('STRING', 'NUMBER', 'BOOLEAN'):
             self.avanzar()
+            if tipo == 'STRING' and self.consing is not None:
+                return self.consing.cadena(val)
             return val
 
         if tipo == 'LBRACE':
@@ -171,6 +382,8 @@ class Parser:
             return self.parsear_lista()
 
         self.avanzar()
+        if tipo == 'IDENTIFIER' and self.consing is not None:
+            return self.consing.cadena(val)
         return val
 
     def parsear_objeto(self):
@@ -188,11 +401,13 @@ class Parser:
 
             clave = self.parsear_clave()
             if clave is None:
-                raise SyntaxError("Se esperaba clave dentro de {}")
+                raise SyntaxError("Se esperaba clave dentro de {{}}{}".format(self.donde()))
 
             self.esperar('COLON')
             obj[clave] = self.parsear_valor()
 
+        if self.consing is not None:
+            return self.consing.objeto(obj)
         return obj
 
     def parsear_lista(self):
@@ -204,19 +419,273 @@ class Parser:
                 self.avanzar()
                 break
 
+            if self.ver()[0] is None:
+                raise SyntaxError("Se esperaba RBRACKET, encontrado fin de archivo{}".format(self.donde()))
+
             if self.ver()[0] == 'COMMA':
                 self.avanzar()
                 continue
 
             lista.append(self.parsear_valor())
 
+        if self.consing is not None:
+            return self.consing.lista(lista)
         return lista
 
 
+# ---------------------------
+# API PUBLICA
+# ---------------------------
+def parse_text(texto, compacto=False):
+    # con BufferTokens: menos memoria y errores con línea y columna
+    return Parser(Lexer(texto).tokenize_buffer(), compacto=compacto).parsear()
+
+
+def _texto_fuente(fuente):
+    # bytes de un .brik -> texto, con los saltos de línea como los deja
+    # io.open en modo texto ('\r\n' y '\r' pasan a '\n'): con o sin
+    # cache, el mismo archivo da el mismo AST
+    return fuente.decode('utf-8').replace(u'\r\n', u'\n').replace(u'\r', u'\n')
+
+
+def parse_file(ruta, cache=None, compacto=False):
+    # cache: directorio o CacheAST; si hay entrada para el contenido actual
+    # del archivo se devuelve sin lexear ni parsear.
+    with open(ruta, 'rb') as f:
+        fuente = f.read()
+    if cache is None:
+        return parse_text(_texto_fuente(fuente), compacto=compacto)
+
+    from cache_ast import CacheAST
+
+    if not isinstance(cache, CacheAST):
+        cache = CacheAST(cache)
+
+    clave = cache.clave(fuente, VERSION_GRAMATICA)
+    ast = cache.cargar(clave)
+    if ast is None:
+        ast = parse_text(_texto_fuente(fuente))
+        cache.guardar(clave, ast)
+    if compacto:
+        # la cache guarda el AST plano (marshal no conoce MatrizBits)
+        from compacto import TablaConsing, compactar
+        ast = compactar(ast, compacto if isinstance(compacto, TablaConsing) else None)
+    return ast
+
+
+# ---------------------------
+# LECTURA POR SECCIONES
+# ---------------------------
+def iter_secciones(ruta, secciones=None, compacto=False):
+    # Recorre un .brik mapeado en memoria y entrega (seccion, valor) por
+    # cada entrada de primer nivel, sin construir el dict completo. Con
+    # `secciones` (conjunto de nombres) el resto se salta sin decodificar.
+    # La memoria queda acotada por la sección más grande, no por el archivo.
+    import mmap
+
+    with open(ruta, 'rb') as f:
+        try:
+            datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # archivo vacío: mmap no admite longitud 0
+            return
+        try:
+            for entrada in iter_secciones_bytes(datos, secciones, compacto):
+                yield entrada
+        finally:
+            try:
+                datos.close()
+            except BufferError:
+                # si se sale por una excepción su traceback aún retiene el
+                # iterador del regex sobre el mapa; se libera con el GC
+                pass
+
+
+def _tokens_crudos(datos, pos=0):
+    # (grupo, inicio, fin) sobre bytes, sin espacios ni comentarios; de
+    # los MISMATCH sólo queda '=', que Lexer.decodificar lee como COLON
+    ignorados = Lexer.ignorados
+    for match in _patrones_bytes()[0].finditer(datos, pos):
+        grupo = match.lastgroup
+        if grupo in ignorados:
+            continue
+        if grupo == 'MISMATCH' and match.group(0) != b'=':
+            continue
+        yield grupo, match.start(), match.end()
+
+
+# Patrones sobre bytes: el maestro del lexer y dos para saltar valores sin
+# tokenizar todo. Dentro de una lista sólo importan las llaves y corchetes
+# (strings y comentarios se pasan enteros); en un objeto importa cada
+# token, pero no hace falta que el regex entregue los espacios ni los
+# caracteres que el lexer descarta. Se compilan la primera vez que se leen
+# secciones: importar el módulo no los paga.
+_PATRONES_BYTES = None
+
+
+def _patrones_bytes():
+    # (maestro, salto, forma)
+    global _PATRONES_BYTES
+    if _PATRONES_BYTES is None:
+        reglas = Lexer.reglas
+        _PATRONES_BYTES = (
+            re.compile("|".join(Lexer.partes).encode('ascii')),
+            re.compile(b'"[^"]*"|\'[^\']*\'|#[^\n]*|(\\[)|(\\{)|(\\])|(\\})'),
+            re.compile("|".join(
+                ["(?P<{}>{})".format(nombre, regla) for nombre, regla in reglas
+                 if nombre not in ('NEWLINE', 'SKIP', 'MISMATCH')] + ['(?P<IGUAL>=)']).encode('ascii')),
+        )
+    return _PATRONES_BYTES
+
+
+def _saltar_valor(datos, pos):
+    # Recorre sin decodificar el valor que empieza en pos y devuelve el
+    # offset siguiente. Sigue las reglas de parsear_valor/parsear_lista/
+    # parsear_objeto: un '}' dentro de una lista, o un ']' o '}' donde se
+    # espera un valor, son valores y no cierran nada.
+    _, salto, forma = _patrones_bytes()
+    salto, forma = salto.search, forma.search
+    pila = []
+    estado = 'valor'
+    while True:
+        if estado == 'lista':
+            match = salto(datos, pos)
+            if match is None:
+                break
+            pos = match.end()
+            cual = match.lastindex
+            if cual == 1:
+                pila.append('lista')
+            elif cual == 2:
+                pila.append('clave')
+                estado = 'clave'
+            elif cual == 3:
+                pila.pop()
+                if not pila:
+                    return pos
+                estado = pila[-1]
+            # strings, comentarios y '}' sueltos no cambian nada
+            continue
+
+        match = forma(datos, pos)
+        if match is None:
+            break
+        pos = match.end()
+        grupo = match.lastgroup
+        if grupo == 'COMMENT':
+            continue
+
+        if estado == 'valor':
+            if grupo == 'LBRACKET':
+                pila.append('lista')
+                estado = 'lista'
+                continue
+            if grupo == 'LBRACE':
+                pila.append('clave')
+                estado = 'clave'
+                continue
+            # un escalar (cualquier otro token) completa el valor
+
+        elif estado == 'clave':
+            if grupo == 'COMMA':
+                continue
+            if grupo == 'IDENT':
+                estado = 'dos_puntos'
+                continue
+            if grupo == 'LBRACKET':
+                estado = 'clave_id'
+                continue
+            if grupo != 'RBRACE':
+                raise SyntaxError("Se esperaba clave dentro de {{}} (byte {})".format(match.start()))
+            pila.pop()
+
+        elif estado == 'clave_id':
+            if grupo != 'IDENT':
+                raise SyntaxError("Se esperaba IDENTIFIER en la clave (byte {})".format(match.start()))
+            estado = 'clave_cierre'
+            continue
+
+        elif estado == 'clave_cierre':
+            if grupo != 'RBRACKET':
+                raise SyntaxError("Se esperaba RBRACKET en la clave (byte {})".format(match.start()))
+            estado = 'dos_puntos'
+            continue
+
+        else:
+            if grupo not in ('COLON', 'IGUAL'):
+                raise SyntaxError("Se esperaba COLON (byte {})".format(match.start()))
+            estado = 'valor'
+            continue
+
+        # se completó un valor: se vuelve a la lista u objeto que lo contiene
+        if not pila:
+            return pos
+        estado = pila[-1]
+
+    if pila:
+        raise SyntaxError("Valor sin cerrar al final del archivo")
+    return len(datos)
+
+
+class _ParserFlujo(Parser):
+    # Parser que pide los tokens al iterador a medida que los mira: un
+    # valor consume exactamente los tokens que consumiría en parse_text,
+    # con las mismas reglas de parsear_lista/parsear_objeto.
+    def __init__(self, crudos, decodificar, compacto=False):
+        Parser.__init__(self, [], compacto=compacto)
+        self.crudos = crudos
+        self.decodificar = decodificar
+        self.fin = 0    # offset siguiente al último token pedido
+
+    def ver(self):
+        while self.pos >= len(self.tokens):
+            tok = next(self.crudos, None)
+            if tok is None:
+                return (None, None)
+            self.tokens.append(self.decodificar(*tok))
+            self.fin = tok[2]
+        return self.tokens[self.pos]
+
+
+def iter_secciones_bytes(datos, secciones=None, compacto=False):
+    # Igual que Parser.parsear_entradas, pero sobre un buffer de bytes y
+    # con un parser por entrada: no se guardan los tokens de todo el archivo.
+    if secciones is not None:
+        secciones = frozenset(secciones)
+    if compacto:
+        from compacto import TablaConsing
+        if not isinstance(compacto, TablaConsing):
+            compacto = TablaConsing()
+
+    def decodificar(grupo, inicio, fin):
+        return Lexer.decodificar(grupo, datos[inicio:fin].decode('utf-8'))
+
+    crudos = _tokens_crudos(datos)
+    while True:
+        parser = _ParserFlujo(crudos, decodificar, compacto=compacto)
+        while parser.ver()[0] == 'COMMA':
+            parser.avanzar()
+
+        # mismo criterio que parsear(): lo que no es clave termina
+        nombre = parser.parsear_clave()
+        if nombre is None:
+            break
+        parser.esperar('COLON')
+
+        if secciones is not None and nombre not in secciones:
+            # tras COLON no se pidió ningún token más: se salta desde ahí
+            crudos = _tokens_crudos(datos, _saltar_valor(datos, parser.fin))
+            continue
+
+        yield nombre, parser.parsear_valor()
+
+
 # ---------------------------
 # GUARDAR AST
 # ---------------------------
 def save_ast_to_file(ast, filepath):
+    import json
+
     try:
         with open(filepath, 'w') as file:
             json.dump(ast, file, indent=4)
@@ -228,28 +697,38 @@ def save_ast_to_file(ast, filepath):
 # ---------------------------
 # PROGRAMA PRINCIPAL
 # ---------------------------
-archivos = ["snake.brik", "tetris.brik"]
+def main(archivos=None):
+    import json
+    import os
+
+    if not archivos:
+        archivos = ["snake.brik", "tetris.brik"]
+
+    for ruta in archivos:
+
+        if not os.path.exists(ruta):
+            print("No se encontró el archivo: {}".format(ruta))
+            continue
 
-for ruta in archivos:
+        with io.open(ruta, 'r', encoding='utf-8') as f:
+            texto = f.read()
 
-    if not os.path.exists(ruta):
-        print("No se encontró el archivo: {}".format(ruta))
-        continue
+        lexer = Lexer(texto)
+        tokens = lexer.tokenize_buffer()
 
-    with open(ruta, 'r') as f:
-        texto = f.read()
+        print("\n=== Tokens para {} ===".format(ruta))
+        for i, tok in enumerate(tokens):
+            print("{:03d}: {}".format(i, tok))
 
-    lexer = Lexer(texto)
-    tokens = lexer.tokenize()
+        parser = Parser(tokens)
+        resultado = parser.parsear()
 
-    print("\n=== Tokens para {} ===".format(ruta))
-    for i, tok in enumerate(tokens):
-        print("{:03d}: {}".format(i, tok))
+        print("\nResultado en JSON :")
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
 
-    parser = Parser(tokens)
-    resultado = parser.parsear()
+        save_ast_to_file(resultado, ruta + ".ast.json")
 
-    print("\nResultado en JSON :")
-    print(json.dumps(resultado, indent=2, ensure_ascii=False))
 
-    save_ast_to_file(resultado, ruta + ".ast.json")
+if __name__ == '__main__':
+    import sys
+    main(sys.argv[1:])
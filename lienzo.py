@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+# Dibujo retenido sobre un tk.Canvas
+#
+# En vez de borrar el lienzo y volver a crear todos los items en cada
+# cuadro, la escena crea una vez (por tamaño de ventana y de tablero) un
+# rectángulo por celda y luego sólo toca las celdas cuyo contenido cambió
+# desde el cuadro anterior. El costo por cuadro depende de lo que se movió,
+# no del tamaño del tablero.
+#
+# Lo que no cambia entre cuadros (marco, grilla, líneas CRT, pantalla de
+# bienvenida) va en capas: items bajo un tag que se construyen una vez por
+# clave (tamaño de lienzo, de tablero...) y después no se tocan.
+#
+# Para tableros enormes, CeldasImagen pinta las celdas en una PhotoImage
+# (framebuffer) en vez de usar un item por celda. Si ni así entran en el
+# lienzo, una Camara elige la ventana del tablero que se ve y las celdas
+# son sólo las de esa ventana.
+#
+# No importa Tkinter: recibe el canvas ya creado (sirve igual en py2 y py3
+# y se puede probar con un canvas falso).
+
+OCULTO = 'hidden'
+VISIBLE = 'normal'
+
+
+class CeldasRetenidas(object):
+    # Un rectángulo por celda. estilos: {(x, y): (relleno, margen)}; las
+    # celdas que no aparecen quedan ocultas.
+    def __init__(self, canvas, cols, rows, ox, oy, cell, outline='#06120f', tag='celdas'):
+        self.canvas = canvas
+        self.cols, self.rows = cols, rows
+        self.ox, self.oy, self.cell = ox, oy, cell
+        self.tag = tag
+        self.items = []
+        self.margenes = []
+        for y in range(rows):
+            for x in range(cols):
+                self.items.append(canvas.create_rectangle(
+                    self._coords(x, y, 1), outline=outline, state=OCULTO, tags=tag))
+                self.margenes.append(1)
+        self.estilos = {}
+
+    def _coords(self, x, y, pad):
+        ox, oy, cell = self.ox, self.oy, self.cell
+        return (ox + x * cell + pad, oy + y * cell + pad,
+                ox + (x + 1) * cell - pad, oy + (y + 1) * cell - pad)
+
+    def actualizar(self, estilos):
+        # devuelve cuántas celdas cambiaron
+        canvas = self.canvas
+        cols, rows = self.cols, self.rows
+        anteriores = self.estilos
+        nuevos = {}
+        cambios = 0
+        for pos, estilo in estilos.items():
+            x, y = pos
+            if not (0 <= x < cols and 0 <= y < rows):
+                continue
+            nuevos[pos] = estilo
+            if anteriores.get(pos) == estilo:
+                continue
+            i = y * cols + x
+            relleno, pad = estilo
+            if self.margenes[i] != pad:
+                canvas.coords(self.items[i], *self._coords(x, y, pad))
+                self.margenes[i] = pad
+            canvas.itemconfig(self.items[i], fill=relleno, state=VISIBLE)
+            cambios += 1
+        for pos in anteriores:
+            if pos not in nuevos:
+                x, y = pos
+                canvas.itemconfig(self.items[y * cols + x], state=OCULTO)
+                cambios += 1
+        self.estilos = nuevos
+        return cambios
+
+
+class CeldasImagen(object):
+    # Lo mismo que CeldasRetenidas pero sobre una sola tk.PhotoImage (un
+    # item en el canvas), para tableros de cientos de miles de celdas. Sólo
+    # se usa el relleno de cada estilo: las celdas llenan su bloque menos un
+    # pixel de borde (ninguno si miden menos de 4 px).
+    #
+    # Las celdas sucias se juntan en tramos por fila y cada tramo es un
+    # único put: una fila de pixeles que Tk repite hacia abajo (-to).
+    HUECO = 8   # celdas limpias que se repintan para no cortar un tramo
+
+    def __init__(self, canvas, imagen, cols, rows, ox, oy, cell, fondo, tag='celdas'):
+        # imagen: tk.PhotoImage de cols*cell x rows*cell (hay que guardarla:
+        # Tk la borra si se pierde la referencia)
+        self.canvas = canvas
+        self.imagen = imagen
+        self.cols, self.rows = cols, rows
+        self.cell = cell
+        self.fondo = fondo
+        self.margen = 1 if cell >= 4 else 0
+        self.tag = tag
+        self._bloques = {}
+        imagen.put(fondo, to=(0, 0, cols * cell, rows * cell))
+        self.item = canvas.create_image(ox, oy, image=imagen, anchor='nw', tags=tag)
+        self.estilos = {}
+
+    def _bloque(self, relleno):
+        # los pixeles de una celda en una fila, ya como texto para put
+        bloque = self._bloques.get(relleno)
+        if bloque is None:
+            m = self.margen
+            bloque = ' '.join([self.fondo] * m + [relleno] * (self.cell - 2 * m) + [self.fondo] * m)
+            self._bloques[relleno] = bloque
+        return bloque
+
+    def actualizar(self, estilos):
+        # devuelve cuántas celdas cambiaron
+        cols, rows = self.cols, self.rows
+        anteriores = self.estilos
+        nuevos = {}
+        sucias = []
+        for pos, estilo in estilos.items():
+            x, y = pos
+            if not (0 <= x < cols and 0 <= y < rows):
+                continue
+            relleno = estilo[0]
+            nuevos[pos] = relleno
+            if anteriores.get(pos) != relleno:
+                sucias.append((y, x))
+        for pos in anteriores:
+            if pos not in nuevos:
+                sucias.append((pos[1], pos[0]))
+        self.estilos = nuevos
+        if sucias:
+            self._pintar(sorted(sucias))
+        return len(sucias)
+
+    def _pintar(self, sucias):
+        # sucias: (y, x) ordenadas
+        i, n = 0, len(sucias)
+        while i < n:
+            y, x0 = sucias[i]
+            x1 = x0
+            i += 1
+            while i < n and sucias[i][0] == y and sucias[i][1] <= x1 + 1 + self.HUECO:
+                x1 = sucias[i][1]
+                i += 1
+            self._tramo(y, x0, x1)
+
+    def _tramo(self, y, x0, x1):
+        cell, m, fondo = self.cell, self.margen, self.fondo
+        estilos = self.estilos
+        fila = ' '.join([self._bloque(estilos.get((x, y), fondo)) for x in range(x0, x1 + 1)])
+        px, py = x0 * cell, y * cell
+        self.imagen.put('{' + fila + '}', to=(px, py + m, px + (x1 - x0 + 1) * cell, py + cell - m))
+
+
+class Camara(object):
+    # Ventana de ancho x alto celdas sobre un tablero de cols x rows que
+    # sigue a un punto (la cabeza). Se mueve a saltos: mientras el punto
+    # esté a más de `margen` celdas del borde de la ventana no se mueve;
+    # si se acerca, la ventana se recentra en ese eje. Así casi todos los
+    # cuadros son sólo el diff de lo que se movió adentro de la ventana.
+    def __init__(self, cols, rows, ancho, alto, margen=None):
+        self.cols, self.rows = cols, rows
+        self.ancho, self.alto = min(ancho, cols), min(alto, rows)
+        if margen is None:
+            self.margen_x, self.margen_y = self.ancho // 4, self.alto // 4
+        else:
+            self.margen_x = min(margen, (self.ancho - 1) // 2)
+            self.margen_y = min(margen, (self.alto - 1) // 2)
+        self.x = self.y = 0
+
+    def _eje(self, p, actual, ancho, margen, total):
+        if actual + margen <= p < actual + ancho - margen:
+            return actual
+        return max(0, min(total - ancho, p - ancho // 2))
+
+    def seguir(self, x, y):
+        # True si la ventana se movió
+        nx = self._eje(x, self.x, self.ancho, self.margen_x, self.cols)
+        ny = self._eje(y, self.y, self.alto, self.margen_y, self.rows)
+        movida = (nx, ny) != (self.x, self.y)
+        self.x, self.y = nx, ny
+        return movida
+
+    def rect(self):
+        # (x0, y0, x1, y1) del tablero a la vista, x1 e y1 excluidos
+        return self.x, self.y, self.x + self.ancho, self.y + self.alto
+
+
+class Escena(object):
+    # Lo retenido de un cuadro: la clave con la que se construyó (tipo de
+    # juego, tablero, tamaño), las capas estáticas, las celdas y otros
+    # items con nombre cuyas opciones sólo se mandan a Tk cuando cambian.
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.clave = None
+        self.celdas = None
+        self.camara = None
+        self._items = {}
+        self._capas = {}
+
+    def vigente(self, clave):
+        # False si hay que reconstruir (la escena queda vacía con la clave nueva)
+        if clave == self.clave:
+            return True
+        self.invalidar()
+        self.clave = clave
+        return False
+
+    def invalidar(self):
+        # el lienzo se va a borrar entero: olvidar todo lo retenido
+        self.clave = None
+        self.celdas = None
+        self.camara = None
+        self._items = {}
+        self._capas = {}
+
+    def capa(self, nombre, clave, construir):
+        # construir(tag) crea los items de la capa con tags=tag; sólo se
+        # vuelve a llamar si cambia la clave. Devuelve True si construyó.
+        if nombre in self._capas and self._capas[nombre] == clave:
+            return False
+        self.canvas.delete(nombre)
+        construir(nombre)
+        self._capas[nombre] = clave
+        return True
+
+    def quitar(self, nombre):
+        if nombre in self._capas:
+            del self._capas[nombre]
+            self.canvas.delete(nombre)
+
+    def agregar(self, nombre, item, **opciones):
+        # opciones: las que ya tiene el item al crearlo
+        self._items[nombre] = (item, dict(opciones))
+        return item
+
+    def configurar(self, nombre, **opciones):
+        item, actuales = self._items[nombre]
+        distintas = dict((k, v) for k, v in opciones.items() if actuales.get(k) != v)
+        if distintas:
+            self.canvas.itemconfig(item, **distintas)
+            actuales.update(distintas)
+        return bool(distintas)
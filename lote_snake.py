@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+# Lote de partidas de Snake sobre arrays de NumPy
+#
+# Avanza miles de partidas a la vez con las mismas reglas que
+# JuegoSnake.paso (aprendizaje por refuerzo, barridos de balance). Todo el
+# estado vive en arrays con una fila por partida: ocupación y celdas
+# libres por bloque (la libre al azar es la k-ésima en orden de celda,
+# como en juegos.Ocupacion), cuerpo en un buffer circular, comidas en una
+# lista ordenada por partida, timers.
+#
+# Azar: cada partida lee sus números de una cinta (fila de uniformes en
+# [0, 1)) con un cursor propio, en el mismo orden y cantidad en que
+# JuegoSnake llama a random() (las celdas al azar salen de un random()
+# cada una, ver juegos._azar_indice). Con AzarCinta un JuegoSnake
+# puede leer los mismos números, y así se compara paso a paso (ver
+# bench.py lote_snake).
+#
+# Necesita numpy.
+
+import numpy as np
+
+import tablas as reglas
+from juegos import COMIDAS_SNAKE, CUERPO, LIBRE, OBSTACULO, COMIDA
+
+# acciones de dirigir(): 0 = seguir igual
+NADA, ARRIBA, ABAJO, IZQUIERDA, DERECHA = 0, 1, 2, 3, 4
+_DX = np.array([0, 0, 0, -1, 1], dtype=np.int8)
+_DY = np.array([0, -1, 1, 0, 0], dtype=np.int8)
+
+TIPOS = ('normal', 'dorada', 'negra', 'velocidad', 'lenta')
+_NORMAL, _DORADA, _NEGRA, _VELOCIDAD, _LENTA = range(len(TIPOS))
+
+# efecto especial activo
+_SIN_EFECTO, _EFECTO_VELOCIDAD, _EFECTO_LENTA = 0, 1, 2
+
+# números al azar que puede leer una partida en un paso: chequeo de
+# especial, tipo, celda de la especial y celda de la comida nueva
+_AZAR_POR_PASO = 4
+_LARGO_CINTA = 64
+
+# celdas por bloque de la cuenta de libres (1 << _BITS_BLOQUE): la libre al
+# azar busca primero el bloque y después la celda dentro de él. Las filas
+# de celdas se completan hasta un bloque entero con _FUERA (nunca libre)
+_BITS_BLOQUE = 6
+_FUERA = 255
+
+# unos de cada byte, y posición del k-ésimo uno (k < 8) de cada byte
+_UNOS_8 = np.array([bin(v).count('1') for v in range(256)], dtype=np.int8)
+_KESIMO_8 = np.array([[([b for b in range(8) if v >> b & 1] + [0] * 8)[k] for k in range(8)]
+                      for v in range(256)], dtype=np.int64)
+
+
+class AzarCinta:
+    # Reemplazo de random.Random para JuegoSnake que lee una cinta fija
+    def __init__(self, valores):
+        self.valores = list(valores)
+        self.leidos = 0
+
+    def random(self):
+        u = self.valores[self.leidos]
+        self.leidos += 1
+        return u
+
+
+class LoteSnake:
+    def __init__(self, n, cols=28, rows=20, velocidad=6.0, obstaculos_cantidad=8, tablas=None, semilla=None):
+        # mismos parámetros que JuegoSnake, más la cantidad de partidas
+        if tablas is not None:
+            cols, rows = tablas.cols, tablas.rows
+            velocidad = tablas.velocidad
+            obstaculos_cantidad = tablas.obstaculos
+        tipos_comida = tablas.comidas if tablas is not None else COMIDAS_SNAKE
+        especiales = tablas.especiales if tablas is not None else reglas.ESPECIALES_SNAKE
+        self.tablas = tablas
+        self.n = n
+        self.cols = cols
+        self.rows = rows
+        self.base_speed = float(velocidad)
+        self.obstaculos_cantidad = obstaculos_cantidad
+
+        self._puntos_tipo = np.array([tipos_comida[t].puntos for t in TIPOS], dtype=np.int64)
+        self._duracion_tipo = np.array([tipos_comida[t].duracion for t in TIPOS], dtype=np.float64)
+        self._umbrales = np.array([u for u, _ in especiales], dtype=np.float64)
+        self._tipos_especiales = np.array([TIPOS.index(t) for _, t in especiales], dtype=np.int8)
+        if tablas is not None:
+            self._curva = np.array(tablas.curva_velocidad, dtype=np.float64)
+
+        celdas = cols * rows
+        bloque = 1 << _BITS_BLOQUE
+        bloques = -(-celdas // bloque)
+        self.celdas = np.full((n, bloques * bloque), _FUERA, dtype=np.uint8)
+        self._bloque_lleno = np.minimum(celdas - np.arange(0, celdas, bloque), bloque).astype(np.int16)
+        self.por_bloque = np.zeros((n, len(self._bloque_lleno)), dtype=np.int16)
+        self.n_libres = np.zeros(n, dtype=np.int64)
+
+        # cuerpo: buffer circular de celdas, de la cola a la cabeza
+        self.cuerpo_celdas = np.zeros((n, 16), dtype=np.int32)
+        self.cola = np.zeros(n, dtype=np.int64)
+        self.largo = np.zeros(n, dtype=np.int64)
+
+        # comidas: lista ordenada por partida (orden de aparición)
+        self.comida_celda = np.zeros((n, 4), dtype=np.int32)
+        self.comida_tipo = np.zeros((n, 4), dtype=np.int8)
+        self.comida_puntos = np.zeros((n, 4), dtype=np.int64)
+        self.comida_vence = np.zeros((n, 4), dtype=np.float64)
+        self.n_comidas = np.zeros(n, dtype=np.int64)
+
+        self.dx = np.zeros(n, dtype=np.int8)
+        self.dy = np.zeros(n, dtype=np.int8)
+        self.puntaje = np.zeros(n, dtype=np.int64)
+        self.muerto = np.zeros(n, dtype=bool)
+        self.velocidad = np.zeros(n, dtype=np.float64)
+        self.tiempo = np.zeros(n, dtype=np.float64)
+        self.acum = np.zeros(n, dtype=np.float64)
+        self.efecto = np.zeros(n, dtype=np.int8)
+        self.efecto_timer = np.zeros(n, dtype=np.float64)
+
+        self.rng = np.random.default_rng(semilla)
+        self._largo_cinta = max(_LARGO_CINTA, 2 * (obstaculos_cantidad + 2 + _AZAR_POR_PASO))
+        self.cinta = self.rng.random((n, self._largo_cinta))
+        self.cursor = np.zeros(n, dtype=np.int64)
+
+        self._filas = np.arange(n)
+        self.reiniciar()
+
+    # -------------------- AZAR --------------------
+    def _asegurar_azar(self, k):
+        # deja al menos k números sin leer en cada fila (conserva el orden)
+        largo = self._largo_cinta
+        if k > largo:
+            raise ValueError("la cinta tiene {} números por partida".format(largo))
+        if self.cursor.max() <= largo - k:
+            return
+        nuevos = self.rng.random((self.n, largo))
+        todo = np.concatenate([self.cinta, nuevos], axis=1)
+        indices = self.cursor[:, None] + np.arange(largo)
+        self.cinta = np.take_along_axis(todo, indices, axis=1)
+        self.cursor[:] = 0
+
+    def _azar(self, mascara):
+        # un número por partida; solo avanzan los cursores de `mascara`
+        u = self.cinta[self._filas, self.cursor]
+        self.cursor += mascara
+        return u
+
+    def azar_pendiente(self, k):
+        # (n, k): los próximos k números que leerá cada partida
+        self._asegurar_azar(k)
+        indices = self.cursor[:, None] + np.arange(k)
+        return np.take_along_axis(self.cinta, indices, axis=1)
+
+    # -------------------- OCUPACION --------------------
+    def _ocupar(self, mascara, celda, tipo):
+        # LIBRE -> tipo en las partidas de `mascara`
+        g = self._filas[mascara]
+        c = celda[mascara]
+        self.por_bloque[g, c >> _BITS_BLOQUE] -= 1
+        self.n_libres[g] -= 1
+        self.celdas[g, c] = tipo
+
+    def _liberar(self, mascara, celda):
+        g = self._filas[mascara]
+        c = celda[mascara]
+        self.por_bloque[g, c >> _BITS_BLOQUE] += 1
+        self.n_libres[g] += 1
+        self.celdas[g, c] = LIBRE
+
+    def _celda_libre(self, mascara):
+        # como Ocupacion.libre_aleatoria: sin celdas libres no lee azar.
+        # Devuelve (celdas, mascara de partidas que obtuvieron una)
+        hay = mascara & (self.n_libres > 0)
+        u = self._azar(hay)
+        i = np.minimum((u * self.n_libres).astype(np.int64), np.maximum(self.n_libres - 1, 0))
+        celda = np.zeros(self.n, dtype=np.int32)
+        g = self._filas[hay]
+        if len(g):
+            # la i-ésima libre en orden de celda: el bloque donde está y,
+            # dentro de él, la celda
+            k = i[g]
+            acum = np.cumsum(self.por_bloque[g], axis=1)
+            b = np.argmax(acum > k[:, None], axis=1)
+            filas = np.arange(len(g))
+            k -= acum[filas, b] - self.por_bloque[g, b]
+            # en el bloque, de a bytes de 8 celdas libres/ocupadas
+            libres = self.celdas.reshape(self.n, -1, 1 << _BITS_BLOQUE)[g, b] == LIBRE
+            bytes_ = np.packbits(libres, axis=1, bitorder='little')
+            unos = _UNOS_8[bytes_]
+            acum = np.cumsum(unos, axis=1, dtype=np.int8)
+            j = np.argmax(acum > k[:, None], axis=1)
+            k -= acum[filas, j] - unos[filas, j]
+            celda[g] = (b << _BITS_BLOQUE) + 8 * j + _KESIMO_8[bytes_[filas, j], k]
+        return celda, hay
+
+    # -------------------- COMIDAS --------------------
+    def _agregar_comida(self, mascara, celda, tipo):
+        if not mascara.any():
+            return
+        if self.n_comidas[mascara].max() >= self.comida_celda.shape[1]:
+            self._ampliar_comidas()
+        g = self._filas[mascara]
+        j = self.n_comidas[g]
+        t = tipo[mascara] if isinstance(tipo, np.ndarray) else tipo
+        self.comida_celda[g, j] = celda[mascara]
+        self.comida_tipo[g, j] = t
+        self.comida_puntos[g, j] = self._puntos_tipo[t]
+        self.comida_vence[g, j] = self.tiempo[g] + self._duracion_tipo[t]
+        self.n_comidas[g] += 1
+        self._ocupar(mascara, celda, COMIDA)
+
+    def _ampliar_comidas(self):
+        for nombre in ('comida_celda', 'comida_tipo', 'comida_puntos', 'comida_vence'):
+            viejo = getattr(self, nombre)
+            setattr(self, nombre, np.concatenate([viejo, np.zeros_like(viejo)], axis=1))
+
+    def _compactar_comidas(self, quedan):
+        # quita de cada lista las comidas con quedan == False, sin cambiar el orden
+        ancho = quedan.shape[1]
+        clave = np.where(quedan, 0, ancho) + np.arange(ancho)
+        orden = np.argsort(clave, axis=1, kind='stable')
+        for nombre in ('comida_celda', 'comida_tipo', 'comida_puntos', 'comida_vence'):
+            setattr(self, nombre, np.take_along_axis(getattr(self, nombre), orden, axis=1))
+        self.n_comidas = quedan.sum(axis=1)
+
+    def _validas(self):
+        return np.arange(self.comida_celda.shape[1]) < self.n_comidas[:, None]
+
+    # -------------------- CUERPO --------------------
+    def _cabeza(self):
+        ancho = self.cuerpo_celdas.shape[1]
+        return self.cuerpo_celdas[self._filas, (self.cola + self.largo - 1) % ancho]
+
+    def _empujar_cabeza(self, mascara, celda):
+        ancho = self.cuerpo_celdas.shape[1]
+        if self.largo.max(initial=0, where=mascara) >= ancho:
+            # duplicar el buffer dejando cada cuerpo desde la columna 0
+            indices = (self.cola[:, None] + np.arange(ancho)) % ancho
+            lineal = np.take_along_axis(self.cuerpo_celdas, indices, axis=1)
+            self.cuerpo_celdas = np.concatenate([lineal, np.zeros_like(lineal)], axis=1)
+            self.cola[:] = 0
+            ancho *= 2
+        g = self._filas[mascara]
+        self.cuerpo_celdas[g, (self.cola[g] + self.largo[g]) % ancho] = celda[mascara]
+        self.largo[g] += 1
+
+    def _sacar_cola(self, mascara):
+        g = self._filas[mascara]
+        cola = np.zeros(self.n, dtype=np.int32)
+        cola[g] = self.cuerpo_celdas[g, self.cola[g]]
+        self.cola[g] = (self.cola[g] + 1) % self.cuerpo_celdas.shape[1]
+        self.largo[g] -= 1
+        self._liberar(mascara, cola)
+
+    # -------------------- PARTIDA --------------------
+    def reiniciar(self, mascara=None):
+        # reinicia las partidas de `mascara` (todas si es None), como
+        # JuegoSnake.reiniciar
+        if mascara is None:
+            mascara = np.ones(self.n, dtype=bool)
+        # copia: mascara suele ser self.muerto, que se modifica aquí
+        mascara = np.array(mascara, dtype=bool)
+        g = self._filas[mascara]
+        if not len(g):
+            return
+        self._asegurar_azar(self.obstaculos_cantidad + 2)
+
+        celdas = self.cols * self.rows
+        self.celdas[g, :celdas] = LIBRE
+        self.por_bloque[g] = self._bloque_lleno
+        self.n_libres[g] = celdas
+        self.n_comidas[g] = 0
+        self.cola[g] = 0
+        self.largo[g] = 0
+        self.dx[g] = 1
+        self.dy[g] = 0
+        self.puntaje[g] = 0
+        self.muerto[g] = False
+        self.acum[g] = 0.0
+        self.tiempo[g] = 0.0
+        self.efecto[g] = _SIN_EFECTO
+        self.efecto_timer[g] = 0.0
+        self.velocidad[g] = self.base_speed
+
+        cx, cy = self.cols // 2, self.rows // 2
+        for x in (cx - 2, cx - 1, cx):
+            celda = np.full(self.n, cy * self.cols + x, dtype=np.int32)
+            self._empujar_cabeza(mascara, celda)
+            self._ocupar(mascara, celda, CUERPO)
+
+        # obstaculos (como _generar_obstaculos: hasta que no haya lugar)
+        for _ in range(self.obstaculos_cantidad):
+            celda, hay = self._celda_libre(mascara)
+            self._ocupar(hay, celda, OBSTACULO)
+        for _ in range(2):
+            celda, hay = self._celda_libre(mascara)
+            self._agregar_comida(hay, celda, _NORMAL)
+
+    def dirigir(self, acciones):
+        # acciones: array (n,) con NADA/ARRIBA/ABAJO/IZQUIERDA/DERECHA.
+        # Igual que manejar_input, no se puede dar la vuelta en el lugar.
+        acciones = np.asarray(acciones)
+        dx = _DX[acciones]
+        dy = _DY[acciones]
+        vale = (acciones != NADA) & ((dx != -self.dx) | (dy != -self.dy))
+        self.dx = np.where(vale, dx, self.dx)
+        self.dy = np.where(vale, dy, self.dy)
+
+    def paso(self, dt):
+        activos = ~self.muerto
+        if not activos.any():
+            return
+        self._asegurar_azar(_AZAR_POR_PASO)
+        self.tiempo[activos] += dt
+        self.acum[activos] += dt
+
+        # efectos especiales temporales
+        con_efecto = activos & (self.efecto != _SIN_EFECTO)
+        self.efecto_timer[con_efecto] -= dt
+        vence = con_efecto & (self.efecto_timer <= 0)
+        self.velocidad[vence] = self.base_speed
+        self.efecto[vence] = _SIN_EFECTO
+
+        # aparición de especiales
+        especial = activos & (self._azar(activos) < 0.01)
+        if especial.any():
+            r = self._azar(especial)
+            i = np.searchsorted(self._umbrales, r, side='right')
+            con_tipo = especial & (i < len(self._umbrales))
+            tipo = self._tipos_especiales[np.minimum(i, len(self._umbrales) - 1)]
+            celda, hay = self._celda_libre(con_tipo)
+            self._agregar_comida(hay, celda, tipo)
+
+        # comidas vencidas (tiempo de juego), en el orden de la lista
+        validas = self._validas() & activos[:, None]
+        vencidas = validas & (self.comida_vence <= self.tiempo[:, None])
+        if vencidas.any():
+            for j in np.nonzero(vencidas.any(axis=0))[0]:
+                self._liberar(vencidas[:, j], self.comida_celda[:, j])
+            self._compactar_comidas(self._validas() & ~vencidas)
+
+        # ¿le toca moverse?
+        paso_t = 1.0 / np.maximum(1.0, self.velocidad)
+        mueve = activos & (self.acum >= paso_t)
+        if not mueve.any():
+            return
+        self.acum[mueve] -= paso_t[mueve]
+
+        cabeza = self._cabeza()
+        nx = cabeza % self.cols + self.dx
+        ny = cabeza // self.cols + self.dy
+        pared = mueve & ((nx < 0) | (nx >= self.cols) | (ny < 0) | (ny >= self.rows))
+        nueva = (np.clip(ny, 0, self.rows - 1) * self.cols + np.clip(nx, 0, self.cols - 1)).astype(np.int32)
+        celda = self.celdas[self._filas, nueva]
+        choca = mueve & ~pared & ((celda == CUERPO) | (celda == OBSTACULO))
+        self.muerto |= pared | choca
+        mueve &= ~(pared | choca)
+        if not mueve.any():
+            return
+
+        # comer: la comida sale de la lista y su celda pasa a ser cuerpo
+        come = mueve & (celda == COMIDA)
+        tipo = np.full(self.n, -1, dtype=np.int8)
+        puntos = np.zeros(self.n, dtype=np.int64)
+        if come.any():
+            aqui = (self.comida_celda == nueva[:, None]) & self._validas() & come[:, None]
+            j = aqui.argmax(axis=1)
+            tipo[come] = self.comida_tipo[self._filas, j][come]
+            puntos[come] = self.comida_puntos[self._filas, j][come]
+            self._compactar_comidas(self._validas() & ~aqui)
+            self.celdas[self._filas[come], nueva[come]] = CUERPO
+
+        # mover cabeza
+        self._empujar_cabeza(mueve, nueva)
+        libre = mueve & ~come
+        self._ocupar(libre, nueva, CUERPO)
+
+        if come.any():
+            self.puntaje += np.where((tipo == _NORMAL) | (tipo == _DORADA) | (tipo == _NEGRA), puntos, 0)
+            self._sacar_cola(tipo == _NEGRA)
+            rapida = tipo == _VELOCIDAD
+            self.efecto[rapida] = _EFECTO_VELOCIDAD
+            self.efecto_timer[rapida] = 5.0
+            self.velocidad[rapida] = min(self.base_speed * 1.8, 20.0)
+            lenta = tipo == _LENTA
+            self.efecto[lenta] = _EFECTO_LENTA
+            self.efecto_timer[lenta] = 5.0
+            self.velocidad[lenta] = max(self.base_speed * 0.5, 0.5)
+            # cuando come, nueva comida normal
+            celda_comida, hay = self._celda_libre(come)
+            self._agregar_comida(hay, celda_comida, _NORMAL)
+        self._sacar_cola(libre)
+
+        # aumento de velocidad por puntos
+        p = self.puntaje
+        if self.tablas is not None:
+            ppn = self.tablas.puntos_por_nivel
+            if ppn:
+                sube = mueve & (p != 0) & (p % ppn == 0)
+                nivel = np.clip(p // ppn, 0, len(self._curva) - 1)
+                self.velocidad[sube] = self._curva[nivel[sube]]
+        else:
+            sube = mueve & (p != 0) & (p % 100 == 0)
+            self.velocidad[sube] = np.minimum(self.base_speed + np.maximum(p[sube], 0) / 100.0, 18.0)
+
+    # -------------------- CONSULTAS --------------------
+    def cuerpo(self, i):
+        # cuerpo de la partida i como lista de (x, y), de la cola a la cabeza
+        ancho = self.cuerpo_celdas.shape[1]
+        celdas = self.cuerpo_celdas[i, (self.cola[i] + np.arange(self.largo[i])) % ancho]
+        return [(int(c) % self.cols, int(c) // self.cols) for c in celdas]
+
+    def comidas(self, i):
+        # [(x, y, tipo, puntos, vence)] de la partida i, en orden
+        return [(int(c) % self.cols, int(c) // self.cols, TIPOS[t], int(p), float(e))
+                for c, t, p, e in zip(self.comida_celda[i, :self.n_comidas[i]],
+                                      self.comida_tipo[i, :self.n_comidas[i]],
+                                      self.comida_puntos[i, :self.n_comidas[i]],
+                                      self.comida_vence[i, :self.n_comidas[i]])]
+
+    def obstaculos(self, i):
+        celdas = np.nonzero(self.celdas[i] == OBSTACULO)[0]
+        return [(int(c) % self.cols, int(c) // self.cols) for c in celdas]
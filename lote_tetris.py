@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+# Colocaciones de Tetris y características de tableros sobre NumPy
+#
+# Para los bots: dada una pila de tableros y la pieza actual, enumera
+# todas las colocaciones (rotación, x) alcanzables con caída directa, arma
+# los tableros resultantes (con las líneas ya borradas) y calcula sus
+# características: alturas por columna, huecos, irregularidad, altura
+# total y líneas. Todo en arrays (n, colocaciones), listos para puntuar.
+#
+# Los tableros son máscaras por fila como JuegoTetris.filas (bit x =
+# columna x): un array (n, rows) de enteros. a_mascaras/a_celdas pasan
+# de y hacia arrays (n, rows, cols) de bool.
+#
+# Alcanzable: la pieza, en la rotación r, entra en la fila 0 en todas las
+# columnas entre la de aparición (cols // 2 - 2, como JuegoTetris) y x;
+# desde ahí cae derecho hasta apoyarse. x e y son los de la matriz de la
+# pieza, como JuegoTetris.px/py: la forma está en (x + x0, y + y0), con
+# (x0, y0) la caja de la rotación (ver tablas.Rotacion).
+#
+# Necesita numpy.
+
+from collections import namedtuple
+
+import numpy as np
+
+Caracteristicas = namedtuple('Caracteristicas', 'alturas huecos irregularidad altura_total')
+
+# rot, x: (colocaciones,) ; y, validas, lineas, huecos...: (n, colocaciones)
+# tableros: (n, colocaciones, rows) ; alturas: (n, colocaciones, cols)
+Colocaciones = namedtuple('Colocaciones', [
+    'rot', 'x', 'y', 'validas', 'tableros', 'lineas',
+    'alturas', 'huecos', 'irregularidad', 'altura_total'])
+
+# pesos lineales de referencia (altura total, líneas, huecos, irregularidad)
+PESOS = (-0.510066, 0.760666, -0.35663, -0.184483)
+
+_BITS_16 = np.array([bin(i).count('1') for i in range(1 << 16)], dtype=np.uint8)
+
+# 8 bits de una máscara -> un byte por bit (en orden de columna), para
+# sumar filas de todas las columnas a la vez
+_BYTES_8 = np.array([sum(((i >> b) & 1) << (8 * b) for b in range(8)) for i in range(256)], dtype='<u8')
+
+
+def _contar_bits(mascaras, cols):
+    total = np.zeros(mascaras.shape, dtype=np.int64)
+    for desde in range(0, cols, 16):
+        total += _BITS_16[(mascaras >> desde) & 0xFFFF]
+    return total
+
+
+def a_mascaras(tableros):
+    # (n, rows, cols) bool -> (n, rows) int64
+    tableros = np.asarray(tableros, dtype=bool)
+    bits = np.int64(1) << np.arange(tableros.shape[-1], dtype=np.int64)
+    return (tableros * bits).sum(axis=-1)
+
+
+def a_celdas(mascaras, cols):
+    # (..., rows) máscaras (o listas de JuegoTetris.filas) -> (..., rows, cols) bool
+    mascaras = np.asarray(mascaras, dtype=np.int64)
+    return ((mascaras[..., None] >> np.arange(cols, dtype=np.int64)) & 1).astype(bool)
+
+
+def _acumulado(mascaras):
+    # bit c de la fila r: la columna c tiene algo en las filas 0..r
+    return np.bitwise_or.accumulate(mascaras, axis=-1)
+
+
+def _alturas(acum, cols):
+    # filas con el bit c encendido, por columna: (..., cols). Cuenta de a
+    # 8 columnas en bytes de un uint64 (rows < 256)
+    partes = [_BYTES_8[(acum >> desde) & 0xFF].sum(axis=-1, dtype='<u8')
+              for desde in range(0, cols, 8)]
+    bytes_ = np.stack(partes, axis=-1).view(np.uint8)
+    return bytes_[..., :cols].astype(np.int64)
+
+
+def caracteristicas(mascaras, cols, celdas=None):
+    # mascaras: (..., rows) -> Caracteristicas con forma (...). celdas:
+    # celdas ocupadas de cada tablero, si ya se saben
+    mascaras = np.asarray(mascaras, dtype=np.int64)
+    alturas = _alturas(_acumulado(mascaras), cols)
+    total = alturas.sum(axis=-1)
+    if celdas is None:
+        celdas = _contar_bits(mascaras, cols).sum(axis=-1)
+    # huecos: celdas vacías por debajo del tope de su columna
+    irregularidad = np.abs(np.diff(alturas, axis=-1)).sum(axis=-1)
+    return Caracteristicas(alturas, total - celdas, irregularidad, total)
+
+
+def _topes(mascaras, cols):
+    # primera fila ocupada de cada columna (rows si está vacía): (n, cols)
+    return mascaras.shape[-1] - _alturas(_acumulado(mascaras), cols)
+
+
+def _borrar_lineas(mascaras, cols):
+    # (..., rows) -> (máscaras sin las filas llenas, líneas borradas)
+    rows = mascaras.shape[-1]
+    llenas = mascaras == (1 << cols) - 1
+    lineas = llenas.sum(axis=-1)
+    con = lineas > 0
+    if not con.any():
+        return mascaras, lineas
+    # solo los tableros con líneas: las llenas van arriba (y se vacían),
+    # el resto conserva el orden
+    sub = mascaras[con]
+    clave = np.where(llenas[con], -1, np.arange(rows))
+    sub = np.take_along_axis(sub, np.argsort(clave, axis=-1, kind='stable'), axis=-1)
+    sub[np.arange(rows) < lineas[con][:, None]] = 0
+    mascaras = mascaras.copy()
+    mascaras[con] = sub
+    return mascaras, lineas
+
+
+# tableros por tanda: los intermedios (tanda, colocaciones, rows) entran en caché
+TANDA = 256
+
+
+def colocaciones(tableros, pieza, cols=None):
+    # tableros: (n, rows) máscaras con cols dado, o (n, rows, cols) bool.
+    # pieza: tablas.Pieza (p. ej. de juegos.PIEZAS_TETRIS)
+    tableros = np.asarray(tableros)
+    if tableros.ndim == 3:
+        cols = tableros.shape[2]
+        tableros = a_mascaras(tableros)
+    elif cols is None:
+        raise ValueError("con tableros de máscaras hay que indicar cols")
+    tableros = tableros.astype(np.int64)
+    if len(tableros) <= TANDA:
+        return _colocaciones(tableros, pieza, cols)
+    tandas = [_colocaciones(tableros[i:i + TANDA], pieza, cols)
+              for i in range(0, len(tableros), TANDA)]
+    return Colocaciones(tandas[0].rot, tandas[0].x,
+                        *[np.concatenate(campo) for campo in list(zip(*tandas))[2:]])
+
+
+def _colocaciones(tableros, pieza, cols):
+    n, rows = tableros.shape
+    topes = {}   # fila -> primera fila ocupada de cada columna desde esa fila
+    aparicion = cols // 2 - 2
+
+    rots, xs, ys, validas, resultado = [], [], [], [], []
+    for r, rot in enumerate(pieza.info):
+        ancho = rot.ancho
+        x0, y0 = rot.caja
+        if ancho > cols or rot.alto + y0 > rows:
+            continue
+        # de acá en adelante x e y son los de la forma recortada
+        posibles = cols - ancho + 1
+
+        # y de apoyo en cada x: cayendo desde la fila y0, la celda (dx, dy)
+        # choca con lo primero que haya en su columna desde la fila y0 + dy
+        # (una pieza puede aparecer debajo de un alero). y < y0: no entra
+        y = None
+        for dx, dy in rot.celdas:
+            desde = y0 + dy
+            if desde not in topes:
+                topes[desde] = _topes(np.where(np.arange(rows) >= desde, tableros, 0), cols)
+            apoyo = topes[desde][:, dx:dx + posibles] - 1 - dy
+            y = apoyo if y is None else np.minimum(y, apoyo)
+        entra = y >= y0
+
+        # alcanzable: entra en la fila 0 en todo el camino desde la aparición
+        inicio = min(max(aparicion + x0, 0), posibles - 1)
+        bloqueado = ~entra
+        alcanzable = np.zeros_like(entra)
+        alcanzable[:, inicio:] = np.cumsum(bloqueado[:, inicio:], axis=1) == 0
+        alcanzable[:, inicio::-1] |= np.cumsum(bloqueado[:, inicio::-1], axis=1) == 0
+
+        # tableros con la pieza apoyada (las inválidas quedan como estaban)
+        nuevos = np.repeat(tableros[:, None], posibles, axis=1)
+        g, x = np.nonzero(alcanzable)
+        for j, m in enumerate(rot.mascaras):
+            nuevos[g, x, y[g, x] + j] |= np.int64(m) << x
+
+        rots.append(np.full(posibles, r))
+        xs.append(np.arange(posibles) - x0)
+        ys.append(np.where(alcanzable, y - y0, -1))
+        validas.append(alcanzable)
+        resultado.append(nuevos)
+
+    if resultado:
+        nuevos = np.concatenate(resultado, axis=1)
+        rots, xs = np.concatenate(rots), np.concatenate(xs)
+        ys, validas = np.concatenate(ys, axis=1), np.concatenate(validas, axis=1)
+    else:
+        nuevos = np.zeros((n, 0, rows), dtype=np.int64)
+        rots = xs = np.zeros(0, dtype=np.int64)
+        ys = np.zeros((n, 0), dtype=np.int64)
+        validas = np.zeros((n, 0), dtype=bool)
+
+    nuevos, lineas = _borrar_lineas(nuevos, cols)
+    celdas = _contar_bits(tableros, cols).sum(axis=-1)[:, None] + len(pieza.info[0].celdas) * validas - cols * lineas
+    c = caracteristicas(nuevos, cols, celdas)
+    return Colocaciones(rots, xs, ys, validas, nuevos, lineas,
+                        c.alturas, c.huecos, c.irregularidad, c.altura_total)
+
+
+def puntuar(col, pesos=PESOS):
+    # (n, colocaciones) de puntajes lineales; -inf en las no alcanzables
+    altura, lineas, huecos, irregularidad = pesos
+    puntaje = (altura * col.altura_total + lineas * col.lineas +
+               huecos * col.huecos + irregularidad * col.irregularidad)
+    return np.where(col.validas, puntaje, -np.inf)
+
+
+def mejores(col, pesos=PESOS):
+    # índice de la mejor colocación de cada tablero (-1 si no hay ninguna)
+    puntaje = puntuar(col, pesos)
+    return np.where(col.validas.any(axis=1), puntaje.argmax(axis=1), -1)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Planificador de cuadros de la consola
+#
+# Lleva tres cuentas, sin depender de Tk (el reloj se puede cambiar):
+#   - la simulación avanza a pasos fijos de dt con un acumulador; si la
+#     máquina se atrasa, a lo sumo max_pasos por cuadro y el resto se
+#     descarta (el juego se frena en vez de correr a los saltos)
+#   - los cuadros se agendan contra una hora límite fija: la espera hasta
+#     el próximo descuenta lo que tardó este, así el período no deriva
+#   - el dibujo se saltea si la versión del estado no cambió
+# En reposo (sin partida, en pausa o terminada) los cuadros se espacian a
+# `reposo` segundos; despertar() vuelve al ritmo normal enseguida.
+
+import time
+
+from simulacion import DT
+
+
+class Planificador(object):
+    def __init__(self, dt=DT, periodo=DT, max_pasos=5, reposo=0.5, reloj=time.time):
+        self.dt = dt
+        self.periodo = periodo
+        self.max_pasos = max_pasos
+        self.reposo = reposo
+        self.reloj = reloj
+        self.descartados = 0    # pasos perdidos por el tope de max_pasos
+        self._version = None
+        self.reanudar()
+
+    def reanudar(self):
+        # empezar a contar desde ahora (nueva partida, fin de una pausa...)
+        ahora = self.reloj()
+        self.acum = 0.0
+        self._anterior = ahora
+        self._limite = ahora
+
+    def pasos(self):
+        # cuántos pasos de dt tocan en este cuadro
+        ahora = self.reloj()
+        self.acum += max(0.0, ahora - self._anterior)
+        self._anterior = ahora
+        n = 0
+        while self.acum >= self.dt and n < self.max_pasos:
+            self.acum -= self.dt
+            n += 1
+        if self.acum >= self.dt:
+            self.descartados += int(self.acum / self.dt)
+            self.acum %= self.dt
+        return n
+
+    def espera(self, reposo=False):
+        # ms hasta el próximo cuadro. Si este llegó tarde, el próximo sale
+        # antes; si se perdió uno entero, se salta sin ráfagas de recuperación
+        periodo = self.reposo if reposo else self.periodo
+        ahora = self.reloj()
+        self._limite += periodo
+        if self._limite <= ahora:
+            self._limite += periodo * (int((ahora - self._limite) / periodo) + 1)
+        return int((self._limite - ahora) * 1000.0 + 0.5)
+
+    def despertar(self):
+        # el próximo cuadro sale ya (una tecla, un cambio de tamaño...)
+        self._limite = self.reloj()
+
+    def dibujar(self, version):
+        # True si hay que dibujar esta versión (y la da por dibujada)
+        if version == self._version:
+            return False
+        self._version = version
+        return True
+
+    def olvidar(self):
+        # forzar el próximo dibujo
+        self._version = None
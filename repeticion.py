@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+# Grabación y reproducción de partidas (.rep)
+#
+# Ejecutar: python repeticion.py partidas/*.rep            (verificar)
+#           python repeticion.py partida.rep --ir-a 1500   (estado en el tick)
+#
+# Los juegos usan un random.Random propio y avanzan a dt fijo, así que una
+# partida queda determinada por el juego, la semilla, las reglas y las
+# teclas de cada tick. Eso es todo lo que guarda una repetición; el
+# reproductor vuelve a simular sin pantalla tan rápido como dé la CPU. El
+# azar sale sólo de random() (ver juegos._azar_indice), que da lo mismo en
+# py2 y py3: una repetición se reproduce igual con cualquiera de los dos.
+#
+# De las reglas se guarda la huella (sha1 del contenido del .brik), no la
+# ruta: al reproducir se busca un .brik con esa huella entre los indicados
+# y el <juego>.brik que está junto a este archivo.
+#
+# Formato (little endian):
+#   cabecera   'BRKR', versión B, semilla Q, dt d, ticks I, puntaje_final i
+#   cadenas    juego, huella de las reglas ('' = sin reglas) y n teclas
+#              distintas (H + utf-8)
+#   eventos    cantidad I, luego (tick I, índice de tecla B) por evento
+
+from __future__ import print_function
+
+import argparse
+import hashlib
+import os
+import random
+import struct
+import sys
+import time
+from collections import deque
+
+from simulacion import DT, Simulacion, crear_juego, terminado
+
+MAGIC = b'BRKR'
+# Subir cuando cambie el formato o la simulación de un juego (una
+# repetición vieja ya no se reproduciría igual):
+#   2: comidas de Snake en registros con heap de vencimientos
+#   3: azar sólo con random(), huella de las reglas en vez de la ruta
+#   4: la celda libre al azar es la k-ésima en orden de celda
+#   5: las piezas de Tetris de un .brik giran dentro de su matriz (caja)
+VERSION = 5
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+
+_CABECERA = struct.Struct('<4sBQdIi')
+_LARGO = struct.Struct('<H')
+_CANTIDAD = struct.Struct('<I')
+_EVENTO = struct.Struct('<IB')
+
+
+def _cadena(s):
+    datos = s.encode('utf-8')
+    return _LARGO.pack(len(datos)) + datos
+
+
+def _leer_cadena(datos, pos):
+    n, = _LARGO.unpack_from(datos, pos)
+    pos += _LARGO.size
+    return datos[pos:pos + n].decode('utf-8'), pos + n
+
+
+def huella_reglas(ruta):
+    # sha1 del contenido: la misma huella es el mismo juego, esté donde esté
+    with open(ruta, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def buscar_reglas(huella, juego, candidatas=()):
+    # ruta del .brik con esa huella entre `candidatas` y <juego>.brik junto
+    # a este archivo; ValueError si ninguno coincide
+    for ruta in list(candidatas) + [os.path.join(AQUI, juego + '.brik')]:
+        try:
+            if huella_reglas(ruta) == huella:
+                return ruta
+        except (IOError, OSError):
+            continue
+    raise ValueError("no se encontraron las reglas de la grabación (huella {}); "
+                     "indicar el .brik con --reglas".format(huella))
+
+
+class Repeticion:
+    def __init__(self, juego, semilla, dt=DT, huella=None, ticks=0, eventos=None, puntaje_final=0):
+        # huella: de las reglas (huella_reglas), None si se jugó sin ellas
+        # eventos: lista de (tick, tecla) en orden de tick
+        self.juego = juego
+        self.semilla = semilla
+        self.dt = dt
+        self.huella = huella
+        self.ticks = ticks
+        self.eventos = eventos if eventos is not None else []
+        self.puntaje_final = puntaje_final
+
+    def a_bytes(self):
+        teclas = []
+        indices = {}
+        for _, tecla in self.eventos:
+            if tecla not in indices:
+                indices[tecla] = len(teclas)
+                teclas.append(tecla)
+        if len(teclas) > 255:
+            raise ValueError("demasiadas teclas distintas en la repetición")
+
+        partes = [_CABECERA.pack(MAGIC, VERSION, self.semilla, self.dt, self.ticks, self.puntaje_final),
+                  _cadena(self.juego), _cadena(self.huella or ''), _LARGO.pack(len(teclas))]
+        partes.extend(_cadena(t) for t in teclas)
+        partes.append(_CANTIDAD.pack(len(self.eventos)))
+        partes.extend(_EVENTO.pack(tick, indices[tecla]) for tick, tecla in self.eventos)
+        return b''.join(partes)
+
+    @classmethod
+    def desde_bytes(cls, datos):
+        if len(datos) < _CABECERA.size:
+            raise ValueError("repetición truncada")
+        magic, version, semilla, dt, ticks, puntaje = _CABECERA.unpack_from(datos, 0)
+        if magic != MAGIC:
+            raise ValueError("no es una repetición .rep")
+        if version != VERSION:
+            raise ValueError("repetición de la versión {} (esta es la {}): grabada con otra simulación, "
+                             "no se puede reproducir".format(version, VERSION))
+        try:
+            pos = _CABECERA.size
+            juego, pos = _leer_cadena(datos, pos)
+            huella, pos = _leer_cadena(datos, pos)
+            n, = _LARGO.unpack_from(datos, pos)
+            pos += _LARGO.size
+            teclas = []
+            for _ in range(n):
+                tecla, pos = _leer_cadena(datos, pos)
+                teclas.append(tecla)
+            n, = _CANTIDAD.unpack_from(datos, pos)
+            pos += _CANTIDAD.size
+            eventos = []
+            for _ in range(n):
+                tick, i = _EVENTO.unpack_from(datos, pos)
+                pos += _EVENTO.size
+                eventos.append((tick, teclas[i]))
+        except (struct.error, IndexError, UnicodeDecodeError):
+            raise ValueError("repetición corrupta")
+        return cls(juego, semilla, dt, huella or None, ticks, eventos, puntaje)
+
+    def guardar(self, ruta):
+        with open(ruta, 'wb') as f:
+            f.write(self.a_bytes())
+
+    @classmethod
+    def cargar(cls, ruta):
+        with open(ruta, 'rb') as f:
+            return cls.desde_bytes(f.read())
+
+
+class Rebobinado(object):
+    # Anillo con las últimas `capacidad` instantáneas de un juego, una cada
+    # `cada` ticks (ver juegos.py, instantanea/restaurar). Con los valores
+    # por defecto y DT = 40 ms guarda los últimos 50 s.
+    def __init__(self, capacidad=250, cada=5):
+        self.cada = cada
+        self._anillo = deque(maxlen=capacidad)   # (tick, instantánea)
+
+    def __len__(self):
+        return len(self._anillo)
+
+    def vaciar(self):
+        self._anillo.clear()
+
+    def guardar(self, tick, juego):
+        # el juego al empezar el tick `tick`
+        if tick % self.cada == 0 and (not self._anillo or self._anillo[-1][0] < tick):
+            self._anillo.append((tick, juego.instantanea()))
+
+    def volver(self, juego, tick):
+        # deja el juego en la última instantánea de a lo sumo `tick` y
+        # devuelve su tick (None si no hay ninguna tan vieja). Las
+        # posteriores se descartan: desde ahí la partida es otra.
+        anillo = self._anillo
+        while anillo and anillo[-1][0] > tick:
+            anillo.pop()
+        if not anillo:
+            return None
+        tick, datos = anillo[-1]
+        juego.restaurar(datos)
+        return tick
+
+
+class Grabadora:
+    # Juega una partida (como Simulacion) anotando las teclas de cada tick
+    def __init__(self, juego, semilla=None, reglas=None, dt=DT, rebobinado=None):
+        # reglas: ruta al .brik (se guarda su huella)
+        # rebobinado: Rebobinado para volver atrás (None: uno por defecto)
+        if semilla is None:
+            semilla = random.SystemRandom().getrandbits(63)
+        self.repeticion = Repeticion(juego, semilla, dt, huella_reglas(reglas) if reglas else None)
+        self.sim = Simulacion(crear_juego(juego, semilla, reglas), dt)
+        self.juego = self.sim.juego
+        self.rebobinado = rebobinado if rebobinado is not None else Rebobinado()
+        self.rebobinado.guardar(0, self.juego)
+
+    def tecla(self, tecla):
+        self.repeticion.eventos.append((self.sim.tick, tecla))
+        self.sim.aplicar(tecla)
+
+    def paso(self):
+        self.sim.paso()
+        self.repeticion.ticks = self.sim.tick
+        self.repeticion.puntaje_final = self.juego.puntaje
+        self.rebobinado.guardar(self.sim.tick, self.juego)
+
+    def rebobinar(self, ticks):
+        # vuelve unos `ticks` atrás (o lo más atrás que se pueda) y devuelve
+        # el tick al que llegó, o None. La repetición se corta ahí: sigue
+        # reproduciendo exactamente lo que se ve.
+        tick = self.rebobinado.volver(self.juego, max(0, self.sim.tick - ticks))
+        if tick is None:
+            return None
+        self.sim.tick = tick
+        rep = self.repeticion
+        rep.eventos = [(t, tecla) for t, tecla in rep.eventos if t < tick]
+        rep.ticks = tick
+        rep.puntaje_final = self.juego.puntaje
+        return tick
+
+
+class Reproductor:
+    def __init__(self, repeticion, reglas=()):
+        # reglas: rutas de .brik donde buscar las de la grabación
+        self.repeticion = repeticion
+        self.reglas = None
+        if repeticion.huella is not None:
+            self.reglas = buscar_reglas(repeticion.huella, repeticion.juego, reglas)
+        self.rebobinar()
+
+    def rebobinar(self):
+        rep = self.repeticion
+        self.sim = Simulacion(crear_juego(rep.juego, rep.semilla, self.reglas), rep.dt, rep.eventos)
+        self.juego = self.sim.juego
+
+    @property
+    def tick(self):
+        return self.sim.tick
+
+    def ir_a(self, tick):
+        # deja el juego como estaba al empezar el tick `tick` (hacia atrás
+        # vuelve a simular desde el principio)
+        tick = max(0, min(tick, self.repeticion.ticks))
+        if tick < self.sim.tick:
+            self.rebobinar()
+        self.sim.correr(tick - self.sim.tick, hasta_terminar=False)
+        return self.juego
+
+    def correr(self):
+        return self.ir_a(self.repeticion.ticks)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Reproduce repeticiones .rep sin pantalla")
+    ap.add_argument('rutas', nargs='+')
+    ap.add_argument('--ir-a', type=int, default=None, help="detenerse en este tick")
+    ap.add_argument('--reglas', action='append', default=[],
+                    help="archivo .brik donde buscar las reglas de la grabación (se puede repetir)")
+    args = ap.parse_args(argv)
+
+    fallos = 0
+    for ruta in args.rutas:
+        t0 = time.time()
+        try:
+            rep = Repeticion.cargar(ruta)
+            reproductor = Reproductor(rep, args.reglas)
+            if args.ir_a is not None:
+                juego = reproductor.ir_a(args.ir_a)
+            else:
+                juego = reproductor.correr()
+        except (IOError, OSError, ValueError) as e:
+            fallos += 1
+            print("ERROR {}: {}".format(ruta, e))
+            continue
+        ms = (time.time() - t0) * 1000.0
+        if args.ir_a is not None or juego.puntaje == rep.puntaje_final:
+            estado = 'OK'
+        else:
+            estado = 'DIFF'
+            fallos += 1
+        print("{:<5} {:9.2f} ms  {}  tick {}/{}, puntaje {} (grabado {}){}".format(
+            estado, ms, ruta, reproductor.tick, rep.ticks, juego.puntaje, rep.puntaje_final,
+            ', terminado' if terminado(juego) else ''))
+    return 1 if fallos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
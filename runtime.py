@@ -11,323 +11,64 @@ import ttk
 import tkFont as font
 import tkMessageBox as messagebox
 import time
-import random
+import os
+
+import tablas as reglas
+from entradas import ColaEntradas
+from juegos import COMIDA, CUERPO, OBSTACULO, JuegoSnake, JuegoTetris
+from lienzo import Camara, CeldasImagen, CeldasRetenidas, Escena, OCULTO, VISIBLE
+from planificador import Planificador
+from repeticion import Grabadora
+from simulacion import DT, terminado
+from validador import ErrorEsquema
 
 # -------------------- CONFIG --------------------
 CELL_MIN = 12
 CELL_MAX = 40
 TICK_MS = 40
+# pasos de DT como máximo por tick de la GUI (si la ventana se traba, el
+# juego se frena en vez de correr a los saltos)
+MAX_PASOS_TICK = 5
+# sin partida, en pausa o con la partida terminada no hay nada que animar:
+# un cuadro cada REPOSO_MS (una tecla despierta el loop enseguida)
+REPOSO_MS = 500
+# una ráfaga de <Configure> se aplica una vez, RESIZE_MS después de la última
+RESIZE_MS = 80
+# con más celdas que esto el tablero se dibuja en una PhotoImage (un item)
+# en vez de un rectángulo por celda, y las celdas pueden medir hasta 1 px
+CELDAS_IMAGEN = 20000
+
+# color de cada tipo de comida (uno desconocido se ve como la normal)
+COLORES_COMIDA = {
+    'normal': '#ff4d4d',
+    'dorada': '#FFD700',
+    'negra': '#222222',
+    'velocidad': '#B347FF',
+    'lenta': '#3FE0E0',
+}
+
+# Retroceso vuelve la partida este tiempo atrás (ver repeticion.Rebobinado)
+REBOBINAR_S = 2.0
+
+# reglas BrickLang que usa la consola si existen junto a este archivo
+AQUI = os.path.dirname(os.path.abspath(__file__))
+REGLAS_SNAKE = os.path.join(AQUI, 'snake.brik')
+REGLAS_TETRIS = os.path.join(AQUI, 'tetris.brik')
+# cada partida se graba aquí al salir de ella (ver repeticion.py)
+DIR_REPETICIONES = os.path.join(AQUI, 'repeticiones')
 
 # -------------------- UTILIDADES --------------------
 KEYMAP = {
     'w': 'w', 'a': 'a', 's': 's', 'd': 'd',
     'r': 'r', 'p': 'p',
     'Escape': 'esc',
+    'BackSpace': 'rebobinar',
     'Up': 'Up', 'Down': 'Down', 'Left': 'Left', 'Right': 'Right'
 }
 
 def clamp(v, a, b):
     return max(a, min(b, v))
 
-# -------------------- JUEGOS --------------------
-class JuegoSnake:
-    """Snake con obstáculos y comidas especiales."""
-    def __init__(self, cols=28, rows=20, velocidad=6.0, obstaculos_cantidad=8):
-        self.cols = cols
-        self.rows = rows
-        self.base_speed = velocidad
-        self.velocidad = velocidad
-        self.obstaculos_cantidad = obstaculos_cantidad
-        self.reiniciar()
-
-    def reiniciar(self):
-        cx, cy = self.cols // 2, self.rows // 2
-        self.cuerpo = [(cx-2, cy), (cx-1, cy), (cx, cy)]
-        self.dir = (1, 0)
-        self.puntaje = 0
-        self.muerto = False
-        self.pausado = False
-        self.comidas = []       # lista dicts: {'x','y','tipo','puntos','expira'}
-        self.obstaculos = []
-        self._acum = 0.0
-        self.tiempo = 0.0
-        self._special_timer = 0.0
-        self._special_active = None
-        self.velocidad = self.base_speed
-        # generar obstaculos
-        self._generar_obstaculos()
-        # generar comida normal inicial
-        for _ in range(2):
-            self._nueva_comida_normal()
-
-    def _pos_libre(self):
-        tries = 0
-        while tries < 5000:
-            x = random.randrange(self.cols)
-            y = random.randrange(self.rows)
-            if (x,y) not in self.cuerpo and (x,y) not in self.obstaculos and not any((c['x'],c['y'])==(x,y) for c in self.comidas):
-                return x,y
-            tries += 1
-        return 0,0
-
-    def _generar_obstaculos(self):
-        self.obstaculos = []
-        tries = 0
-        while len(self.obstaculos) < self.obstaculos_cantidad and tries < 10000:
-            x,y = random.randrange(self.cols), random.randrange(self.rows)
-            if (x,y) not in self.cuerpo:
-                self.obstaculos.append((x,y))
-            tries += 1
-
-    def _nueva_comida_normal(self):
-        fx, fy = self._pos_libre()
-        self.comidas.append({'x':fx,'y':fy,'tipo':'normal','puntos':10,'expira':18.0})
-
-    def _spawn_special(self):
-        # probabilidades pequeñas para diferentes especiales
-        r = random.random()
-        fx, fy = self._pos_libre()
-        if r < 0.08:
-            # dorada (puntos extra)
-            self.comidas.append({'x':fx,'y':fy,'tipo':'dorada','puntos':50,'expira':10.0})
-        elif r < 0.14:
-            # negra (pésima): resta puntos y reduce largo
-            self.comidas.append({'x':fx,'y':fy,'tipo':'negra','puntos':-50,'expira':10.0})
-        elif r < 0.20:
-            # velocidad (acelera)
-            self.comidas.append({'x':fx,'y':fy,'tipo':'velocidad','puntos':0,'expira':8.0})
-        elif r < 0.26:
-            # lenta (ralentiza)
-            self.comidas.append({'x':fx,'y':fy,'tipo':'lenta','puntos':0,'expira':8.0})
-
-    def manejar_input(self, key):
-        if key is None:
-            return
-        if key == 'p':
-            self.pausado = not self.pausado
-            return
-        if self.pausado:
-            return
-        # movimiento (proteger retorno)
-        if key in ('w', 'Up') and self.dir != (0,1):
-            self.dir = (0, -1)
-        elif key in ('s', 'Down') and self.dir != (0,-1):
-            self.dir = (0, 1)
-        elif key in ('a', 'Left') and self.dir != (1,0):
-            self.dir = (-1, 0)
-        elif key in ('d', 'Right') and self.dir != (-1,0):
-            self.dir = (1, 0)
-
-    def paso(self, dt):
-        if self.muerto or self.pausado:
-            return True
-        self.tiempo += dt
-        self._acum += dt
-        # efectos especiales temporales
-        if self._special_active:
-            self._special_timer -= dt
-            if self._special_timer <= 0:
-                # revertir efecto
-                if self._special_active == 'velocidad':
-                    self.velocidad = self.base_speed
-                elif self._special_active == 'lenta':
-                    self.velocidad = self.base_speed
-                self._special_active = None
-
-        # spawn specials occasionally
-        if random.random() < 0.01:
-            self._spawn_special()
-
-        # decrementar expiraciones de comidas
-        for c in list(self.comidas):
-            c['expira'] -= dt
-            if c['expira'] <= 0:
-                try:
-                    self.comidas.remove(c)
-                except ValueError:
-                    pass
-
-        paso_t = 1.0 / max(1.0, self.velocidad)
-        if self._acum < paso_t:
-            return True
-        self._acum -= paso_t
-
-        hx, hy = self.cuerpo[-1]
-        nx, ny = hx + self.dir[0], hy + self.dir[1]
-
-        # colisiones con paredes
-        if nx < 0 or nx >= self.cols or ny < 0 or ny >= self.rows:
-            self.muerto = True
-            return True
-        # colision con cuerpo
-        if (nx, ny) in self.cuerpo:
-            self.muerto = True
-            return True
-        # colision con obstaculos
-        if (nx, ny) in self.obstaculos:
-            self.muerto = True
-            return True
-
-        # mover cabeza
-        self.cuerpo.append((nx, ny))
-
-        # ver si comió algo
-        comida = None
-        for c in list(self.comidas):
-            if (nx,ny) == (c['x'], c['y']):
-                comida = c
-                break
-
-        if comida:
-            # aplicar efecto
-            tipo = comida.get('tipo', 'normal')
-            if tipo == 'normal':
-                self.puntaje += comida.get('puntos', 10)
-            elif tipo == 'dorada':
-                self.puntaje += comida.get('puntos', 50)
-            elif tipo == 'negra':
-                self.puntaje += comida.get('puntos', -50)
-                # eliminar primer segmento si existe (encoger)
-                if len(self.cuerpo) > 1:
-                    self.cuerpo.pop(0)
-            elif tipo == 'velocidad':
-                self._special_active = 'velocidad'
-                self._special_timer = 5.0
-                self.velocidad = min(self.base_speed * 1.8, 20.0)
-            elif tipo == 'lenta':
-                self._special_active = 'lenta'
-                self._special_timer = 5.0
-                self.velocidad = max(self.base_speed * 0.5, 0.5)
-
-            try:
-                self.comidas.remove(comida)
-            except ValueError:
-                pass
-            # cuando come, añadir nueva comida normal
-            self._nueva_comida_normal()
-        else:
-            # si no comió, se mueve: eliminar cola
-            self.cuerpo.pop(0)
-
-        # pequeño aumento de velocidad por tiempo/puntos (opcional)
-        if self.puntaje and self.puntaje % 100 == 0:
-            self.velocidad = min(self.base_speed + self.puntaje / 100.0, 18.0)
-
-        return True
-
-class JuegoTetris:
-    """Tetris funcional y básico."""
-    def __init__(self, cols=10, rows=20, fall_speed=1.0):
-        self.cols = cols
-        self.rows = rows
-        self.fall_speed = fall_speed
-        self.reiniciar()
-
-    def reiniciar(self):
-        self.tablero = [[0 for _ in range(self.cols)] for __ in range(self.rows)]
-        self.puntaje = 0
-        self.nivel = 1
-        self._acc = 0.0
-        self.terminado = False
-        self.pausado = False
-        self._spawn()
-
-    def _pieces(self):
-        return [
-            {'name':'I','rots':[[[1,1,1,1]],[[1],[1],[1],[1]]]},
-            {'name':'O','rots':[[[1,1],[1,1]]]},
-            {'name':'T','rots':[[[0,1,0],[1,1,1]],[[1,0],[1,1],[1,0]],[[1,1,1],[0,1,0]],[[0,1],[1,1],[0,1]]]},
-            {'name':'L','rots':[[[1,0],[1,0],[1,1]],[[0,0,1],[1,1,1]],[[1,1],[0,1],[0,1]],[[1,1,1],[1,0,0]]]},
-            {'name':'J','rots':[[[0,1],[0,1],[1,1]],[[1,1,1],[0,0,1]],[[1,1],[1,0],[1,0]],[[1,0,0],[1,1,1]]]},
-            {'name':'S','rots':[[[0,1,1],[1,1,0]],[[1,0],[1,1],[0,1]]]},
-            {'name':'Z','rots':[[[1,1,0],[0,1,1]],[[0,1],[1,1],[1,0]]]},
-        ]
-
-    def _spawn(self):
-        self.pieces = self._pieces()
-        self.current = random.choice(self.pieces)
-        self.rot = 0
-        self.px = self.cols // 2 - 2
-        self.py = 0
-        if self._collide(self.px, self.py, self.rot):
-            self.terminado = True
-
-    def _shape(self, r=None):
-        r = self.rot if r is None else r
-        return self.current['rots'][r % len(self.current['rots'])]
-
-    def _collide(self, x, y, r):
-        m = self._shape(r)
-        for j, row in enumerate(m):
-            for i, v in enumerate(row):
-                if v:
-                    bx, by = x + i, y + j
-                    if bx < 0 or bx >= self.cols or by < 0 or by >= self.rows:
-                        return True
-                    if self.tablero[by][bx]:
-                        return True
-        return False
-
-    def _fix(self):
-        m = self._shape()
-        for j, row in enumerate(m):
-            for i, v in enumerate(row):
-                if v:
-                    bx, by = self.px + i, self.py + j
-                    if 0 <= bx < self.cols and 0 <= by < self.rows:
-                        self.tablero[by][bx] = 1
-        self._clear_lines()
-        self._spawn()
-
-    def _clear_lines(self):
-        llenas = [y for y in range(self.rows) if all(self.tablero[y][x] for x in range(self.cols))]
-        for y in reversed(llenas):
-            del self.tablero[y]
-            self.tablero.insert(0, [0 for _ in range(self.cols)])
-        self.puntaje += len(llenas)
-
-    def manejar_input(self, key):
-        if key is None:
-            return
-        if key == 'p':
-            self.pausado = not self.pausado
-            return
-        if self.pausado:
-            return
-        if key in ('Left', 'a') and not self._collide(self.px - 1, self.py, self.rot):
-            self.px -= 1
-        elif key in ('Right', 'd') and not self._collide(self.px + 1, self.py, self.rot):
-            self.px += 1
-        elif key in ('w', 'Up'):
-            nuevo = (self.rot + 1) % len(self.current['rots'])
-            if not self._collide(self.px, self.py, nuevo):
-                self.rot = nuevo
-            elif not self._collide(self.px + 1, self.py, nuevo):
-                self.px += 1
-                self.rot = nuevo
-            elif not self._collide(self.px - 1, self.py, nuevo):
-                self.px -= 1
-                self.rot = nuevo
-        elif key in ('s', 'Down'):
-            if not self._collide(self.px, self.py + 1, self.rot):
-                self.py += 1
-            else:
-                self._fix()
-
-    def paso(self, dt):
-        if self.terminado or self.pausado:
-            return True
-        cps = max(0.2, self.fall_speed)
-        self._acc += dt
-        paso_t = 1.0 / cps
-        if self._acc >= paso_t:
-            self._acc -= paso_t
-            if not self._collide(self.px, self.py + 1, self.rot):
-                self.py += 1
-            else:
-                self._fix()
-        return True
-
 # -------------------- GUI --------------------
 class RetroApp(tk.Tk):
     def __init__(self):
@@ -362,12 +103,22 @@ class RetroApp(tk.Tk):
         # state
         self.active_game = None
         self.game_type = None
-        self.last_time = time.time()
+        self.grabadora = None
+        # paso fijo, cuadros contra hora límite y dibujo sólo si algo cambió
+        self.reloj = Planificador(DT, TICK_MS / 1000.0, MAX_PASOS_TICK, REPOSO_MS / 1000.0)
+        # teclas con hora de llegada, una por paso (ver entradas.py)
+        self.entradas = ColaEntradas()
+        self._tarea = None
+        self._jugando = False
+        self._tamano = None
+        self._tarea_tamano = None
         self.canvas_width = 800
         self.canvas_height = 500
         self.crt_enabled = False
+        # items que sobreviven entre cuadros (ver lienzo.py)
+        self.escena = Escena(self.canvas)
 
-        self.after(TICK_MS, self._loop)
+        self._tarea = self.after(TICK_MS, self._loop)
         self.bind_all('<Key>', self._on_key)
         self.protocol("WM_DELETE_WINDOW", self.quit)
 
@@ -425,25 +176,62 @@ class RetroApp(tk.Tk):
         # resize
         self.canvas.bind('<Configure>', self._on_canvas_resize)
 
+    def _cargar_reglas(self, cargar, ruta):
+        # tablas del .brik si existe y compila; si no, los valores de siempre
+        if not os.path.exists(ruta):
+            return None
+        try:
+            return cargar(ruta)
+        except ErrorEsquema as e:
+            print "Reglas ignoradas ({}): {}".format(ruta, "; ".join(e.errores))
+            return None
+        except (SyntaxError, ValueError, KeyError, TypeError) as e:
+            print "Reglas ignoradas ({}): {}".format(ruta, e)
+            return None
+
+    def _nueva_partida(self, tipo, cargar, ruta):
+        # la partida se juega a través de una Grabadora: semilla propia y
+        # teclas anotadas por tick, así se puede repetir tal cual
+        self._guardar_repeticion()
+        tablas = self._cargar_reglas(cargar, ruta)
+        self.grabadora = Grabadora(tipo, reglas=ruta if tablas is not None else None)
+        self.active_game = self.grabadora.juego
+        self.game_type = tipo
+        self.entradas.vaciar()
+        self._despertar()
+
+    def _guardar_repeticion(self):
+        if self.grabadora is None or not self.grabadora.repeticion.ticks:
+            return None
+        rep = self.grabadora.repeticion
+        self.grabadora = None
+        try:
+            if not os.path.isdir(DIR_REPETICIONES):
+                os.makedirs(DIR_REPETICIONES)
+            ruta = os.path.join(DIR_REPETICIONES, '{}-{}.rep'.format(
+                rep.juego, time.strftime('%Y%m%d-%H%M%S')))
+            rep.guardar(ruta)
+        except (IOError, OSError) as e:
+            print "No se pudo guardar la repeticion:", e
+            return None
+        return ruta
+
     def _start_snake(self):
-        self.game_type = 'snake'
-        # Usamos un número de obstáculos fijo por defecto (minimización de cambios).
-        obst_num = clamp(8, 6, 18)
-        self.active_game = JuegoSnake(cols=28, rows=20, velocidad=6.0, obstaculos_cantidad=obst_num)
+        self._nueva_partida('snake', reglas.cargar_snake, REGLAS_SNAKE)
         self.lbl_game_title.config(text=u"Snake")
         self.status_var.set(u'Snake iniciado — usa W/A/S/D o flechas')
 
     def _start_tetris(self):
-        self.game_type = 'tetris'
-        self.active_game = JuegoTetris(cols=10, rows=20, fall_speed=1.0)
+        self._nueva_partida('tetris', reglas.cargar_tetris, REGLAS_TETRIS)
         self.lbl_game_title.config(text=u"Tetris")
         self.status_var.set(u'Tetris iniciado — usa W/A/S/D o flechas')
 
     def _restart(self):
         if not self.active_game:
             return
-        self.active_game.reiniciar()
+        self.entradas.poner('r')
         self.status_var.set(u'Juego reiniciado')
+        self._despertar()
 
     def _on_key(self, ev):
         # map keys safely
@@ -454,34 +242,57 @@ class RetroApp(tk.Tk):
         else:
             ch = (getattr(ev, 'char', '') or '').lower()
             mapped = KEYMAP.get(ch, None)
+            # teclas propias definidas en el bloque [controles] del .brik
+            if mapped is None and self.active_game:
+                mapped = getattr(self.active_game, 'teclas', {}).get(ch)
         if mapped == 'esc':
             if messagebox.askyesno(u'Volver', u'¿Deseas volver al menú principal?'):
+                self._guardar_repeticion()
                 self.active_game = None
                 self.game_type = None
+                self.entradas.vaciar()
                 self.lbl_game_title.config(text=u'Ningún juego activo')
                 self.score_var.set(u'Puntos: 0')
                 self.status_var.set(u'Listo — elige Snake o Tetris arriba')
+                self._despertar()
             return
-        if mapped == 'r' and self.active_game:
-            self.active_game.reiniciar()
+        if mapped == 'rebobinar':
+            self._rebobinar()
             return
-        if mapped == 'p' and self.active_game:
-            if hasattr(self.active_game, 'pausado'):
-                self.active_game.pausado = not self.active_game.pausado
+        # 'r', 'p' y movimientos van a la cola; el loop los pasa por la
+        # grabadora de a uno por paso (así quedan en la repetición)
+        if mapped is not None and self.active_game:
+            if self.entradas.poner(mapped):
+                self._despertar()
+
+    def _rebobinar(self):
+        if self.grabadora is None:
             return
-        if self.active_game:
-            if self.game_type == 'snake':
-                self.active_game.manejar_input(mapped)
-            else:
-                self.active_game.manejar_input(mapped)
+        tick = self.grabadora.rebobinar(int(round(REBOBINAR_S / DT)))
+        if tick is None:
+            return
+        # lo que quedaba en la cola era para la partida de antes
+        self.entradas.vaciar()
+        self.status_var.set(u'Rebobinado a {:.1f} s'.format(tick * DT))
+        self._despertar()
 
     def _on_canvas_resize(self, ev):
-        self.canvas_width = ev.width
-        self.canvas_height = ev.height
-        self._render()
+        # arrastrar el borde manda muchos <Configure>: sólo vale el último
+        self._tamano = (ev.width, ev.height)
+        if self._tarea_tamano is not None:
+            self.after_cancel(self._tarea_tamano)
+        self._tarea_tamano = self.after(RESIZE_MS, self._aplicar_tamano)
+
+    def _aplicar_tamano(self):
+        self._tarea_tamano = None
+        self.canvas_width, self.canvas_height = self._tamano
+        self._despertar()
 
     def _toggle_crt(self):
         self.crt_enabled = not self.crt_enabled
+        if not self.crt_enabled:
+            self.escena.quitar('crt')
+        self._despertar()
         if self.crt_enabled:
             self.status_var.set(u'CRT ON')
         else:
@@ -493,6 +304,7 @@ class RetroApp(tk.Tk):
             u"  W/A/S/D o flechas — Mover\n"
             u"  P — Pausa / Reanudar\n"
             u"  R — Reiniciar juego\n"
+            u"  Retroceso — Rebobinar 2 segundos\n"
             u"  Esc — Volver al menú principal\n\n"
             u"📗 REGLAS (resumen):\n"
             u"  Snake — Come comida roja para crecer. Evita chocar contra paredes, tu cuerpo u obstáculos.\n"
@@ -506,122 +318,222 @@ class RetroApp(tk.Tk):
             u"  • gris — Obstáculo: bloqueo sólido (chocar = muerte)\n\n"
             u"🎮 Consola Retro 2000 — (sí, '2000 variantes' es sarcasmo) — Hecho por Santiago, Manuel y Juan"
         )
+        latencias = self.entradas.percentiles()
+        if latencias:
+            msg += u"\n\n⏱ Latencia tecla → cuadro: p50 {:.0f} ms, p90 {:.0f} ms, p99 {:.0f} ms".format(*latencias)
         messagebox.showinfo(u'Controles y Reglas', msg)
 
-    def _loop(self):
-        now = time.time()
-        dt = now - self.last_time
-        self.last_time = now
+    def _despertar(self):
+        # el próximo cuadro sale ya, aunque el loop esté en reposo
+        if self._tarea is not None:
+            self.after_cancel(self._tarea)
+        self.reloj.despertar()
+        self._tarea = self.after_idle(self._loop)
+
+    def _version(self):
+        # lo que se ve en pantalla; si no cambió, el cuadro no se dibuja
+        juego = self.active_game
+        vista = (self.game_type, self.canvas_width, self.canvas_height, self.crt_enabled)
+        if juego is None:
+            return vista
+        return vista + (id(juego), juego.version, int(getattr(juego, 'tiempo', 0)))
 
-        if self.active_game:
+    def _loop(self):
+        self._tarea = None
+        juego = self.active_game
+        jugando = bool(juego) and not getattr(juego, 'pausado', False) and not terminado(juego)
+        if jugando:
+            if not self._jugando:
+                # saliendo de una pausa: el tiempo quieto no se simula
+                self.reloj.reanudar()
+            # el juego avanza a pasos fijos de DT: así la repetición es exacta
             try:
-                self.active_game.paso(dt)
+                for _ in range(self.reloj.pasos()):
+                    tecla = self.entradas.sacar(juego)
+                    if tecla is not None:
+                        self.grabadora.tecla(tecla)
+                    self.grabadora.paso()
             except Exception as e:
                 # evitar que un error rompa el loop; mostrar info mínima
                 print "Error en paso:", e
-            self._render()
-            self.score_var.set(u'Puntos: {}'.format(getattr(self.active_game, "puntaje", 0)))
-            # mostrar mensajes
-            if hasattr(self.active_game, 'muerto') and self.active_game.muerto:
-                self.canvas.create_text(self.canvas_width//2, self.canvas_height//2, text=u'GAME OVER', font=("Courier", 32, 'bold'), fill='#FF6666')
-        else:
-            self._render_welcome()
+        elif juego:
+            # sin pasos (pausa, partida terminada): las teclas van ya, hasta
+            # que una la reanude; desde ahí siguen de a una por paso
+            tecla = self.entradas.sacar(juego, jugando=False)
+            while tecla is not None:
+                self.grabadora.tecla(tecla)
+                if not getattr(juego, 'pausado', False) and not terminado(juego):
+                    break
+                tecla = self.entradas.sacar(juego, jugando=False)
+        self._jugando = jugando
+
+        if self.reloj.dibujar(self._version()):
+            if juego:
+                self._render()
+                self.score_var.set(u'Puntos: {}'.format(getattr(juego, "puntaje", 0)))
+                self.entradas.dibujado(juego)
+            else:
+                self._render_welcome()
 
-        self.after(TICK_MS, self._loop)
+        self._tarea = self.after(self.reloj.espera(reposo=not jugando), self._loop)
 
     def _render_welcome(self):
+        # estática: se arma una vez por tamaño del lienzo
+        if self.escena.vigente(('bienvenida', self.canvas_width, self.canvas_height)):
+            return
         self.canvas.delete('all')
         txt = (
             u"CONSOL A RETRO 2000\n"
             u"Snake & Tetris — Hecho por Santiago, Manuel y Juan\n\n"
             u"Elige Snake o Tetris arriba."
         )
-        self.canvas.create_text(self.canvas_width//2, self.canvas_height//3, text=txt, font=("Courier", 22, 'bold'), fill='#88FFCC', justify='center')
+        self.canvas.create_text(self.canvas_width//2, self.canvas_height//3, text=txt, font=("Courier", 22, 'bold'), fill='#88FFCC', justify='center', tags='bienvenida')
         # subtle pattern
         i = 0
         max_range = max(200, self.canvas_width)
         while i < max_range:
-            self.canvas.create_line(i, int(self.canvas_height*2/3), i+20, int(self.canvas_height*2/3) + 8, fill='#0f0f12')
+            self.canvas.create_line(i, int(self.canvas_height*2/3), i+20, int(self.canvas_height*2/3) + 8, fill='#0f0f12', tags='bienvenida')
             i += 40
 
     def _render(self):
-        self.canvas.delete('all')
+        # retenido: el lienzo sólo se borra entero al cambiar de juego, de
+        # tablero o de tamaño; en cada cuadro se tocan las celdas que
+        # cambiaron. Marco, grilla y CRT son capas fijas (ver lienzo.py).
         if self.game_type == 'snake' and isinstance(self.active_game, JuegoSnake):
             self._render_snake(self.active_game)
         elif self.game_type == 'tetris' and isinstance(self.active_game, JuegoTetris):
             self._render_tetris(self.active_game)
+        else:
+            self._render_welcome()
+            return
         if self.crt_enabled:
-            self._render_crt()
+            # se crea después de las celdas, así queda encima
+            self.escena.capa('crt', (self.canvas_width, self.canvas_height), self._render_crt)
+
+    def _escena_vigente(self, tipo, cols, rows, cell, ox, oy):
+        if self.escena.vigente((tipo, cols, rows, cell, ox, oy, self.canvas_width, self.canvas_height)):
+            return True
+        self.canvas.delete('all')
+        return False
+
+    def _escena_textos(self, hud_x, hud_y, cell):
+        # HUD y cartel de fin de partida, creados después de las celdas (encima)
+        escena = self.escena
+        escena.agregar('hud', self.canvas.create_text(hud_x, hud_y, anchor='nw', text=u'',
+                                                      font=("Courier", max(10, cell//2)), fill='#DDEFE3'), text=u'')
+        escena.agregar('game_over', self.canvas.create_text(
+            self.canvas_width//2, self.canvas_height//2, text=u'GAME OVER', font=("Courier", 32, 'bold'),
+            fill='#FF6666', state=OCULTO), state=OCULTO)
+
+    def _area(self):
+        return max(100, self.canvas_width - 8), max(80, self.canvas_height - 8)
 
     def _compute_cell(self, cols, rows):
-        cw, ch = max(100, self.canvas_width - 8), max(80, self.canvas_height - 8)
+        cw, ch = self._area()
         cell_w = cw // cols
         cell_h = ch // rows
+        if self._usa_imagen(cols, rows):
+            return clamp(min(cell_w, cell_h), 1, CELL_MAX)
         cell = clamp(min(cell_w, cell_h), CELL_MIN, CELL_MAX)
         return cell
 
-    def _rect_cell(self, ox, oy, cell, x, y, fill='#fff', pad=1):
-        x1 = ox + x * cell + pad
-        y1 = oy + y * cell + pad
-        x2 = ox + (x + 1) * cell - pad
-        y2 = oy + (y + 1) * cell - pad
-        self.canvas.create_rectangle(x1, y1, x2, y2, fill=fill, outline='#06120f')
+    def _usa_imagen(self, cols, rows):
+        return cols * rows > CELDAS_IMAGEN
 
-    def _render_snake(self, game):
-        cols, rows = game.cols, game.rows
+    def _celdas(self, cols, rows, ox, oy, cell, fondo):
+        # backend de celdas según el tamaño del tablero (ver lienzo.py)
+        if self._usa_imagen(cols, rows):
+            imagen = tk.PhotoImage(width=cols * cell, height=rows * cell)
+            return CeldasImagen(self.canvas, imagen, cols, rows, ox, oy, cell, fondo)
+        return CeldasRetenidas(self.canvas, cols, rows, ox, oy, cell)
+
+    def _vista(self, cols, rows):
+        # (cell, ancho, alto): celdas del tablero que se dibujan. Todo el
+        # tablero si entra; si no, una ventana de celdas de CELL_MIN
         cell = self._compute_cell(cols, rows)
+        cw, ch = self._area()
+        if cols * cell <= cw and rows * cell <= ch:
+            return cell, cols, rows
+        return CELL_MIN, min(cols, cw // CELL_MIN), min(rows, ch // CELL_MIN)
+
+    def _render_snake(self, game):
+        cell, cols, rows = self._vista(game.cols, game.rows)
+        con_camara = (cols, rows) != (game.cols, game.rows)
         total_w, total_h = cols * cell, rows * cell
         ox = (self.canvas_width - total_w) // 2
         oy = (self.canvas_height - total_h) // 2
 
-        # board background + border so limits visible
-        self.canvas.create_rectangle(ox-3, oy-3, ox+total_w+3, oy+total_h+3, fill='#071316', outline='#215144', width=3)
-
-        # grid faint
-        for i in range(cols + 1):
-            x = ox + i * cell
-            color_line = '#082014' if (i % 5) else '#123d2b'
-            self.canvas.create_line(x, oy, x, oy + total_h, fill=color_line)
-        for j in range(rows + 1):
-            y = oy + j * cell
-            color_line = '#082014' if (j % 5) else '#123d2b'
-            self.canvas.create_line(ox, y, ox + total_w, y, fill=color_line)
-
-        # obstacles
-        for (x, y) in game.obstaculos:
-            self._rect_cell(ox, oy, cell, x, y, fill='#666666', pad=0)
-
-        # comidas
-        for c in game.comidas:
-            t = c.get('tipo', 'normal')
-            if t == 'normal':
-                color = '#ff4d4d'
-            elif t == 'dorada':
-                color = '#FFD700'
-            elif t == 'negra':
-                color = '#222222'
-            elif t == 'velocidad':
-                color = '#B347FF'
-            elif t == 'lenta':
-                color = '#3FE0E0'
-            else:
-                color = '#ff4d4d'
-            self._rect_cell(ox, oy, cell, c['x'], c['y'], fill=color, pad=max(1, cell//6))
-
-        # snake body
-        for idx, (x, y) in enumerate(game.cuerpo):
-            if idx == len(game.cuerpo) - 1:
-                color = '#00d0ff' if not game.muerto else '#ff4444'
+        if not self._escena_vigente('snake', cols, rows, cell, ox, oy):
+            if con_camara:
+                self.escena.camara = Camara(game.cols, game.rows, cols, rows)
+            # capa fija: board background + border so limits visible
+            self.canvas.create_rectangle(ox-3, oy-3, ox+total_w+3, oy+total_h+3, fill='#071316', outline='#215144', width=3, tags='tablero')
+
+            # grid faint (no en tableros enormes: serían miles de líneas)
+            if not self._usa_imagen(cols, rows):
+                for i in range(cols + 1):
+                    x = ox + i * cell
+                    color_line = '#082014' if (i % 5) else '#123d2b'
+                    self.canvas.create_line(x, oy, x, oy + total_h, fill=color_line, tags='tablero')
+                for j in range(rows + 1):
+                    y = oy + j * cell
+                    color_line = '#082014' if (j % 5) else '#123d2b'
+                    self.canvas.create_line(ox, y, ox + total_w, y, fill=color_line, tags='tablero')
+
+            self.escena.celdas = self._celdas(cols, rows, ox, oy, cell, '#071316')
+            # HUD: legenda small
+            self._escena_textos(ox + 20, oy + total_h + 30, cell)
+
+        if con_camara:
+            estilos = self._estilos_camara(game, cell)
+        else:
+            # cada celda con lo que tiene encima (en el orden de antes: lo
+            # último tapa a lo anterior)
+            estilos = {}
+            for pos in game.obstaculos:
+                estilos[pos] = ('#666666', 0)
+
+            # comidas
+            pad = max(1, cell//6)
+            for c in game.comidas:
+                estilos[(c.x, c.y)] = (COLORES_COMIDA.get(c.tipo, '#ff4d4d'), pad)
+
+            # snake body
+            for pos in game.cuerpo:
+                estilos[pos] = ('#70ff9a', 1)
+            if game.cuerpo:
+                estilos[game.cuerpo[-1]] = ('#00d0ff' if not game.muerto else '#ff4444', 1)
+        self.escena.celdas.actualizar(estilos)
+
+        self.escena.configurar('hud', text=u"Puntos: {0}    Tiempo: {1}s".format(game.puntaje, int(game.tiempo)))
+        self.escena.configurar('game_over', state=VISIBLE if game.muerto else OCULTO)
+
+    def _estilos_camara(self, game, cell):
+        # sólo lo que está dentro de la ventana, en coordenadas de la
+        # ventana: se recorren los trozos de la ocupación que la tocan, no
+        # todo el tablero ni todas las comidas
+        camara = self.escena.camara
+        if game.cuerpo:
+            camara.seguir(*game.cuerpo[-1])
+        x0, y0, x1, y1 = camara.rect()
+        pad = max(1, cell//6)
+        estilos = {}
+        for x, y, tipo in game.ocupacion.en_rect(x0, y0, x1, y1):
+            if tipo == OBSTACULO:
+                estilo = ('#666666', 0)
+            elif tipo == COMIDA:
+                c = game.comidas.en(x, y)
+                estilo = (COLORES_COMIDA.get(c.tipo if c else None, '#ff4d4d'), pad)
+            elif tipo == CUERPO:
+                estilo = ('#70ff9a', 1)
             else:
-                color = '#70ff9a'
-            self._rect_cell(ox, oy, cell, x, y, fill=color, pad=1)
-
-        # HUD: legenda small
-        hud_x = ox + 20
-        hud_y = oy + total_h + 30
-        self.canvas.create_text(hud_x, hud_y, anchor='nw',
-                                text=u"Puntos: {0}    Tiempo: {1}s".format(game.puntaje, int(game.tiempo)),
-                                font=("Courier", max(10, cell//2)), fill='#DDEFE3')
+                continue
+            estilos[(x - x0, y - y0)] = estilo
+        if game.cuerpo:
+            hx, hy = game.cuerpo[-1]
+            if x0 <= hx < x1 and y0 <= hy < y1:
+                estilos[(hx - x0, hy - y0)] = ('#00d0ff' if not game.muerto else '#ff4444', 1)
+        return estilos
 
     def _render_tetris(self, game):
         cols, rows = game.cols, game.rows
@@ -630,45 +542,51 @@ class RetroApp(tk.Tk):
         ox = (self.canvas_width - total_w) // 2
         oy = (self.canvas_height - total_h) // 2
 
-        # board background
-        self.canvas.create_rectangle(ox-1, oy-1, ox+total_w+3, oy+total_h+3, fill='#071021', outline='#12304d', width=3)
+        if not self._escena_vigente('tetris', cols, rows, cell, ox, oy):
+            # capa fija: board background
+            self.canvas.create_rectangle(ox-1, oy-1, ox+total_w+3, oy+total_h+3, fill='#071021', outline='#12304d', width=3, tags='tablero')
+            self.escena.celdas = self._celdas(cols, rows, ox, oy, cell, '#071021')
+            # HUD
+            self._escena_textos(ox, oy + total_h + 8, cell)
         colors = ['#FF8A65','#FFD54F','#AED581','#4FC3F7','#BA68C8','#90A4AE','#FFF176']
 
         # fixed blocks
+        estilos = {}
         for y in range(rows):
-            for x in range(cols):
-                if game.tablero[y][x]:
-                    col = colors[(x+y) % len(colors)]
-                    self._rect_cell(ox, oy, cell, x, y, fill=col, pad=1)
+            fila = game.filas[y]
+            # sólo los bits encendidos
+            while fila:
+                bit = fila & -fila
+                x = bit.bit_length() - 1
+                estilos[(x, y)] = (colors[(x+y) % len(colors)], 1)
+                fila ^= bit
 
         # current piece
         m = game._shape()
+        x0, y0 = game._rotacion().caja
         for j, row in enumerate(m):
             for i, v in enumerate(row):
                 if v:
-                    bx, by = game.px + i, game.py + j
-                    if 0 <= bx < cols and 0 <= by < rows:
-                        self._rect_cell(ox, oy, cell, bx, by, fill='#FFD27A', pad=1)
-
-        # HUD
-        hud_x = ox
-        hud_y = oy + total_h + 8
-        self.canvas.create_text(hud_x, hud_y, anchor='nw',
-                                text=u"Puntos: {0}    Nivel: {1}".format(game.puntaje, game.nivel),
-                                font=("Courier", max(10, cell//2)), fill='#DDEFE3')
-
-    def _render_crt(self):
+                    estilos[(game.px + x0 + i, game.py + y0 + j)] = ('#FFD27A', 1)
+        self.escena.celdas.actualizar(estilos)
+
+        self.escena.configurar('hud', text=u"Puntos: {0}    Nivel: {1}".format(game.puntaje, game.nivel))
+        self.escena.configurar('game_over', state=VISIBLE if getattr(game, 'muerto', False) else OCULTO)
+
+    def _render_crt(self, tag='crt'):
+        # capa fija: se construye una vez por tamaño del lienzo
         # scanlines
         y = 0
         while y < self.canvas_height:
-            self.canvas.create_line(0, y, self.canvas_width, y, fill='black', width=1)
+            self.canvas.create_line(0, y, self.canvas_width, y, fill='black', width=1, tags=tag)
             y += 2
         # top/bottom vignette
-        self.canvas.create_rectangle(0, 0, self.canvas_width, 24, fill='#000000', stipple='gray25', outline='')
-        self.canvas.create_rectangle(0, self.canvas_height-24, self.canvas_width, self.canvas_height, fill='#000000', stipple='gray25', outline='')
+        self.canvas.create_rectangle(0, 0, self.canvas_width, 24, fill='#000000', stipple='gray25', outline='', tags=tag)
+        self.canvas.create_rectangle(0, self.canvas_height-24, self.canvas_width, self.canvas_height, fill='#000000', stipple='gray25', outline='', tags=tag)
 
     def quit(self):
         if messagebox.askokcancel(u'Salir', u'¿Deseas cerrar la Consola Retro 2000?'):
+            self._guardar_repeticion()
             tk.Tk.quit(self)
 
 # -------------------- Ejecutar --------------------
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# Simulación sin pantalla de Snake y Tetris a paso fijo
+#
+# Ejecutar: python simulacion.py snake --partidas 100 --pasos 5000 --politica azar
+#
+# Avanza los motores de juegos.py con un dt fijo tan rápido como dé la
+# CPU (sin Tk ni TICK_MS de por medio). Las teclas salen de un guion
+# {tick: tecla(s)} o de una función politica(juego, tick). Al final se
+# informan los pasos por segundo.
+
+from __future__ import print_function
+
+import argparse
+import random
+import sys
+import time
+
+from juegos import JuegoSnake, JuegoTetris
+
+# el mismo paso que usa la consola (TICK_MS = 40)
+DT = 0.040
+
+JUEGOS = {
+    'snake': JuegoSnake,
+    'tetris': JuegoTetris,
+}
+
+
+def crear_juego(nombre, semilla=None, reglas=None):
+    # con las mismas opciones que usa la consola; reglas: ruta a un .brik
+    cls = JUEGOS[nombre]
+    if reglas:
+        return cls.desde_reglas(reglas, semilla=semilla)
+    return cls(semilla=semilla)
+
+
+def terminado(juego):
+    return bool(getattr(juego, 'muerto', False) or getattr(juego, 'terminado', False))
+
+
+def _guion(eventos):
+    # lista de (tick, tecla) o dict tick -> tecla(s)  =>  dict tick -> [teclas]
+    if isinstance(eventos, dict):
+        eventos = eventos.items()
+    guion = {}
+    for tick, teclas in eventos:
+        if not isinstance(teclas, (list, tuple)):
+            teclas = [teclas]
+        guion.setdefault(tick, []).extend(teclas)
+    return guion
+
+
+class Simulacion:
+    def __init__(self, juego, dt=DT, entradas=None):
+        # entradas: None, un guion (ver _guion) o politica(juego, tick) que
+        # devuelve una tecla, una lista de teclas o None
+        self.juego = juego
+        self.dt = dt
+        self.tick = 0
+        self.politica = None
+        self.guion = {}
+        if callable(entradas):
+            self.politica = entradas
+        elif entradas is not None:
+            self.guion = _guion(entradas)
+
+    def teclas(self, tick):
+        if self.politica is None:
+            return self.guion.get(tick, ())
+        teclas = self.politica(self.juego, tick)
+        if teclas is None:
+            return ()
+        if not isinstance(teclas, (list, tuple)):
+            return (teclas,)
+        return teclas
+
+    def aplicar(self, tecla):
+        # 'r' reinicia la partida, igual que en la consola
+        if tecla == 'r':
+            self.juego.reiniciar()
+        else:
+            self.juego.manejar_input(tecla)
+
+    def paso(self):
+        # las teclas del tick llegan antes de avanzar, como en la consola
+        for tecla in self.teclas(self.tick):
+            self.aplicar(tecla)
+        self.juego.paso(self.dt)
+        self.tick += 1
+
+    def correr(self, pasos, hasta_terminar=True):
+        # avanza hasta `pasos` ticks (o hasta que termine la partida) y
+        # devuelve cuántos dio
+        juego = self.juego
+        dados = 0
+        while dados < pasos:
+            if hasta_terminar and terminado(juego):
+                break
+            self.paso()
+            dados += 1
+        return dados
+
+
+def politica_azar(semilla=None, prob=0.3, teclas='wasd'):
+    azar = random.Random(semilla)
+
+    def politica(juego, tick):
+        if azar.random() < prob:
+            return azar.choice(teclas)
+        return None
+    return politica
+
+
+POLITICAS = {
+    'nada': lambda semilla: None,
+    'azar': politica_azar,
+}
+
+
+def simular(fabrica, partidas=1, pasos=10000, dt=DT, politica=None):
+    # fabrica(n) -> juego nuevo para la partida n; politica(n) -> sus
+    # entradas. Devuelve (pasos totales, segundos, puntajes).
+    total = 0
+    puntajes = []
+    t0 = time.time()
+    for n in range(partidas):
+        entradas = politica(n) if politica is not None else None
+        sim = Simulacion(fabrica(n), dt, entradas)
+        total += sim.correr(pasos)
+        puntajes.append(sim.juego.puntaje)
+    return total, time.time() - t0, puntajes
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Simula partidas sin pantalla a paso fijo")
+    ap.add_argument('juego', choices=sorted(JUEGOS))
+    ap.add_argument('--partidas', type=int, default=10)
+    ap.add_argument('--pasos', type=int, default=10000, help="máximo de ticks por partida")
+    ap.add_argument('--dt', type=float, default=DT, help="segundos simulados por tick")
+    ap.add_argument('--politica', choices=sorted(POLITICAS), default='azar')
+    ap.add_argument('--semilla', type=int, default=None)
+    ap.add_argument('--reglas', default=None, help="archivo .brik con las reglas del juego")
+    args = ap.parse_args(argv)
+
+    # partida n: semilla base + n para el juego y para la política
+    base = args.semilla
+    semilla = (lambda n: None) if base is None else (lambda n: base + n)
+    politica = POLITICAS[args.politica]
+
+    pasos, segundos, puntajes = simular(
+        lambda n: crear_juego(args.juego, semilla(n), args.reglas),
+        args.partidas, args.pasos, args.dt, lambda n: politica(semilla(n)))
+    print("{}: {} partidas, {} pasos en {:.2f} s ({:.0f} pasos/s), puntaje medio {:.1f}".format(
+        args.juego, len(puntajes), pasos, segundos, pasos / max(segundos, 1e-9),
+        float(sum(puntajes)) / max(1, len(puntajes))))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
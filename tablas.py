@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+# Compilación de reglas BrickLang (.brik) a tablas de runtime
+#
+# Un AST de tetris.brik / snake.brik se convierte una sola vez en tablas
+# inmutables (namedtuples, tuplas y TablaFija) que JuegoTetris y JuegoSnake consultan
+# directamente: piezas con sus máscaras por rotación, tipos de comida,
+# curvas de velocidad y mapa de teclas. cargar_tetris/cargar_snake las
+# memorizan por archivo, así que todas las partidas las comparten.
+
+import os
+from collections import namedtuple
+
+class TablaFija(dict):
+    # dict de solo lectura: comidas y teclas se comparten entre todas las
+    # partidas que usan el mismo .brik, así que nadie debe modificarlas
+    def _fija(self, *args, **kwargs):
+        raise TypeError("las tablas compiladas son de solo lectura")
+
+    __setitem__ = __delitem__ = __ior__ = _fija
+    clear = pop = popitem = setdefault = update = _fija
+
+    def __reduce__(self):
+        # pickle no puede rellenarla con __setitem__
+        return (TablaFija, (dict(self),))
+
+
+# -------------------- PIEZAS --------------------
+# forma: filas recortadas a su caja (tupla de tuplas 0/1)
+# caja: (x0, y0) de la forma dentro de la matriz original del .brik. La
+#   posición de la pieza (px, py) es la de esa matriz: la forma va en
+#   (px + x0, py + y0), así cada rotación gira alrededor del mismo centro
+# celdas: (dx, dy) ocupadas, relativas a la esquina de la forma
+# mascaras: una máscara int por fila, bit x = columna x
+# patadas: desplazamientos en x a probar al rotar hacia esta rotación
+Rotacion = namedtuple('Rotacion', 'forma ancho alto caja celdas mascaras patadas')
+Pieza = namedtuple('Pieza', 'name color rots info')
+
+TablasTetris = namedtuple('TablasTetris', [
+    'nombre', 'cols', 'rows', 'velocidad', 'piezas',
+    'puntos_por_lineas', 'puntos_por_nivel', 'curva_velocidad', 'teclas'])
+
+# -------------------- SNAKE --------------------
+Comida = namedtuple('Comida', 'tipo color puntos duracion')
+
+TablasSnake = namedtuple('TablasSnake', [
+    'nombre', 'cols', 'rows', 'velocidad', 'obstaculos', 'comidas',
+    'especiales', 'puntos_por_nivel', 'curva_velocidad', 'teclas'])
+
+# Niveles precalculados en las curvas de velocidad (después se repite el último)
+NIVELES_CURVA = 64
+VELOCIDAD_MAX_SNAKE = 18.0
+
+# wall kicks: primero en el lugar, después uno a la derecha y uno a la izquierda
+PATADAS = (0, 1, -1)
+
+# acción del bloque [controles] -> tecla canónica del runtime
+ACCIONES = {
+    'mover_arriba': 'w',
+    'mover_abajo': 's',
+    'mover_izquierda': 'a',
+    'mover_derecha': 'd',
+    'acelerar_abajo': 's',
+    'evitar_caida': 'w',
+    'rotar': 'w',
+    'pausar': 'p',
+    'reiniciar': 'r',
+}
+
+# tipo de comida del .brik -> tipo del runtime
+TIPOS_COMIDA = {
+    'manzana_regular': 'normal',
+    'manzana_dorada': 'dorada',
+    'manzana_negra': 'negra',
+    'manzana_veloz': 'velocidad',
+    'manzana_lenta': 'lenta',
+}
+
+# Valores con los que JuegoSnake funcionaba antes de leer reglas
+COMIDAS_SNAKE = (
+    Comida('normal', 'rojo', 10, 18.0),
+    Comida('dorada', 'amarillo', 50, 10.0),
+    Comida('negra', 'negro', -50, 10.0),
+    Comida('velocidad', 'morado', 0, 8.0),
+    Comida('lenta', 'cian', 0, 8.0),
+)
+# (probabilidad acumulada, tipo) para la aparición de especiales
+ESPECIALES_SNAKE = ((0.08, 'dorada'), (0.14, 'negra'), (0.20, 'velocidad'), (0.26, 'lenta'))
+
+
+def rotacion(matriz):
+    filas = [tuple(1 if v else 0 for v in fila) for fila in matriz]
+    ocupadas = [(x, y) for y, fila in enumerate(filas) for x, v in enumerate(fila) if v]
+    if not ocupadas:
+        raise ValueError("rotación sin celdas ocupadas")
+    x0 = min(x for x, _ in ocupadas)
+    y0 = min(y for _, y in ocupadas)
+    ancho = max(x for x, _ in ocupadas) - x0 + 1
+    alto = max(y for _, y in ocupadas) - y0 + 1
+
+    forma = tuple(tuple(filas[y0 + j][x0:x0 + ancho]) for j in range(alto))
+    celdas = tuple((i, j) for j, fila in enumerate(forma) for i, v in enumerate(fila) if v)
+    mascaras = tuple(sum(1 << i for i, v in enumerate(fila) if v) for fila in forma)
+    return Rotacion(forma, ancho, alto, (x0, y0), celdas, mascaras, PATADAS)
+
+
+def pieza(nombre, rots, color=None):
+    info = tuple(rotacion(m) for m in rots)
+    return Pieza(nombre, color, tuple(r.forma for r in info), info)
+
+
+def _curva(base, multiplicador, tope=None, sumando=None):
+    curva = []
+    for nivel in range(NIVELES_CURVA):
+        if sumando is not None:
+            v = base + sumando * nivel
+        else:
+            v = base * (multiplicador ** nivel)
+        if tope is not None:
+            v = min(v, tope)
+        curva.append(v)
+    return tuple(curva)
+
+
+def _teclas(controles):
+    teclas = {}
+    for accion, tecla in (controles or {}).items():
+        canonica = ACCIONES.get(accion)
+        if canonica is not None:
+            teclas[tecla] = canonica
+    return TablaFija(teclas)
+
+
+def _velocidad(valor, defecto):
+    if isinstance(valor, dict):
+        valor = valor.get('valor', defecto)
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool) and valor > 0:
+        return float(valor)
+    return defecto
+
+
+def _regla_velocidad(ast):
+    for clave in ('regla_velocidad', 'regla_niveles_velocidad'):
+        regla = ast.get(clave)
+        if isinstance(regla, dict):
+            return regla
+    return {}
+
+
+def compilar_tetris(ast, cols=10, rows=20):
+    dims = ast.get('dimensiones_tablero') or {}
+    velocidad = _velocidad(ast.get('velocidad_inicial'), 1.0)
+
+    nombres = ast.get('figuras_disponibles')
+    if not nombres:
+        nombres = [k for k in ast if k.startswith('figura_')]
+    piezas = []
+    for nombre in nombres:
+        fig = ast.get(nombre)
+        if not isinstance(fig, dict) or not fig.get('rotaciones'):
+            continue
+        piezas.append(pieza(nombre[len('figura_'):] if nombre.startswith('figura_') else nombre,
+                            fig['rotaciones'], fig.get('color')))
+    if not piezas:
+        raise ValueError("las reglas no definen ninguna figura_*")
+
+    lineas = ast.get('regla_puntuacion_lineas') or {}
+    base = lineas.get('puntuacion_base', 1)
+    multiplicadores = lineas.get('multiplicador_por_linea') or [1, 2, 3, 4]
+    puntos_por_lineas = (0,) + tuple(base * m for m in multiplicadores)
+
+    regla = _regla_velocidad(ast)
+    return TablasTetris(
+        nombre=ast.get('nombre_juego', 'tetris'),
+        cols=dims.get('ancho', cols),
+        rows=dims.get('alto', rows),
+        velocidad=velocidad,
+        piezas=tuple(piezas),
+        puntos_por_lineas=puntos_por_lineas,
+        puntos_por_nivel=regla.get('puntos_por_nivel', 0),
+        curva_velocidad=_curva(velocidad, regla.get('multiplicador_velocidad', 1.0)),
+        teclas=_teclas(ast.get('controles')),
+    )
+
+
+def compilar_snake(ast, cols=28, rows=20):
+    dims = ast.get('dimensiones_tablero') or {}
+    velocidad = _velocidad(ast.get('velocidad_inicial'), 6.0)
+
+    obst = ast.get('obstaculos') or {}
+    obstaculos = obst.get('cantidad_maxima', 8) if obst.get('activos', True) else 0
+
+    comidas = dict((c.tipo, c) for c in COMIDAS_SNAKE)
+    for valor in ast.values():
+        if not isinstance(valor, dict) or valor.get('tipo') not in TIPOS_COMIDA:
+            continue
+        tipo = TIPOS_COMIDA[valor['tipo']]
+        previa = comidas[tipo]
+        puntos = valor.get('puntuacion', valor.get('puntos_extra', previa.puntos))
+        comidas[tipo] = Comida(tipo, valor.get('color', previa.color), puntos,
+                               float(valor.get('duracion', previa.duracion)))
+
+    regla = _regla_velocidad(ast)
+    return TablasSnake(
+        nombre=ast.get('nombre_juego', 'snake'),
+        cols=dims.get('ancho', cols),
+        rows=dims.get('alto', rows),
+        velocidad=velocidad,
+        obstaculos=obstaculos,
+        comidas=TablaFija(comidas),
+        especiales=ESPECIALES_SNAKE,
+        puntos_por_nivel=regla.get('puntos_por_nivel', 100),
+        curva_velocidad=_curva(velocidad, regla.get('multiplicador_velocidad', 1.0), tope=VELOCIDAD_MAX_SNAKE),
+        teclas=_teclas(ast.get('controles')),
+    )
+
+
+# -------------------- CARGA CON MEMORIA --------------------
+_cargadas = {}
+
+
+def _cargar(ruta, compilar):
+    # ErrorEsquema si el .brik no cumple el esquema de BrickLang: un valor
+    # de tipo equivocado fallaría recién en medio de la partida
+    from lexer import parse_file
+    from validador import ErrorEsquema, validar
+
+    ruta = os.path.abspath(ruta)
+    st = os.stat(ruta)
+    clave = (ruta, compilar.__name__, st.st_mtime, st.st_size)
+    tablas = _cargadas.get(clave)
+    if tablas is None:
+        ast = parse_file(ruta)
+        errores = validar(ast)
+        if errores:
+            raise ErrorEsquema(errores)
+        tablas = compilar(ast)
+        _cargadas[clave] = tablas
+    return tablas
+
+
+def cargar_tetris(ruta):
+    return _cargar(ruta, compilar_tetris)
+
+
+def cargar_snake(ruta):
+    return _cargar(ruta, compilar_snake)
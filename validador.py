@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+# Verificador estático de ASTs de BrickLang
+#
+# El esquema se describe con nodos (Entero, Cadena, Objeto, Lista, ...) y se
+# compila una sola vez: cada nodo se convierte en una función de chequeo
+# especializada (closure) que ya sabe su ruta y sus límites. Validar un
+# AST es entonces un solo recorrido que junta todos los errores.
+
+from compacto import MatrizBits
+
+# Límites del lenguaje
+MIN_LADO_TABLERO = 4
+MAX_LADO_TABLERO = 10000
+MAX_LADO_PIEZA = 8
+MAX_ROTACIONES = 4
+
+try:
+    _CADENAS = (str, unicode)
+except NameError:
+    _CADENAS = (str,)
+
+
+class ErrorEsquema(ValueError):
+    def __init__(self, errores):
+        ValueError.__init__(self, "{} error(es) de esquema:\n  {}".format(len(errores), "\n  ".join(errores)))
+        self.errores = errores
+
+
+def _es_entero(v):
+    return isinstance(v, int) and not isinstance(v, bool)
+
+
+def _es_numero(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _describir(v):
+    return repr(v) if len(repr(v)) <= 40 else type(v).__name__
+
+
+# -------------------- NODOS DEL ESQUEMA --------------------
+# compilar(ruta) devuelve chequear(valor, errores): agrega mensajes a la
+# lista errores y devuelve True si el valor es válido.
+
+class Cualquiera:
+    def compilar(self, ruta):
+        def chequear(v, errores):
+            return True
+        return chequear
+
+
+class Booleano:
+    def compilar(self, ruta):
+        def chequear(v, errores):
+            if isinstance(v, bool):
+                return True
+            errores.append("{}: se esperaba booleano, encontrado {}".format(ruta, _describir(v)))
+            return False
+        return chequear
+
+
+class Entero:
+    def __init__(self, minimo=None, maximo=None):
+        self.minimo = minimo
+        self.maximo = maximo
+
+    def compilar(self, ruta):
+        minimo, maximo = self.minimo, self.maximo
+        fuera = "{}: {{}} fuera de rango [{}, {}]".format(ruta, minimo, maximo)
+
+        def chequear(v, errores):
+            if not _es_entero(v):
+                errores.append("{}: se esperaba entero, encontrado {}".format(ruta, _describir(v)))
+                return False
+            if (minimo is not None and v < minimo) or (maximo is not None and v > maximo):
+                errores.append(fuera.format(v))
+                return False
+            return True
+        return chequear
+
+
+class Numero(Entero):
+    def compilar(self, ruta):
+        minimo, maximo = self.minimo, self.maximo
+        fuera = "{}: {{}} fuera de rango [{}, {}]".format(ruta, minimo, maximo)
+
+        def chequear(v, errores):
+            if not _es_numero(v):
+                errores.append("{}: se esperaba número, encontrado {}".format(ruta, _describir(v)))
+                return False
+            if (minimo is not None and v < minimo) or (maximo is not None and v > maximo):
+                errores.append(fuera.format(v))
+                return False
+            return True
+        return chequear
+
+
+class Cadena:
+    def __init__(self, opciones=None, largo_max=None):
+        self.opciones = frozenset(opciones) if opciones else None
+        self.largo_max = largo_max
+
+    def compilar(self, ruta):
+        opciones, largo_max = self.opciones, self.largo_max
+
+        def chequear(v, errores):
+            if not isinstance(v, _CADENAS) or not v:
+                errores.append("{}: se esperaba texto no vacío, encontrado {}".format(ruta, _describir(v)))
+                return False
+            if opciones is not None and v not in opciones:
+                errores.append("{}: '{}' no es una opción válida ({})".format(ruta, v, ", ".join(sorted(opciones))))
+                return False
+            if largo_max is not None and len(v) > largo_max:
+                errores.append("{}: '{}' supera {} caracteres".format(ruta, v, largo_max))
+                return False
+            return True
+        return chequear
+
+
+class Lista:
+    def __init__(self, elemento=None, minimo=0, maximo=None):
+        self.elemento = elemento or Cualquiera()
+        self.minimo = minimo
+        self.maximo = maximo
+
+    def compilar(self, ruta):
+        minimo, maximo = self.minimo, self.maximo
+        # el chequeo del elemento se compila una vez; el índice solo se
+        # formatea en la ruta si hay error
+        elemento = self.elemento.compilar(ruta + "[]")
+
+        def chequear(v, errores):
+            if not isinstance(v, (list, tuple)):
+                errores.append("{}: se esperaba lista, encontrado {}".format(ruta, _describir(v)))
+                return False
+            n = len(v)
+            ok = True
+            if n < minimo or (maximo is not None and n > maximo):
+                errores.append("{}: {} elementos, se esperaban entre {} y {}".format(ruta, n, minimo, maximo))
+                ok = False
+            for i, x in enumerate(v):
+                antes = len(errores)
+                if not elemento(x, errores):
+                    ok = False
+                    for k in range(antes, len(errores)):
+                        errores[k] = errores[k].replace(ruta + "[]", "{}[{}]".format(ruta, i), 1)
+            return ok
+        return chequear
+
+
+class Matriz01:
+    # Matriz rectangular de 0/1 con al menos una celda ocupada (lista de
+    # listas o MatrizBits del AST compacto)
+    def __init__(self, lado_max=MAX_LADO_PIEZA):
+        self.lado_max = lado_max
+
+    def compilar(self, ruta):
+        lado_max = self.lado_max
+
+        def chequear(v, errores):
+            if isinstance(v, MatrizBits):
+                alto, ancho, llena = len(v.filas), v.ancho, any(v.filas)
+            else:
+                if not isinstance(v, (list, tuple)) or not v:
+                    errores.append("{}: se esperaba matriz de 0/1, encontrado {}".format(ruta, _describir(v)))
+                    return False
+                alto, ancho, llena = len(v), None, False
+                for fila in v:
+                    if not isinstance(fila, (list, tuple)):
+                        errores.append("{}: fila {} no es una lista".format(ruta, _describir(fila)))
+                        return False
+                    if ancho is None:
+                        ancho = len(fila)
+                    elif len(fila) != ancho:
+                        errores.append("{}: filas de distinto ancho".format(ruta))
+                        return False
+                    for c in fila:
+                        if c == 1 and _es_entero(c):
+                            llena = True
+                        elif not (c == 0 and _es_entero(c)):
+                            errores.append("{}: celda {} no es 0 ni 1".format(ruta, _describir(c)))
+                            return False
+            if alto > lado_max or ancho > lado_max:
+                errores.append("{}: matriz de {}x{} supera {}x{}".format(ruta, ancho, alto, lado_max, lado_max))
+                return False
+            if not llena:
+                errores.append("{}: la matriz no tiene celdas ocupadas".format(ruta))
+                return False
+            return True
+        return chequear
+
+
+class Objeto:
+    # campos: clave -> nodo. Con `abierto` se aceptan claves no declaradas
+    # (validadas con `resto` si se indica).
+    def __init__(self, campos=None, requeridas=(), abierto=False, resto=None):
+        self.campos = campos or {}
+        self.requeridas = tuple(requeridas)
+        self.abierto = abierto or resto is not None
+        self.resto = resto
+
+    def compilar(self, ruta):
+        prefijo = ruta + "." if ruta else ""
+        campos = dict((k, nodo.compilar(prefijo + k)) for k, nodo in self.campos.items())
+        requeridas = self.requeridas
+        abierto = self.abierto
+        resto = self.resto.compilar(prefijo + "*") if self.resto is not None else None
+
+        def chequear(v, errores):
+            if not isinstance(v, dict):
+                errores.append("{}: se esperaba objeto {{...}}, encontrado {}".format(ruta, _describir(v)))
+                return False
+            ok = True
+            for k in requeridas:
+                if k not in v:
+                    errores.append("{}: falta la clave '{}'".format(ruta, k))
+                    ok = False
+            for k, x in v.items():
+                chequeo = campos.get(k)
+                if chequeo is None:
+                    if not abierto:
+                        errores.append("{}: clave desconocida '{}'".format(ruta, k))
+                        ok = False
+                        continue
+                    chequeo = resto
+                if chequeo is not None and not chequeo(x, errores):
+                    ok = False
+            return ok
+        return chequear
+
+
+class Controles(Objeto):
+    # acción -> tecla, sin una misma tecla asignada a dos acciones
+    def __init__(self):
+        Objeto.__init__(self, resto=Cadena(largo_max=16))
+
+    def compilar(self, ruta):
+        base = Objeto.compilar(self, ruta)
+
+        def chequear(v, errores):
+            if not base(v, errores):
+                return False
+            vistas = {}
+            ok = True
+            for accion, tecla in v.items():
+                if tecla in vistas:
+                    errores.append("{}: la tecla '{}' se usa en '{}' y en '{}'".format(ruta, tecla, vistas[tecla], accion))
+                    ok = False
+                vistas[tecla] = accion
+            return ok
+        return chequear
+
+
+class Uno:
+    # el valor debe cumplir alguna de las alternativas
+    def __init__(self, *alternativas):
+        self.alternativas = alternativas
+
+    def compilar(self, ruta):
+        alternativas = [a.compilar(ruta) for a in self.alternativas]
+
+        def chequear(v, errores):
+            intentos = []
+            for alt in alternativas:
+                propios = []
+                if alt(v, propios):
+                    return True
+                intentos.extend(propios)
+            errores.append("{}: ninguna forma válida ({})".format(ruta, "; ".join(intentos)))
+            return False
+        return chequear
+
+
+class SegunCampo:
+    # objeto cuyo esquema depende del valor de uno de sus campos (p. ej.
+    # 'tipo'); si el valor no tiene esquema se acepta sin chequear
+    def __init__(self, campo, opciones):
+        self.campo = campo
+        self.opciones = opciones
+
+    def compilar(self, ruta):
+        campo = self.campo
+        opciones = dict((k, nodo.compilar(ruta)) for k, nodo in self.opciones.items())
+
+        def chequear(v, errores):
+            if not isinstance(v, dict) or not isinstance(v.get(campo), _CADENAS):
+                return True
+            chequeo = opciones.get(v[campo])
+            return chequeo is None or chequeo(v, errores)
+        return chequear
+
+
+# -------------------- VALIDADOR --------------------
+class Validador:
+    # esquema: dict de sección -> nodo. Una clave terminada en '*' aplica a
+    # todas las secciones con ese prefijo (p. ej. 'figura_*'). Las
+    # secciones que no aparecen en el esquema se validan con `resto`, o se
+    # aceptan sin chequear si no se indica.
+    def __init__(self, esquema, requeridas=(), referencias=(), resto=None):
+        self._exactas = {}
+        self._prefijos = []
+        for clave, nodo in esquema.items():
+            if clave.endswith('*'):
+                self._prefijos.append((clave[:-1], nodo.compilar(clave)))
+            else:
+                self._exactas[clave] = nodo.compilar(clave)
+        # los prefijos más largos primero: 'regla_comida_*' gana a 'regla_*'
+        self._prefijos.sort(key=lambda p: -len(p[0]))
+        self._prefijos = tuple(self._prefijos)
+        self.requeridas = tuple(requeridas)
+        # (sección con lista de nombres, prefijo al que deben referirse)
+        self.referencias = tuple(referencias)
+        self._resto = resto.compilar('*') if resto is not None else None
+
+    def _chequeo(self, clave):
+        # (chequeo, patrón) o (None, None); el patrón va en las rutas de error
+        chequeo = self._exactas.get(clave)
+        if chequeo is not None:
+            return chequeo, None
+        for prefijo, chequeo in self._prefijos:
+            if clave.startswith(prefijo):
+                return chequeo, prefijo + '*'
+        if self._resto is not None:
+            return self._resto, '*'
+        return None, None
+
+    def validar(self, ast):
+        errores = []
+        if not isinstance(ast, dict):
+            return ["el AST debe ser un objeto, encontrado {}".format(_describir(ast))]
+        for clave in self.requeridas:
+            if clave not in ast:
+                errores.append("falta la sección '{}'".format(clave))
+        for clave, valor in ast.items():
+            chequeo, patron = self._chequeo(clave)
+            if chequeo is None:
+                continue
+            antes = len(errores)
+            if not chequeo(valor, errores) and patron is not None:
+                for k in range(antes, len(errores)):
+                    errores[k] = errores[k].replace(patron, clave, 1)
+        for seccion, prefijo in self.referencias:
+            nombres = ast.get(seccion)
+            if not isinstance(nombres, (list, tuple)):
+                continue
+            for nombre in nombres:
+                if isinstance(nombre, _CADENAS) and (not nombre.startswith(prefijo) or nombre not in ast):
+                    errores.append("{}: '{}' no es una sección {}* definida".format(seccion, nombre, prefijo))
+        return errores
+
+    def exigir(self, ast):
+        errores = self.validar(ast)
+        if errores:
+            raise ErrorEsquema(errores)
+        return ast
+
+
+# Campos que tablas.py lee de las reglas y de las comidas de Snake. Los
+# puntajes son enteros: las instantáneas de partida los guardan así.
+CAMPOS_REGLA = {
+    'puntos_por_nivel': Entero(0, None),
+    'multiplicador_velocidad': Numero(0.1, 10),
+    'puntuacion_base': Entero(0, None),
+    'multiplicador_por_linea': Lista(Entero(0, None), minimo=1),
+}
+
+CAMPOS_COMIDA = {
+    'color': Cadena(),
+    'puntuacion': Entero(),
+    'puntos_extra': Entero(),
+    'duracion': Numero(0.1, 3600),
+}
+
+# valores de 'tipo' que tablas.py reconoce como comida de Snake
+TIPOS_COMIDA = ('manzana_regular', 'manzana_dorada', 'manzana_negra', 'manzana_veloz', 'manzana_lenta')
+
+ESQUEMA_BRICKLANG = {
+    'nombre_juego': Cadena(),
+    'version': Cadena(),
+    'dimensiones_tablero': Objeto({
+        'ancho': Entero(MIN_LADO_TABLERO, MAX_LADO_TABLERO),
+        'alto': Entero(MIN_LADO_TABLERO, MAX_LADO_TABLERO),
+    }, requeridas=('ancho', 'alto')),
+    'velocidad_inicial': Uno(
+        Numero(0.1, 100),
+        Objeto({'valor': Numero(0.1, 100)}, requeridas=('valor',)),
+    ),
+    'obstaculos': Objeto({
+        'activos': Booleano(),
+        'generacion_aleatoria': Booleano(),
+        'cantidad_maxima': Entero(0, MAX_LADO_TABLERO),
+    }),
+    'controles': Controles(),
+    'figuras_disponibles': Lista(Cadena(), minimo=1),
+    'figura_*': Objeto({
+        'color': Cadena(),
+        'rotaciones': Lista(Matriz01(), minimo=1, maximo=MAX_ROTACIONES),
+    }, requeridas=('color', 'rotaciones')),
+    'regla_*': Objeto(dict(CAMPOS_REGLA, **CAMPOS_COMIDA), abierto=True),
+}
+
+# secciones con otro nombre (p. ej. [manzana_normal]) que declaran una comida
+COMIDA_EN_SECCION = SegunCampo('tipo', dict((t, Objeto(CAMPOS_COMIDA, abierto=True)) for t in TIPOS_COMIDA))
+
+_validador = None
+
+
+def validar(ast):
+    # Valida contra ESQUEMA_BRICKLANG (compilado la primera vez)
+    global _validador
+    if _validador is None:
+        _validador = Validador(ESQUEMA_BRICKLANG, requeridas=('dimensiones_tablero',),
+                               referencias=(('figuras_disponibles', 'figura_'),),
+                               resto=COMIDA_EN_SECCION)
+    return _validador.validar(ast)